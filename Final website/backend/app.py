@@ -3,10 +3,25 @@ from fastapi.middleware.cors import CORSMiddleware
 from routes.nda_generator import router as nda_router
 from routes.clause_explainer import router as explainer_router
 from routes.clause_comparator import router as comparator_router
-from routes.download import router as download_router
+from routes.download import router as download_router, pdf_cache
 from routes.legal_qa import router as legal_qa_router
+from routes.health import router as health_router
+from routes.history import router as history_router
 from models import Base
-from database import engine
+from database import engine, async_engine, pool_stats
+from model_registry import get_model_registry, PRELOAD_MODEL
+from batch_scheduler import get_batch_scheduler
+from semantic_cache import semantic_cache
+from generation_cache import generation_cache
+from legal_corpus_loader import get_legal_retriever, loaded_bm25_index
+from health_monitor import get_health_monitor
+from audit_writer import get_audit_writer
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.document_store import get_document_store
+from retention import get_retention_job, RETENTION_ENABLED
+from rag_pipeline import RAG_RETRIEVAL_MODE
+from reranker import get_reranker
+from prompt_registry import get_prompt_registry
 import logging
 import datetime
 import uvicorn
@@ -34,12 +49,62 @@ app.add_middleware(
 # Create DB tables (optional - include only if not using Alembic)
 Base.metadata.create_all(bind=engine)
 
+# create_all skips tables that already exist, so add indexes defined since they were created
+# (on a large production table, build them beforehand with CREATE INDEX CONCURRENTLY)
+for table in Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
 # Include routers
 app.include_router(nda_router, prefix="/api/nda", tags=["NDA Generator"])
 app.include_router(explainer_router, prefix="/api/explainer", tags=["Clause Explainer"])
 app.include_router(comparator_router, prefix="/api/comparator", tags=["Clause Comparator"])
 app.include_router(download_router, prefix="/api/download", tags=["Download"])
 app.include_router(legal_qa_router, prefix="/api/legal-qa", tags=["Legal Q&A"])
+app.include_router(health_router, prefix="/api/health", tags=["System"])
+app.include_router(history_router, prefix="/api/history", tags=["History"])
+
+# Compile and validate every prompt template; a missing or broken template stops startup
+@app.on_event("startup")
+def load_prompt_templates():
+    get_prompt_registry().load_all(tokenizer=get_model_registry().get_tokenizer() if PRELOAD_MODEL else None)
+
+# Load the Granite model once per process so requests never pay for it
+@app.on_event("startup")
+def load_model():
+    if PRELOAD_MODEL:
+        get_model_registry().load()
+        get_batch_scheduler().start()
+
+# Load (and incrementally sync) the persistent FAISS index once at startup
+@app.on_event("startup")
+def load_legal_index():
+    get_legal_retriever()
+
+# Start refreshing the cached component status that the health probes report
+@app.on_event("startup")
+def start_health_monitor():
+    get_health_monitor().start()
+
+# Query/Log rows are written behind the request path; flush whatever is queued before exiting
+@app.on_event("startup")
+def start_audit_writer():
+    get_audit_writer().start()
+
+# Roll up and prune old audit rows in the background; safe to run in every worker
+@app.on_event("startup")
+def start_retention_job():
+    if RETENTION_ENABLED:
+        get_retention_job().start()
+
+@app.on_event("shutdown")
+def flush_audit_writer():
+    get_audit_writer().stop()
+
+@app.on_event("shutdown")
+async def close_database_pools():
+    await async_engine.dispose()
+    engine.dispose()
 
 # Root route
 @app.get("/", tags=["System"])
@@ -50,14 +115,31 @@ async def root():
         "features": ["NDA Generation", "Clause Explanation", "Cross-border Comparison", "Legal Q&A", "RAG Enhancement"]
     }
 
-# Healthcheck route
+# Healthcheck route: reports state only, so it never loads the model or builds the index
 @app.get("/health", tags=["System"])
 def health_check():
+    bm25 = loaded_bm25_index()
     return {
         "status": "running",
         "timestamp": datetime.datetime.utcnow().isoformat(),
+        "readiness": get_health_monitor().readiness(),
         "rag_enabled": True,
-        "services": ["IBM Granite LLM", "FAISS Vector Store", "Legal Document Retrieval"]
+        "services": ["IBM Granite LLM", "FAISS Vector Store", "Legal Document Retrieval"],
+        "model": get_model_registry().stats(),
+        "llm_scheduler": get_batch_scheduler().stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "generation_cache": generation_cache.stats(),
+        "audit_writer": get_audit_writer().stats(),
+        "database": pool_stats(),
+        "retention": get_retention_job().stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "document_store": get_document_store().stats(),
+        "prompts": get_prompt_registry().stats(),
+        "retrieval": {
+            "mode": RAG_RETRIEVAL_MODE,
+            "bm25": bm25.stats() if bm25 is not None else None,
+            "reranker": get_reranker().stats()
+        }
     }
 
 # Request logging middleware
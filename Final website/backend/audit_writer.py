@@ -0,0 +1,225 @@
+from database import SessionLocal
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from collections import defaultdict
+from datetime import datetime
+import threading
+import queue
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_MAX_RECORDS = int(os.getenv("AUDIT_QUEUE_MAX_RECORDS", "10000"))
+AUDIT_FLUSH_BATCH_SIZE = int(os.getenv("AUDIT_FLUSH_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL_MS = float(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "500"))
+AUDIT_SHUTDOWN_TIMEOUT_SECONDS = 10
+
+_STOP = object()
+
+
+class AuditWriter:
+    """
+    Write-behind persistence for audit rows (Query, Log).
+
+    Routes hand records to a bounded in-process queue and return immediately; a
+    single worker thread writes them with one bulk INSERT per table whenever
+    AUDIT_FLUSH_BATCH_SIZE records are waiting or AUDIT_FLUSH_INTERVAL_MS has passed.
+    When the queue is full, new records are dropped (and counted) rather than
+    blocking a request. A batch that fails for any reason is counted as failed and
+    the worker moves on. Remaining records are flushed on shutdown.
+    """
+
+    def __init__(
+        self,
+        max_records: int = AUDIT_QUEUE_MAX_RECORDS,
+        batch_size: int = AUDIT_FLUSH_BATCH_SIZE,
+        flush_interval_ms: float = AUDIT_FLUSH_INTERVAL_MS,
+        session_factory=SessionLocal,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.session_factory = session_factory
+        self._queue = queue.Queue(maxsize=max_records)
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+
+        # metrics, updated from request threads and the worker under _metrics_lock
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+        self.total_flush_seconds = 0.0
+        self.last_error = None
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._worker.start()
+
+    def enqueue(self, model, **values) -> bool:
+        """
+        Queues one row for `model`'s table. The timestamp is taken now, not at flush time.
+
+        Returns:
+            bool: False if the queue was full and the record was dropped
+        """
+        if self._worker is None:
+            self.start()
+        if "timestamp" in model.__table__.columns and "timestamp" not in values:
+            values["timestamp"] = datetime.utcnow()
+        try:
+            self._queue.put_nowait((model, values))
+        except queue.Full:
+            with self._metrics_lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"⚠️ Audit queue full; {dropped} record(s) dropped so far")
+            return False
+        with self._metrics_lock:
+            self.enqueued += 1
+        return True
+
+    def _collect_batch(self):
+        """
+        Blocks for the first record, then keeps collecting until the interval passes or the batch is full.
+
+        Returns:
+            tuple: (records, whether a stop was requested)
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                record = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect_batch()
+            if batch:
+                self._flush_safely(batch)
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not _STOP:
+                batch.append(record)
+        for start in range(0, len(batch), self.batch_size):
+            self._flush_safely(batch[start:start + self.batch_size])
+
+    def _flush_safely(self, batch: list):
+        """
+        Flushes a batch; any error (e.g. no database session) fails just that batch, so the only writer thread keeps running.
+        """
+        try:
+            self._flush(batch)
+        except Exception as e:
+            logger.error(f"❌ Audit flush of {len(batch)} record(s) failed: {str(e)}")
+            with self._metrics_lock:
+                self.failed += len(batch)
+                self.last_error = str(e)
+
+    def _flush(self, batch: list):
+        rows = defaultdict(list)
+        for model, values in batch:
+            rows[model].append(values)
+
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            for model, values in rows.items():
+                db.execute(insert(model), values)
+            db.commit()
+            with self._metrics_lock:
+                self.written += len(batch)
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.error(f"Audit flush of {len(batch)} record(s) failed, retrying one by one: {str(e)}")
+            self._write_individually(db, batch)
+        finally:
+            db.close()
+        with self._metrics_lock:
+            self.flushes += 1
+            self.total_flush_seconds += time.perf_counter() - started
+
+    def _write_individually(self, db, batch: list):
+        """
+        Fallback after a failed bulk insert, so one bad record does not lose the rest of its batch.
+        """
+        for model, values in batch:
+            try:
+                db.execute(insert(model), [values])
+                db.commit()
+                with self._metrics_lock:
+                    self.written += 1
+            except Exception as e:
+                db.rollback()
+                with self._metrics_lock:
+                    self.failed += 1
+                    self.last_error = str(e)
+
+    def stop(self, timeout: float = AUDIT_SHUTDOWN_TIMEOUT_SECONDS):
+        """
+        Flushes everything queued so far and stops the worker.
+        """
+        with self._start_lock:
+            worker, self._worker = self._worker, None
+        if worker is None:
+            return
+        #the sentinel must get in even when the queue is full, so wait for room
+        self._queue.put(_STOP)
+        worker.join(timeout)
+        if worker.is_alive():
+            logger.warning(f"Audit writer did not finish flushing within {timeout}s; {self._queue.qsize()} record(s) left")
+        else:
+            logger.info(f"Audit writer stopped: {self.written} written, {self.dropped} dropped, {self.failed} failed")
+
+    def stats(self) -> dict:
+        with self._metrics_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "flushes": self.flushes,
+                "average_flush_ms": 1000 * self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+                "last_error": self.last_error,
+            }
+
+
+_writer = AuditWriter()
+
+
+def get_audit_writer() -> AuditWriter:
+    """
+    Returns the process-wide audit writer.
+    """
+    return _writer
@@ -0,0 +1,255 @@
+from transformers import StoppingCriteria, StoppingCriteriaList, set_seed
+from model_registry import get_model_registry
+from concurrent.futures import Future
+from collections import Counter
+import threading
+import queue
+import time
+import torch
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "20"))
+LLM_MAX_BATCH_SIZE = int(os.getenv("LLM_MAX_BATCH_SIZE", "8"))
+LLM_MAX_NEW_TOKENS = int(os.getenv("LLM_MAX_NEW_TOKENS", "400"))
+
+
+class _PendingGeneration:
+    __slots__ = ("prompt", "future", "enqueued_at")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class _PendingStream(_PendingGeneration):
+    __slots__ = ("streamer", "cancelled")
+
+    def __init__(self, prompt: str, streamer, cancelled: threading.Event):
+        super().__init__(prompt)
+        self.streamer = streamer
+        self.cancelled = cancelled
+
+
+class _StopWhenCancelled(StoppingCriteria):
+    """
+    Ends a streaming generation early once its client has gone away.
+    """
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.cancelled.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class BatchScheduler:
+    """
+    Collects concurrent prompts for a short window and runs them through the Granite
+    model as one padded generate() call, handing each caller back its own result.
+
+    A single worker thread owns the model, so callers only ever wait on a Future.
+    Streaming generations go through the same queue and worker, one at a time between
+    batches, so streams and batches never run on the model concurrently.
+    """
+
+    def __init__(
+        self,
+        registry=None,
+        batch_window_ms: float = LLM_BATCH_WINDOW_MS,
+        max_batch_size: int = LLM_MAX_BATCH_SIZE,
+        max_new_tokens: int = LLM_MAX_NEW_TOKENS,
+    ):
+        self.registry = registry or get_model_registry()
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_new_tokens = max_new_tokens
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+
+        # metrics, updated by the worker and read by stats() under _metrics_lock
+        self.batches_run = 0
+        self.requests_served = 0
+        self.batch_size_counts = Counter()
+        self.streams_served = 0
+        self.total_queue_wait_seconds = 0.0
+        self.total_generate_seconds = 0.0
+        self.total_stream_seconds = 0.0
+
+    def decoding_params(self) -> dict:
+        """
+        Returns the decoding parameters every generation uses (part of the generation cache key).
+        """
+        return {"max_new_tokens": self.max_new_tokens, "do_sample": False, "temperature": 0.0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="granite-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        """
+        Queues a prompt for generation.
+
+        Returns:
+            Future: resolves to the generated text (prompt tokens excluded)
+        """
+        if self._worker is None:
+            self.start()
+        pending = _PendingGeneration(prompt)
+        self._queue.put(pending)
+        return pending.future
+
+    def submit_stream(self, prompt: str, streamer, cancelled: threading.Event) -> Future:
+        """
+        Queues a prompt for a streaming generation.
+
+        Args:
+            streamer: transformers streamer that receives the text as it is generated
+            cancelled: once set, generation stops at the next token
+
+        Returns:
+            Future: resolves to None once generation has finished and the streamer has ended
+        """
+        if self._worker is None:
+            self.start()
+        pending = _PendingStream(prompt, streamer, cancelled)
+        self._queue.put(pending)
+        return pending.future
+
+    def generate(self, prompt: str) -> str:
+        """
+        Blocking helper: queues a prompt and waits for its result.
+        """
+        return self.submit(prompt).result()
+
+    def _collect_batch(self) -> list:
+        """
+        Blocks for the first prompt, then keeps collecting until the window closes or the batch is full.
+        """
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            batch = [pending for pending in batch if pending.future.set_running_or_notify_cancel()]
+            streams = [pending for pending in batch if isinstance(pending, _PendingStream)]
+            batch = [pending for pending in batch if not isinstance(pending, _PendingStream)]
+            if batch:
+                try:
+                    outputs = self._generate_batch(batch)
+                    for pending, output in zip(batch, outputs):
+                        pending.future.set_result(output)
+                except Exception as e:
+                    logger.error(f"Batched generation failed for {len(batch)} prompt(s): {str(e)}")
+                    for pending in batch:
+                        pending.future.set_exception(e)
+            for pending in streams:
+                try:
+                    self._generate_stream(pending)
+                    pending.future.set_result(None)
+                except Exception as e:
+                    logger.error(f"Streaming generation failed: {str(e)}")
+                    pending.streamer.end()
+                    pending.future.set_exception(e)
+
+    def _generate_batch(self, batch: list) -> list:
+        tokenizer, model = self.registry.get()
+        started = time.perf_counter()
+        queue_wait = sum(started - pending.enqueued_at for pending in batch)
+        prompts = [pending.prompt for pending in batch]
+
+        # Left padding keeps every prompt's last token aligned, so one slice strips all prompts
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True).to(self.registry.device)
+
+        logger.info(f"Generating output for a batch of {len(prompts)}...")
+        set_seed(42)
+        with torch.inference_mode():
+            outputs = model.generate(
+                **inputs,
+                **self.decoding_params(),
+                pad_token_id=tokenizer.pad_token_id,
+            )
+
+        prompt_length = inputs["input_ids"].shape[1]
+        responses = tokenizer.batch_decode(outputs[:, prompt_length:], skip_special_tokens=True)
+
+        with self._metrics_lock:
+            self.batches_run += 1
+            self.requests_served += len(prompts)
+            self.batch_size_counts[len(prompts)] += 1
+            self.total_queue_wait_seconds += queue_wait
+            self.total_generate_seconds += time.perf_counter() - started
+        return [response.strip() for response in responses]
+
+    def _generate_stream(self, pending: _PendingStream):
+        tokenizer, model = self.registry.get()
+        started = time.perf_counter()
+        inputs = tokenizer(pending.prompt, return_tensors="pt").to(self.registry.device)
+
+        set_seed(42)
+        with torch.inference_mode():
+            model.generate(
+                **inputs,
+                **self.decoding_params(),
+                pad_token_id=tokenizer.pad_token_id,
+                streamer=pending.streamer,
+                stopping_criteria=StoppingCriteriaList([_StopWhenCancelled(pending.cancelled)]),
+            )
+
+        with self._metrics_lock:
+            self.streams_served += 1
+            self.requests_served += 1
+            self.total_queue_wait_seconds += started - pending.enqueued_at
+            self.total_stream_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth and batch-size metrics for monitoring endpoints.
+        """
+        with self._metrics_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batch_window_ms": self.batch_window * 1000,
+                "max_batch_size": self.max_batch_size,
+                "batches_run": self.batches_run,
+                "requests_served": self.requests_served,
+                "streams_served": self.streams_served,
+                "average_batch_size": (self.requests_served - self.streams_served) / self.batches_run if self.batches_run else 0.0,
+                "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+                "average_queue_wait_ms": 1000 * self.total_queue_wait_seconds / self.requests_served if self.requests_served else 0.0,
+                "average_batch_generate_seconds": self.total_generate_seconds / self.batches_run if self.batches_run else 0.0,
+                "average_stream_seconds": self.total_stream_seconds / self.streams_served if self.streams_served else 0.0,
+            }
+
+
+_scheduler = BatchScheduler()
+
+
+def get_batch_scheduler() -> BatchScheduler:
+    """
+    Returns the process-wide batching scheduler.
+    """
+    return _scheduler
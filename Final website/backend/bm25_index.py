@@ -0,0 +1,224 @@
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.embedding_store import EmbeddingStore
+from collections import Counter
+from pathlib import Path
+import numpy as np
+import math
+import json
+import time
+import re
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+BM25_FILE = "bm25.json"
+POSTING_ROWS_FILE = "bm25_rows.npy"
+POSTING_TFS_FILE = "bm25_tfs.npy"
+DOC_LENGTHS_FILE = "bm25_lengths.npy"
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+DENSE_ACCUMULATE_RATIO = 16  # postings * ratio >= rows -> score into a dense array
+
+#keeps legal terms whole: "non-compete", "12.3", "s.1983", "u.s.c"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./'][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "shall any such which who whom".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """
+    Lowercased terms of a text. Compound terms are kept whole and also split into
+    their parts, so "non-compete" matches queries for "non-compete" and "non compete".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token not in STOPWORDS:
+            terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-./']", token) if part and part not in STOPWORDS)
+    return terms
+
+
+def _open_tmp_array(index_path: Path, name: str, dtype, length: int) -> np.memmap:
+    return np.lib.format.open_memmap(index_path / f"{name}.tmp", mode="w+", dtype=dtype, shape=(length,))
+
+
+def _index_bytes(index_path: Path) -> int:
+    files = (BM25_FILE, POSTING_ROWS_FILE, POSTING_TFS_FILE, DOC_LENGTHS_FILE)
+    return sum((Path(index_path) / name).stat().st_size for name in files)
+
+
+def build_bm25_index(store: EmbeddingStore, index_path: Path) -> dict:
+    """
+    Builds an inverted index over every chunk of the store, in two streaming passes
+    over the chunks file: the first counts document frequencies and lengths, the
+    second fills postings sorted by term straight into preallocated files. Memory
+    is bounded by the vocabulary, not the corpus.
+
+    Returns:
+        dict: size report (terms, postings, bytes, build seconds)
+    """
+    index_path = Path(index_path)
+    started = time.perf_counter()
+
+    document_frequency = Counter()
+    lengths = np.zeros(store.count, dtype=np.uint32)
+    for row, record in store.iter_chunks():
+        terms = tokenize(record["text"])
+        lengths[row] = len(terms)
+        document_frequency.update(set(terms))
+
+    vocabulary = sorted(document_frequency)
+    term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+    frequencies = np.array([document_frequency[term] for term in vocabulary], dtype=np.int64)
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(frequencies, out=offsets[1:])
+    total = int(offsets[-1])
+    del document_frequency
+
+    #rows are visited in order, so each term's postings come out sorted by row
+    rows = _open_tmp_array(index_path, POSTING_ROWS_FILE, np.uint32, total)
+    tfs = _open_tmp_array(index_path, POSTING_TFS_FILE, np.uint16, total)
+    cursor = offsets[:-1].copy()
+    for row, record in store.iter_chunks():
+        counts = Counter(tokenize(record["text"]))
+        if not counts:
+            continue
+        #a chunk's terms are distinct, so its postings can be scattered in one go
+        ids = np.fromiter((term_ids[term] for term in counts), dtype=np.int64, count=len(counts))
+        positions = cursor[ids]
+        rows[positions] = row
+        tfs[positions] = np.minimum(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)), MAX_TERM_FREQUENCY)
+        cursor[ids] = positions + 1
+    stored_lengths = _open_tmp_array(index_path, DOC_LENGTHS_FILE, np.uint32, store.count)
+    stored_lengths[:] = lengths
+    for array in (rows, tfs, stored_lengths):
+        array.flush()
+    del rows, tfs, stored_lengths
+    for name in (POSTING_ROWS_FILE, POSTING_TFS_FILE, DOC_LENGTHS_FILE):
+        os.replace(index_path / f"{name}.tmp", index_path / name)
+
+    header = {
+        "count": store.count,
+        "average_length": float(lengths.mean()) if store.count else 0.0,
+        "postings": total,
+        "terms": {term: [int(offsets[i]), int(frequencies[i])] for i, term in enumerate(vocabulary)},
+    }
+    #the header is written last, so a reader never sees it next to half-written postings
+    tmp_file = index_path / f"{BM25_FILE}.tmp"
+    with tmp_file.open("w", encoding="utf-8") as file:
+        json.dump(header, file, separators=(",", ":"))
+    os.replace(tmp_file, index_path / BM25_FILE)
+
+    report = {
+        "terms": len(vocabulary),
+        "postings": total,
+        "bytes": _index_bytes(index_path),
+        "build_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Built BM25 index: {report['terms']} terms, {report['postings']} postings, "
+                f"{report['bytes'] / 1e6:.1f} MB in {report['build_seconds']}s")
+    return report
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of an embedding store. Postings are memory-mapped and
+    only the vocabulary (term -> offset, document frequency) is held in memory, so a
+    query costs one slice per query term.
+    """
+
+    def __init__(self, index_path: Path, k1: float = BM25_K1, b: float = BM25_B):
+        self.index_path = Path(index_path)
+        with (self.index_path / BM25_FILE).open("r", encoding="utf-8") as file:
+            header = json.load(file)
+        self.count = header["count"]
+        self.average_length = header["average_length"] or 1.0
+        self.postings = header["postings"]
+        self.terms = header["terms"]
+        self.k1 = k1
+        self.b = b
+        self.rows = np.load(self.index_path / POSTING_ROWS_FILE, mmap_mode="r")
+        self.tfs = np.load(self.index_path / POSTING_TFS_FILE, mmap_mode="r")
+        self.lengths = np.load(self.index_path / DOC_LENGTHS_FILE, mmap_mode="r")
+
+        # metrics
+        self.queries = 0
+        self.total_query_seconds = 0.0
+
+    @staticmethod
+    def exists(index_path: Path) -> bool:
+        return (Path(index_path) / BM25_FILE).exists()
+
+    def search(self, query: str, k: int = 4, allowed=None) -> list:
+        """
+        Returns the top-k (score, row) pairs for a query, best first.
+
+        Args:
+            allowed: optional callable mapping an array of rows to a boolean mask;
+                rows it rejects are dropped before ranking
+        """
+        started = time.perf_counter()
+        matched_rows, matched_scores = [], []
+        for term in set(tokenize(query)):
+            posting = self.terms.get(term)
+            if posting is None:
+                continue
+            offset, frequency = posting
+            rows = np.asarray(self.rows[offset:offset + frequency], dtype=np.int64)
+            tfs = np.asarray(self.tfs[offset:offset + frequency], dtype=np.float32)
+            idf = math.log(1 + (self.count - frequency + 0.5) / (frequency + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[rows] / self.average_length)
+            matched_rows.append(rows)
+            matched_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        hits = []
+        if matched_rows:
+            rows, scores = self._accumulate(matched_rows, matched_scores)
+            if allowed is not None:
+                mask = allowed(rows)
+                rows, scores = rows[mask], scores[mask]
+            best = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+            best = best[np.argsort(-scores[best], kind="stable")]
+            hits = list(zip(scores[best].tolist(), rows[best].tolist()))
+
+        self.queries += 1
+        self.total_query_seconds += time.perf_counter() - started
+        return hits
+
+    def _accumulate(self, matched_rows: list, matched_scores: list):
+        """
+        Sums per-term scores by row. Rows are unique within a term, so queries with long
+        postings lists add straight into a dense per-row array instead of sorting.
+        """
+        if sum(len(rows) for rows in matched_rows) * DENSE_ACCUMULATE_RATIO < self.count:
+            rows, inverse = np.unique(np.concatenate(matched_rows), return_inverse=True)
+            return rows, np.bincount(inverse, weights=np.concatenate(matched_scores))
+        totals = np.zeros(self.count, dtype=np.float32)
+        for rows, scores in zip(matched_rows, matched_scores):
+            totals[rows] += scores
+        rows = np.flatnonzero(totals)
+        return rows, totals[rows]
+
+    def close(self):
+        """
+        Drops the posting memory maps, so the index files can be replaced.
+        """
+        self.rows = self.tfs = self.lengths = None
+
+    def stats(self) -> dict:
+        return {
+            "documents": self.count,
+            "terms": len(self.terms),
+            "postings": self.postings,
+            "bytes": _index_bytes(self.index_path),
+            "queries": self.queries,
+            "average_query_ms": 1000 * self.total_query_seconds / self.queries if self.queries else 0.0,
+        }
@@ -0,0 +1,141 @@
+from model_registry import get_model_registry
+import re
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1200"))
+#whole RAG prompt: template, question and context together
+RAG_PROMPT_TOKEN_BUDGET = int(os.getenv("RAG_PROMPT_TOKEN_BUDGET", "1600"))
+RAG_DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8"))
+MIN_OVERLAP_CHARS = 30  # shorter shared edges are treated as coincidence, not splitter overlap
+MAX_OVERLAP_CHARS = 400  # comfortably above the loader's chunk_overlap=200
+MIN_TRUNCATED_TOKENS = 32  # a partial passage shorter than this is dropped rather than cut
+SHINGLE_WORDS = 5
+
+
+def _overlap(first: str, second: str) -> int:
+    """
+    Length of the longest suffix of `first` that is also a prefix of `second`, as left
+    by the splitter's chunk_overlap; 0 if they do not overlap.
+    """
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    window_start = max(0, len(first) - MAX_OVERLAP_CHARS)
+    position = first.find(probe, window_start)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(probe, position + 1)
+    return 0
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _similarity(first: set, second: set) -> float:
+    """
+    Share of the smaller passage's shingles found in the other, so a passage mostly
+    contained in a longer one counts as a duplicate.
+    """
+    if not first or not second:
+        return 0.0
+    return len(first & second) / min(len(first), len(second))
+
+
+class _Passage:
+    __slots__ = ("source", "text", "shingles")
+
+    def __init__(self, source, text: str):
+        self.source = source
+        self.text = text
+        self.shingles = _shingles(text)
+
+
+def _source(doc):
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def merge_passages(docs: list) -> list:
+    """
+    Turns retrieved chunks (best first) into passages: chunks from the same source and
+    page whose edges overlap are stitched into one passage, and chunks that are
+    near-duplicates of a better-ranked passage are dropped. Passages keep the rank of
+    their best chunk.
+    """
+    passages = []
+    for doc in docs:
+        text = doc.page_content.strip()
+        if not text:
+            continue
+        source = _source(doc)
+        shingles = _shingles(text)
+
+        merged = False
+        for passage in passages:
+            if passage.source != source:
+                continue
+            if text in passage.text or _similarity(shingles, passage.shingles) >= RAG_DEDUP_THRESHOLD:
+                merged = True
+            elif _overlap(passage.text, text):
+                passage.text += text[_overlap(passage.text, text):]
+                merged = True
+            elif _overlap(text, passage.text):
+                passage.text = text + passage.text[_overlap(text, passage.text):]
+                merged = True
+            if merged:
+                passage.shingles |= shingles
+                break
+        if merged:
+            continue
+
+        #the same clause often appears in several templates, so duplicates are also checked across sources
+        if any(_similarity(shingles, passage.shingles) >= RAG_DEDUP_THRESHOLD for passage in passages):
+            continue
+        passages.append(_Passage(source, text))
+    return passages
+
+
+def pack_context(docs: list, token_budget: int = RAG_CONTEXT_TOKEN_BUDGET, tokenizer=None) -> str:
+    """
+    Assembles the prompt context from retrieved chunks: merges overlapping chunks,
+    drops near-duplicates and adds passages in rank order until the token budget,
+    counted with the Granite tokenizer, is used up. The passage that crosses the
+    budget is cut at a token boundary.
+
+    Args:
+        docs(list): retrieved LangChain documents, best first
+        token_budget(int): maximum context tokens (separators included)
+        tokenizer: defaults to the shared Granite tokenizer
+
+    Returns:
+        str: the context
+    """
+    tokenizer = tokenizer or get_model_registry().get_tokenizer()
+    separator_tokens = len(tokenizer("\n", add_special_tokens=False)["input_ids"])
+
+    packed, used = [], 0
+    passages = merge_passages(docs)
+    for passage in passages:
+        remaining = token_budget - used - (separator_tokens if packed else 0)
+        tokens = tokenizer(passage.text, add_special_tokens=False)["input_ids"]
+        if len(tokens) <= remaining:
+            packed.append(passage.text)
+            used += len(tokens) + (separator_tokens if len(packed) > 1 else 0)
+            continue
+        #the best passage is always kept, cut down if needed, so the context is never empty
+        if remaining >= MIN_TRUNCATED_TOKENS or (not packed and remaining > 0):
+            packed.append(tokenizer.decode(tokens[:remaining], skip_special_tokens=True))
+            used += remaining + (separator_tokens if len(packed) > 1 else 0)
+        break
+
+    logger.info(f"Packed {len(docs)} chunks into {len(packed)} of {len(passages)} passages ({used}/{token_budget} tokens)")
+    return "\n".join(packed)
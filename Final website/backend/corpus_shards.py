@@ -0,0 +1,292 @@
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.embedding_store import (
+    EmbeddingStore,
+    build_faiss_index,
+    filtered_search_params,
+    index_factory_string,
+    read_faiss_index,
+    save_faiss_index,
+)
+from pathlib import Path
+import numpy as np
+import threading
+import faiss
+import re
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHARDS_DIR = "shards"
+ROW_JURISDICTIONS_FILE = "row_jurisdictions.bin"
+GENERAL = "general"
+
+JURISDICTION_ALIASES = {
+    "us": "united_states", "usa": "united_states", "u.s.": "united_states", "u.s.a.": "united_states",
+    "united states": "united_states", "united states of america": "united_states", "america": "united_states",
+    "uk": "united_kingdom", "u.k.": "united_kingdom", "united kingdom": "united_kingdom",
+    "great britain": "united_kingdom", "britain": "united_kingdom", "england": "united_kingdom",
+    "england and wales": "united_kingdom", "scotland": "united_kingdom",
+    "eu": "european_union", "european union": "european_union",
+    "uae": "united_arab_emirates", "united arab emirates": "united_arab_emirates",
+    "germany": "germany", "deutschland": "germany", "france": "france", "india": "india",
+    "canada": "canada", "australia": "australia", "singapore": "singapore", "japan": "japan",
+    "china": "china", "brazil": "brazil", "netherlands": "netherlands", "ireland": "ireland",
+    "switzerland": "switzerland", "spain": "spain", "italy": "italy", "mexico": "mexico",
+    "south africa": "south_africa", "hong kong": "hong_kong",
+    "delaware": "delaware", "new york": "new_york", "california": "california", "texas": "texas",
+}
+#sub-national jurisdictions and their country match each other's documents
+JURISDICTION_PARENTS = {
+    "delaware": "united_states",
+    "new_york": "united_states",
+    "california": "united_states",
+    "texas": "united_states",
+}
+
+GOVERNING_LAW_PATTERN = re.compile(
+    r"governed by (?:and construed in accordance with )?the laws? of (?:the )?(?:state of )?([A-Za-z .]{2,40})",
+    re.IGNORECASE,
+)
+
+#clause types mapped to the shard that holds them; first match wins, contracts is the fallback
+CLAUSE_CATEGORIES = (
+    (("confidential", "non-disclosure", "nda", "trade secret"), "ndas"),
+    (("non-compete", "non compete", "non-solicit", "employ", "severance", "notice period"), "employment"),
+    (("intellectual property", "patent", "copyright", "trademark", "licens", "ownership of work"), "intellectual_property"),
+    (("gdpr", "data protection", "privacy", "compliance", "anti-bribery", "regulat"), "compliance"),
+    (("arbitration", "governing law", "jurisdiction", "cross-border", "export", "sanction"), "international"),
+)
+
+
+def normalize_jurisdiction(name: str) -> str:
+    """
+    Maps a user- or document-supplied jurisdiction name to a canonical slug
+    ("USA" -> "united_states"). Unknown names are slugified as-is.
+    """
+    if not name:
+        return GENERAL
+    cleaned = re.sub(r"^(the |state of )+", "", name.strip().lower()).strip(" .")
+    return JURISDICTION_ALIASES.get(cleaned, re.sub(r"[^a-z0-9]+", "_", cleaned).strip("_") or GENERAL)
+
+
+def category_for_path(relative_path: str) -> str:
+    """
+    The shard of a document is its top-level folder under the corpus root (ndas/,
+    contracts/, employment/... as laid out by setup_legal_docs.py).
+    """
+    parts = Path(relative_path).parts
+    return parts[0] if len(parts) > 1 else GENERAL
+
+
+def detect_jurisdiction(relative_path: str, text: str) -> str:
+    """
+    Tags a document with a jurisdiction from a known folder name below its category
+    (e.g. contracts/germany/...), else from a known file name (germany.txt, as in the
+    flat corpus layout), else from a governing-law clause.
+    """
+    path = Path(relative_path)
+    for part in [*path.parts[1:-1], path.stem]:
+        cleaned = part.lower().replace("_", " ").replace("-", " ")
+        if cleaned in JURISDICTION_ALIASES:
+            return JURISDICTION_ALIASES[cleaned]
+    for match in GOVERNING_LAW_PATTERN.finditer(text):
+        words = match.group(1).lower().split()
+        #the clause usually runs on ("the laws of Germany, without regard to..."), so try the longest known prefix
+        for length in range(min(len(words), 4), 0, -1):
+            candidate = " ".join(words[:length]).strip(" .,")
+            if candidate in JURISDICTION_ALIASES:
+                return JURISDICTION_ALIASES[candidate]
+    return GENERAL
+
+
+def category_for_clause(clause_type: str) -> str:
+    """
+    Picks the shard most likely to hold a clause type, for the comparator.
+    """
+    clause = clause_type.lower()
+    for keywords, category in CLAUSE_CATEGORIES:
+        if any(keyword in clause for keyword in keywords):
+            return category
+    return "contracts"
+
+
+def _category_ranges(files: dict) -> dict:
+    """
+    Groups the manifest's per-file row ranges by category, merging adjacent ranges.
+    """
+    ranges = {}
+    for entry in sorted(files.values(), key=lambda entry: entry["start"]):
+        if not entry["count"]:
+            continue
+        category_ranges = ranges.setdefault(entry["category"], [])
+        stop = entry["start"] + entry["count"]
+        if category_ranges and category_ranges[-1][1] == entry["start"]:
+            category_ranges[-1] = (category_ranges[-1][0], stop)
+        else:
+            category_ranges.append((entry["start"], stop))
+    return ranges
+
+
+def shard_layout(store: EmbeddingStore, files: dict) -> dict:
+    """
+    Describes the shards the manifest's files produce, to detect when they need rebuilding.
+    """
+    return {
+        category: index_factory_string(sum(stop - start for start, stop in ranges), store.dim)
+        for category, ranges in _category_ranges(files).items()
+    }
+
+
+def build_shards(store: EmbeddingStore, files: dict, index_path: Path) -> dict:
+    """
+    Builds one FAISS index per category over that category's rows of the shared
+    store, plus a per-row jurisdiction code array used for prefiltering.
+
+    Args:
+        files: manifest files dict; every entry needs start, count, category and jurisdiction
+
+    Returns:
+        dict: shard section of the manifest
+    """
+    jurisdictions = sorted({entry["jurisdiction"] for entry in files.values()} | {GENERAL})
+    codes = {jurisdiction: code for code, jurisdiction in enumerate(jurisdictions)}
+    row_codes = np.full(store.count, codes[GENERAL], dtype=np.uint16)
+    for entry in files.values():
+        row_codes[entry["start"]:entry["start"] + entry["count"]] = codes[entry["jurisdiction"]]
+    tmp_file = Path(index_path) / f"{ROW_JURISDICTIONS_FILE}.tmp"
+    row_codes.tofile(tmp_file)
+    os.replace(tmp_file, Path(index_path) / ROW_JURISDICTIONS_FILE)
+
+    shards_path = Path(index_path) / SHARDS_DIR
+    for stale in shards_path.glob("*.faiss") if shards_path.exists() else []:
+        stale.unlink()
+    for category, ranges in _category_ranges(files).items():
+        save_faiss_index(build_faiss_index(store, ranges=ranges), shards_path, f"{category}.faiss")
+        logger.info(f"Built shard '{category}' ({sum(stop - start for start, stop in ranges)} chunks)")
+    return {"jurisdictions": jurisdictions, "layout": shard_layout(store, files)}
+
+
+class CorpusShards:
+    """
+    Category shards over the shared embedding store, with jurisdiction prefiltering.
+
+    Every search goes through each selected shard's FAISS index. With a jurisdiction,
+    the search carries an IDSelector over the rows tagged with it (or its parent or
+    children, plus untagged rows only if include_general is set), so the index skips
+    every other row.
+    """
+
+    def __init__(self, index_path: Path, files: dict, shards: dict):
+        self.index_path = Path(index_path)
+        self.store = EmbeddingStore(self.index_path)
+        self.jurisdictions = shards["jurisdictions"]
+        self.ranges = _category_ranges(files)
+        self.indexes = {
+            category: read_faiss_index(self.index_path / SHARDS_DIR, f"{category}.faiss")
+            for category in self.ranges
+        }
+        self.row_codes = np.memmap(self.index_path / ROW_JURISDICTIONS_FILE, dtype=np.uint16, mode="r",
+                                   shape=(self.store.count,))
+        self._selectors = {}
+        self._selectors_lock = threading.Lock()
+
+    @property
+    def categories(self) -> list:
+        return sorted(self.indexes)
+
+    def _select(self, categories) -> list:
+        return [category for category in (categories or []) if category in self.indexes] or self.categories
+
+    def _allowed_codes(self, jurisdiction: str, include_general: bool = False):
+        if not jurisdiction:
+            return None
+        code = normalize_jurisdiction(jurisdiction)
+        #a state matches its country's documents, and a country matches its states' documents
+        wanted = {code, JURISDICTION_PARENTS.get(code)}
+        wanted.update(child for child, parent in JURISDICTION_PARENTS.items() if parent == code)
+        if include_general:
+            wanted.add(GENERAL)
+        return np.array([i for i, name in enumerate(self.jurisdictions) if name in wanted], dtype=np.uint16)
+
+    def _selector(self, allowed: np.ndarray):
+        """
+        Returns a FAISS IDSelector accepting the store rows whose jurisdiction code is in
+        `allowed`, built once per code set. Shard ids are store rows, so it serves every shard.
+        """
+        key = tuple(allowed.tolist())
+        with self._selectors_lock:
+            if key not in self._selectors:
+                bitmap = np.packbits(np.isin(self.row_codes, allowed), bitorder="little")
+                #the selector only points at the bitmap, so both are kept together
+                self._selectors[key] = (bitmap, faiss.IDSelectorBitmap(self.store.count, faiss.swig_ptr(bitmap)))
+            return self._selectors[key][1]
+
+    def search_rows(self, query_vector, k: int = 4, categories=None, jurisdiction: str = None,
+                    include_general: bool = False) -> list:
+        """
+        Returns the top-k (L2 distance, store row) pairs from the given categories,
+        optionally restricted to a jurisdiction (and, with include_general, to documents
+        without one). Unknown categories are ignored; if none remain, every shard is
+        searched. If the jurisdiction filter leaves nothing, the shards are searched unfiltered.
+        """
+        selected = self._select(categories)
+        query = np.asarray(query_vector, dtype=np.float32)[None, :]
+        allowed = self._allowed_codes(jurisdiction, include_general)
+        selector = self._selector(allowed) if allowed is not None else None
+
+        hits = []
+        for category in selected:
+            index = self.indexes[category]
+            params = filtered_search_params(index, selector) if selector is not None else None
+            distances, rows = index.search(query, k, params=params)
+            hits.extend((d, r) for d, r in zip(distances[0].tolist(), rows[0].tolist()) if r != -1)
+
+        if not hits and allowed is not None:
+            logger.info(f"No chunks tagged for jurisdiction '{jurisdiction}' in {selected}; searching unfiltered")
+            return self.search_rows(query_vector, k, selected)
+
+        hits.sort()
+        return hits[:k]
+
+    def search(self, query_vector, k: int = 4, categories=None, jurisdiction: str = None,
+               include_general: bool = False) -> list:
+        """
+        Same as search_rows, but returns the chunks as LangChain documents.
+        """
+        rows = self.search_rows(query_vector, k, categories, jurisdiction, include_general)
+        return [self.store.document(row) for _, row in rows]
+
+    def row_filter(self, categories=None, jurisdiction: str = None, include_general: bool = False):
+        """
+        Returns a callable mapping an array of store rows to a boolean mask of the rows
+        a scoped search may return, for filtering results from other retrievers (BM25).
+        """
+        ranges = [bounds for category in self._select(categories) for bounds in self.ranges[category]]
+        allowed = self._allowed_codes(jurisdiction, include_general)
+
+        def allows(rows: np.ndarray) -> np.ndarray:
+            mask = np.zeros(len(rows), dtype=bool)
+            for start, stop in ranges:
+                mask |= (rows >= start) & (rows < stop)
+            if allowed is not None:
+                mask &= np.isin(self.row_codes[rows], allowed)
+            return mask
+        return allows
+
+    def stats(self) -> dict:
+        return {
+            "shards": {category: int(index.ntotal) for category, index in self.indexes.items()},
+            "jurisdictions": self.jurisdictions,
+        }
+
+    def close(self):
+        """
+        Closes the store and drops the memory-mapped shard indexes and row codes.
+        """
+        self.store.close()
+        self.indexes = {}
+        self.row_codes = None
+        self._selectors = {}
@@ -1,18 +1,153 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
+import threading
+import time
 import os
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+#pool settings shared by the sync and async engines (each engine gets its own pool)
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+DATABASE_POOL_PRE_PING = os.getenv("DATABASE_POOL_PRE_PING", "true").lower() == "true"
+
+#async drivers for the sync URLs we support; ASYNC_DATABASE_URL overrides the mapping
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """
+    Maps a sync DATABASE_URL to the matching async driver (asyncpg, aiosqlite).
+    """
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+class PoolMetrics:
+    """
+    Checkout wait times and utilization of one connection pool.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_checked_out = 0
+        self.pool = None
+        self._lock = threading.Lock()
+
+    def record(self, wait_seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            self.peak_checked_out = max(self.peak_checked_out, self.pool.checkedout())
+
+    def stats(self) -> dict:
+        pool = self.pool
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilization": pool.checkedout() / capacity if capacity else 0.0,
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "average_wait_ms": 1000 * self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+        }
+
+
+class _TimedPoolMixin:
+    """
+    Times every checkout: waiting for a free connection, opening a new one and the pre-ping.
+    """
+    metrics = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        #the engine recreates its pool on dispose(); metrics follow the live pool
+        self.metrics.pool = self
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    metrics = sync_pool_metrics
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": DATABASE_POOL_SIZE,
+        "max_overflow": DATABASE_MAX_OVERFLOW,
+        "pool_timeout": DATABASE_POOL_TIMEOUT,
+        "pool_recycle": DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": DATABASE_POOL_PRE_PING,
+    }
+
+
+#sync engine: background threads (audit writer, generation cache, health monitor) and create_all
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **_pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+#async engine: request handlers, so database I/O never blocks the event loop
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **_pool_options())
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    FastAPI dependency yielding an AsyncSession; use it from `async def` routes.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats() -> dict:
+    """
+    Returns checkout and utilization metrics of both connection pools for monitoring endpoints.
+    """
+    return {"sync": sync_pool_metrics.stats(), "async": async_pool_metrics.stats()}
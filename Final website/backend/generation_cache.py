@@ -0,0 +1,179 @@
+from database import SessionLocal
+from models import GenerationCacheEntry
+from sqlalchemy.exc import SQLAlchemyError
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import hashlib
+import json
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GENERATION_CACHE_ENABLED = os.getenv("GENERATION_CACHE_ENABLED", "true").lower() == "true"
+GENERATION_CACHE_MEMORY_BYTES = int(os.getenv("GENERATION_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+GENERATION_CACHE_MAX_ROWS = int(os.getenv("GENERATION_CACHE_MAX_ROWS", "50000"))
+PRUNE_EVERY_WRITES = 100
+
+
+class GenerationCache:
+    """
+    Content-addressed cache of model outputs.
+
+    Greedy decoding is deterministic, so an output is fully identified by the model id,
+    the decoding parameters and the formatted prompt. Lookups hit a per-process LRU
+    first and then the `generation_cache` table, which survives restarts and is shared
+    by every worker using the same database.
+    """
+
+    def __init__(
+        self,
+        max_memory_bytes: int = GENERATION_CACHE_MEMORY_BYTES,
+        max_rows: int = GENERATION_CACHE_MAX_ROWS,
+        session_factory=SessionLocal,
+    ):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_rows = max_rows
+        self.session_factory = session_factory
+        self._memory = OrderedDict()  # key -> response, least recently used first
+        self._memory_bytes = 0
+        self._lock = threading.Lock()  # guards the LRU, the counters and the prune schedule
+        self._writes_since_prune = 0
+
+        # metrics
+        self.memory_hits = 0
+        self.database_hits = 0
+        self.misses = 0
+        self.database_errors = 0
+
+    @staticmethod
+    def make_key(model_id: str, decoding_params: dict, prompt: str) -> str:
+        payload = json.dumps(
+            {"model_id": model_id, "params": decoding_params, "prompt": prompt},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, response: str):
+        size = len(response.encode("utf-8"))
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = response
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted.encode("utf-8"))
+
+    def get(self, key: str):
+        """
+        Returns the cached output for a key, or None.
+        """
+        with self._lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return response
+
+        db = self.session_factory()
+        try:
+            entry = db.get(GenerationCacheEntry, key)
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.last_accessed = datetime.utcnow()
+            response = entry.response
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning(f"Generation cache lookup failed: {str(e)}")
+            with self._lock:
+                self.database_errors += 1
+                self.misses += 1
+            return None
+        finally:
+            db.close()
+
+        with self._lock:
+            self.database_hits += 1
+        self._remember(key, response)
+        return response
+
+    def put(self, key: str, model_id: str, response: str):
+        """
+        Stores an output in both tiers; database failures only cost a future cache miss.
+        """
+        self._remember(key, response)
+
+        db = self.session_factory()
+        try:
+            db.merge(GenerationCacheEntry(
+                key=key,
+                model_id=model_id,
+                response=response,
+                size=len(response.encode("utf-8")),
+            ))
+            db.commit()
+            #only the write that reaches the threshold prunes, so two prunes never overlap in this process
+            with self._lock:
+                self._writes_since_prune += 1
+                prune = self._writes_since_prune >= PRUNE_EVERY_WRITES
+                if prune:
+                    self._writes_since_prune = 0
+            if prune:
+                self._prune(db)
+        except SQLAlchemyError as e:
+            # Another worker may have inserted the same key first; that is fine
+            db.rollback()
+            with self._lock:
+                self.database_errors += 1
+            logger.warning(f"Generation cache write failed: {str(e)}")
+        finally:
+            db.close()
+
+    def _prune(self, db):
+        """
+        Keeps the table at max_rows by deleting the least recently accessed entries.
+        """
+        cutoff = (
+            db.query(GenerationCacheEntry.last_accessed)
+            .order_by(GenerationCacheEntry.last_accessed.desc())
+            .offset(self.max_rows)
+            .limit(1)
+            .scalar()
+        )
+        if cutoff is None:
+            return
+        deleted = (
+            db.query(GenerationCacheEntry)
+            .filter(GenerationCacheEntry.last_accessed <= cutoff)
+            .delete(synchronize_session=False)
+        )
+        db.commit()
+        logger.info(f"Pruned {deleted} generation cache entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.database_hits + self.misses
+            return {
+                "enabled": GENERATION_CACHE_ENABLED,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_hits": self.memory_hits,
+                "database_hits": self.database_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.database_hits) / lookups if lookups else 0.0,
+                "database_errors": self.database_errors,
+            }
+
+
+generation_cache = GenerationCache()
@@ -0,0 +1,152 @@
+from sqlalchemy import text
+from database import engine, pool_stats
+from model_registry import get_model_registry, PRELOAD_MODEL
+from batch_scheduler import get_batch_scheduler
+from legal_corpus_loader import get_index_version
+import threading
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HEALTH_REFRESH_SECONDS = float(os.getenv("HEALTH_REFRESH_SECONDS", "10"))
+HEALTH_DEEP_MIN_INTERVAL_SECONDS = float(os.getenv("HEALTH_DEEP_MIN_INTERVAL_SECONDS", "300"))
+DEEP_CHECK_QUESTION = "What is a contract?"
+
+
+class HealthMonitor:
+    """
+    Keeps a snapshot of component status (model, index, database, LLM backend) that a
+    background thread refreshes every HEALTH_REFRESH_SECONDS, so probes only read it.
+
+    The deep self-test (retrieval plus a real generation) runs only when asked for,
+    and at most once per HEALTH_DEEP_MIN_INTERVAL_SECONDS.
+    """
+
+    def __init__(self, refresh_seconds: float = HEALTH_REFRESH_SECONDS,
+                 deep_min_interval_seconds: float = HEALTH_DEEP_MIN_INTERVAL_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.deep_min_interval_seconds = deep_min_interval_seconds
+        self.started_at = time.time()
+        self._snapshot = {"ready": False, "checked_at": None, "components": {}}
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._deep_lock = threading.Lock()
+        self._last_deep_check = None
+        self._last_deep_started = 0.0
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None:
+                self.refresh()
+                self._worker = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Health refresh failed: {str(e)}")
+
+    def _check_database(self) -> dict:
+        started = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return {"ok": True, "latency_ms": round(1000 * (time.perf_counter() - started), 1),
+                    "pools": pool_stats()}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def refresh(self):
+        """
+        Re-checks every component and publishes a new snapshot.
+        """
+        registry = get_model_registry()
+        scheduler = get_batch_scheduler()
+        version = get_index_version()
+        components = {
+            # with PRELOAD_MODEL=false the model loads on first use, so it does not gate readiness
+            "model": {"ok": registry.is_loaded or not PRELOAD_MODEL, "loaded": registry.is_loaded,
+                      "model_id": registry.model_id},
+            "index": {"ok": version is not None, "version": version},
+            "database": self._check_database(),
+            "llm_backend": {"ok": scheduler.is_running or not PRELOAD_MODEL, "running": scheduler.is_running,
+                            "queue_depth": scheduler.stats()["queue_depth"]},
+        }
+        self._snapshot = {
+            "ready": all(component["ok"] for component in components.values()),
+            "checked_at": time.time(),
+            "components": components,
+        }
+
+    def liveness(self) -> dict:
+        return {"status": "alive", "uptime_seconds": round(time.time() - self.started_at, 1)}
+
+    def readiness(self) -> dict:
+        """
+        Returns the last snapshot; never runs a check itself.
+        """
+        snapshot = self._snapshot
+        age = time.time() - snapshot["checked_at"] if snapshot["checked_at"] else None
+        return {
+            "status": "ready" if snapshot["ready"] else "not_ready",
+            "checked_seconds_ago": round(age, 1) if age is not None else None,
+            "components": snapshot["components"],
+        }
+
+    def deep_check(self):
+        """
+        Runs retrieval and a short generation end to end, unless one ran within the
+        minimum interval or is still running.
+
+        Returns:
+            tuple: (result dict, seconds until the next run is allowed; 0 if this call ran it)
+        """
+        wait = self._last_deep_started + self.deep_min_interval_seconds - time.time()
+        if wait > 0 or not self._deep_lock.acquire(blocking=False):
+            return self._last_deep_check, max(wait, 1)
+        try:
+            self._last_deep_started = time.time()
+            self._last_deep_check = self._run_deep_check()
+            return self._last_deep_check, 0
+        finally:
+            self._deep_lock.release()
+
+    def _run_deep_check(self) -> dict:
+        # Imported here: the pipeline pulls in the LLM service, which probes should never need
+        from rag_pipeline import build_rag_prompt
+        from llm_service import generate_text
+
+        steps = {}
+        try:
+            started = time.perf_counter()
+            prompt = build_rag_prompt(DEEP_CHECK_QUESTION, rerank=False)
+            steps["retrieval_ms"] = round(1000 * (time.perf_counter() - started), 1)
+            if prompt is None:
+                return {"status": "unhealthy", "error": "No documents retrieved", "steps": steps,
+                        "checked_at": time.time()}
+
+            started = time.perf_counter()
+            answer = generate_text(prompt, use_cache=False)
+            steps["generation_ms"] = round(1000 * (time.perf_counter() - started), 1)
+            steps["response_length"] = len(answer)
+            return {"status": "healthy" if answer else "unhealthy", "steps": steps, "checked_at": time.time()}
+        except Exception as e:
+            logger.error(f"Deep health check failed: {str(e)}")
+            return {"status": "unhealthy", "error": str(e), "steps": steps, "checked_at": time.time()}
+
+
+_monitor = HealthMonitor()
+
+
+def get_health_monitor() -> HealthMonitor:
+    """
+    Returns the process-wide health monitor.
+    """
+    return _monitor
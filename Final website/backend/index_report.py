@@ -0,0 +1,12 @@
+"""
+Compares FAISS index types on the current legal corpus embedding store; the report
+itself is shared with the Watsonx backend (lexora_common/index_report.py):
+
+    python index_report.py --types flat,ivf,hnsw,ivfpq --nprobe 1,8,32 --ef-search 16,64,256
+"""
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.index_report import main
+from legal_corpus_loader import current_index_dir
+
+if __name__ == "__main__":
+    main(current_index_dir)
@@ -1,73 +1,444 @@
-from langchain.document_loaders import DirectoryLoader, TextLoader, PyMuPDFLoader, Docx2txtLoader
+from langchain.document_loaders import TextLoader, PyMuPDFLoader, Docx2txtLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import FAISS
+from bm25_index import BM25Index, build_bm25_index
+from corpus_shards import (
+    CorpusShards,
+    build_shards,
+    category_for_path,
+    detect_jurisdiction,
+    shard_layout,
+)
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.embedding_store import (
+    BatchEncoder,
+    EmbeddingStore,
+    EmbeddingStoreWriter,
+    build_faiss_index,
+    index_factory_string,
+    load_vectorstore,
+    save_faiss_index,
+)
 from pathlib import Path
+from datetime import datetime
+import threading
+import shutil
+import hashlib
+import json
+import os
 import logging
 
 #configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_legal_retriever():
-    """
-    Loads legal documents, splits them into chunks, embeds them and returns a FAISS retriever.
+DOCS_PATH = Path("data/legal_docs/")
+INDEX_ROOT = Path(os.getenv("FAISS_INDEX_PATH", "data/faiss_index"))
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+BUILD_DIR = "building"
+KEEP_VERSIONS = 3
+MANIFEST_FORMAT = 3  # files map to row ranges of the embedding store
+INGEST_CHECKPOINT_ROWS = int(os.getenv("INGEST_CHECKPOINT_ROWS", "5000"))
+SUPPORTED_SUFFIXES = {".txt", ".pdf", ".docx"}
 
-    Returns:
-        FAISS retriever object for querying legal documents
-    """
-    try:
-        #define directory for legal documents
-        docs_path = Path("data/legal_docs/")
-        if not docs_path.exists():
-            logger.error("Legal documents directory not found")
-            raise FileNotFoundError("Legal documents directory not found")
-        
-        #initialize document loader with support for .txt and .pdf and .docx files
-        loader = DirectoryLoader(
-            path=docs_path,
-            glob="**/*.{txt,pdf,docx}",
-            loader_cls=lambda path: (
-                PyMuPDFLoader(path) if path.endswith('.pdf') else
-                Docx2txtLoader(path) if path.endswith('.docx') else
-                TextLoader(path)
-            ),
-            show_progress=True
-        )
-        
-        #load documents
-        logger.info("Loading legal documents...")
-        documents = loader.load()
-        if not documents:
-            logger.error("No documents loaded")
-            raise ValueError("No legal documents found in the directory")
-        
-        #initialize text splitter
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
+_embeddings = None
+_vectorstore = None
+_manifest = None
+_shards = None
+_bm25 = None
+_lock = threading.Lock()
 
-        #split docs into chunks
-        logger.info("Splitting documents into chunks...")
-        chunks = text_splitter.split_documents(documents)
 
-        # initialize embeddings
+def get_embeddings():
+    """
+    Returns the shared MiniLM embedding model, loading it on first use.
+    """
+    global _embeddings
+    if _embeddings is None:
         logger.info("Initializing embeddings...")
-        embeddings = HuggingFaceEmbeddings(
+        _embeddings = HuggingFaceEmbeddings(
             model_name="sentence-transformers/all-MiniLM-L6-v2",
             model_kwargs={'device': 'cpu'}
         )
+    return _embeddings
+
+
+def _file_hash(file_path: Path) -> str:
+    """
+    Returns the SHA-256 of a file's content.
+    """
+    digest = hashlib.sha256()
+    with file_path.open("rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _scan_corpus(docs_path: Path) -> dict:
+    """
+    Maps every supported document under docs_path (relative path) to its content hash.
+    """
+    return {
+        file_path.relative_to(docs_path).as_posix(): _file_hash(file_path)
+        for file_path in sorted(docs_path.rglob("*"))
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_SUFFIXES
+    }
+
+
+def _load_file(file_path: Path) -> list:
+    """
+    Parses a single PDF, DOCX or TXT file into LangChain documents.
+    """
+    suffix = file_path.suffix.lower()
+    if suffix == ".pdf":
+        loader = PyMuPDFLoader(str(file_path))
+    elif suffix == ".docx":
+        loader = Docx2txtLoader(str(file_path))
+    else:
+        loader = TextLoader(str(file_path), encoding="utf-8")
+    return loader.load()
+
+
+def _split_documents(documents: list) -> list:
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len
+    )
+    return text_splitter.split_documents(documents)
+
+
+def _corpus_version(files: dict) -> str:
+    """
+    Derives a stable index version from the per-file content hashes.
+    """
+    digest = hashlib.sha256()
+    for relative_path, file_hash in sorted(files.items()):
+        digest.update(f"{relative_path}:{file_hash}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def current_index_dir(index_root: Path = INDEX_ROOT):
+    """
+    Returns the directory of the index version CURRENT points at, or None if nothing
+    has been published. An index written straight into index_root by older builds is
+    still found.
+    """
+    pointer = index_root / CURRENT_FILE
+    if pointer.exists():
+        return index_root / pointer.read_text(encoding="utf-8").strip()
+    if (index_root / MANIFEST_FILE).exists():
+        return index_root
+    return None
+
+
+def _read_manifest(index_path: Path) -> dict:
+    empty = {"format": MANIFEST_FORMAT, "version": None, "files": {}}
+    if index_path is None:
+        return empty
+    manifest_path = index_path / MANIFEST_FILE
+    if not manifest_path.exists() or not EmbeddingStore.exists(index_path):
+        return empty
+    with manifest_path.open("r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    if manifest.get("format") != MANIFEST_FORMAT:
+        logger.info("Index was built with an older layout; rebuilding from scratch")
+        return empty
+    return manifest
+
+
+def _write_manifest(index_path: Path, manifest: dict):
+    """
+    Writes the manifest atomically so a crash never leaves a half-written file next to the index.
+    """
+    tmp_path = index_path / f"{MANIFEST_FILE}.tmp"
+    with tmp_path.open("w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, index_path / MANIFEST_FILE)
+
+
+def _file_tags(path: str, texts) -> dict:
+    """
+    Category (top-level folder) and jurisdiction of a document, from its path and text.
+    """
+    return {"category": category_for_path(path), "jurisdiction": detect_jurisdiction(path, "\n".join(texts))}
+
+
+def _chunk_records(path: str, file_hash: str, chunks: list, tags: dict) -> list:
+    return [
+        {"id": f"{path}::{file_hash[:12]}::{i}", "text": chunk.page_content, "metadata": {**chunk.metadata, **tags}}
+        for i, chunk in enumerate(chunks)
+    ]
+
+
+def _tag_files(files: dict, store: EmbeddingStore):
+    """
+    Fills in tags for manifest entries written before tagging existed, reading their text back from the store.
+    """
+    for path, entry in files.items():
+        if "category" not in entry or "jurisdiction" not in entry:
+            rows = range(entry["start"], entry["start"] + entry["count"])
+            entry.update(_file_tags(path, (store.chunk(row)["text"] for row in rows)))
+
+
+def _publish_index(build_path: Path, index_root: Path, version: str) -> Path:
+    """
+    Moves a finished build to a new versioned directory and atomically repoints
+    CURRENT at it, so a process starting at any moment finds a complete index.
+    Processes still serving an older version keep reading it until they reload;
+    only the newest KEEP_VERSIONS versions are kept.
+    """
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{version}"
+    os.replace(build_path, index_root / name)
+
+    tmp_pointer = index_root / f"{CURRENT_FILE}.tmp"
+    tmp_pointer.write_text(name, encoding="utf-8")
+    os.replace(tmp_pointer, index_root / CURRENT_FILE)
+
+    versions = sorted(path for path in index_root.iterdir()
+                      if path.is_dir() and path.name != BUILD_DIR and (path / MANIFEST_FILE).exists())
+    for stale in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return index_root / name
+
+
+def _sync_index_type(index_path: Path, manifest: dict):
+    """
+    Rebuilds only the FAISS index and category shards, from the stored vectors, when
+    FAISS_INDEX_TYPE or its parameters changed since the last build, and the BM25 index
+    if it is missing. Nothing is re-embedded.
+    """
+    store = EmbeddingStore(index_path)
+    description = index_factory_string(store.count, store.dim)
+    if manifest.get("index") != description:
+        logger.info(f"FAISS index type changed to {description}; rebuilding it from the stored vectors")
+        save_faiss_index(build_faiss_index(store), index_path)
+        manifest["index"] = description
+        _write_manifest(index_path, manifest)
+
+    _tag_files(manifest["files"], store)
+    if manifest.get("shards", {}).get("layout") != shard_layout(store, manifest["files"]):
+        logger.info("Category shards are missing or out of date; rebuilding them from the stored vectors")
+        manifest["shards"] = build_shards(store, manifest["files"], index_path)
+        _write_manifest(index_path, manifest)
 
-        #create FAISS vectorstore
-        logger.info("Creating FAISS vectorstore...")
-        vectorstore = FAISS.from_documents(chunks, embeddings)
+    if "bm25" not in manifest or not BM25Index.exists(index_path):
+        logger.info("BM25 index is missing; building it from the stored chunks")
+        manifest["bm25"] = build_bm25_index(store, index_path)
+        _write_manifest(index_path, manifest)
+    store.close()
+
+
+def build_legal_index(docs_path: Path = DOCS_PATH, index_root: Path = INDEX_ROOT, release_readers=None):
+    """
+    Brings the on-disk embedding store and FAISS index in sync with the legal documents directory.
+
+    A changed corpus is built into a new versioned directory under index_root, published
+    with _publish_index; the version being served is never modified, except that its FAISS
+    index, shards and BM25 index are rebuilt in place from the stored vectors when
+    FAISS_INDEX_TYPE changed or they are missing. Only files that were added or changed since the last build are re-parsed and
+    re-embedded (in batches, straight into a memory-mapped matrix); unchanged files
+    have their vector rows and chunks copied over from the previous store.
+
+    Files are streamed through load -> split -> embed -> append one at a time, so
+    memory stays flat however large the corpus is. Progress is checkpointed every
+    INGEST_CHECKPOINT_ROWS rows; an interrupted build of the same corpus resumes
+    from its last checkpoint instead of starting over.
+
+    Args:
+        release_readers: optional callable run just before files of the current version
+            are rebuilt in place, to close objects that still have them memory-mapped
+
+    Returns:
+        tuple: (FAISS vectorstore, manifest dict, directory of the version served)
+    """
+    if not docs_path.exists():
+        logger.error("Legal documents directory not found")
+        raise FileNotFoundError("Legal documents directory not found")
+
+    index_path = current_index_dir(index_root)
+    manifest = _read_manifest(index_path)
+    indexed_files = manifest["files"]
+    current_files = _scan_corpus(docs_path)
+
+    added = [path for path in current_files if path not in indexed_files]
+    changed = [path for path in current_files
+               if path in indexed_files and indexed_files[path]["sha256"] != current_files[path]]
+    deleted = [path for path in indexed_files if path not in current_files]
+    logger.info(f"Corpus scan: {len(added)} added, {len(changed)} changed, {len(deleted)} deleted, "
+                f"{len(current_files) - len(added) - len(changed)} unchanged")
+
+    embeddings = get_embeddings()
+    if manifest["version"] is not None and not (added or changed or deleted):
+        if release_readers is not None:
+            release_readers()
+        _sync_index_type(index_path, manifest)
+        return load_vectorstore(index_path, embeddings), manifest, index_path
+
+    previous = EmbeddingStore(index_path) if manifest["version"] is not None else None
+    index_root.mkdir(parents=True, exist_ok=True)
+    build_path = index_root / BUILD_DIR
+    build = {"base_version": manifest["version"], "version": _corpus_version(current_files)}
+
+    #a checkpoint is only reusable if it was building the same corpus on top of the same previous store
+    state = EmbeddingStoreWriter.checkpoint_state(build_path)
+    if state is not None and state["build"] == build:
+        writer = EmbeddingStoreWriter.resume(build_path)
+        files = state["files"]
+    else:
+        shutil.rmtree(build_path, ignore_errors=True)
+        writer = EmbeddingStoreWriter(build_path)
+        files = {}
+    encoder = BatchEncoder(writer, embeddings)
+    checkpointed_rows = writer.count
+
+    #rows stay grouped by file in sorted path order, so each file is one contiguous range
+    for path, file_hash in current_files.items():
+        if path in files:
+            continue  # written before the build was interrupted
+        start = encoder.rows
+        indexed = indexed_files.get(path)
+        if indexed is not None and indexed["sha256"] == file_hash:
+            encoder.flush()
+            writer.copy_rows(previous, indexed["start"], indexed["start"] + indexed["count"])
+            _tag_files({path: indexed}, previous)
+            tags = {"category": indexed["category"], "jurisdiction": indexed["jurisdiction"]}
+        else:
+            chunks = _split_documents(_load_file(docs_path / path))
+            tags = _file_tags(path, (chunk.page_content for chunk in chunks))
+            encoder.add(_chunk_records(path, file_hash, chunks, tags))
+        files[path] = {"sha256": file_hash, "start": start, "count": encoder.rows - start, **tags}
+
+        if encoder.rows - checkpointed_rows >= INGEST_CHECKPOINT_ROWS:
+            encoder.flush()
+            writer.checkpoint({"build": build, "files": files})
+            checkpointed_rows = writer.count
+    encoder.flush()
+    store = writer.close()
+
+    if store.count == 0:
+        logger.error("No documents loaded")
+        shutil.rmtree(build_path, ignore_errors=True)
+        raise ValueError("No legal documents found in the directory")
+
+    save_faiss_index(build_faiss_index(store), build_path)
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "version": build["version"],
+        "index": index_factory_string(store.count, store.dim),
+        "shards": build_shards(store, files, build_path),
+        "bm25": build_bm25_index(store, build_path),
+        "files": files,
+    }
+    _write_manifest(build_path, manifest)
+    store.close()
+    if previous is not None:
+        previous.close()
+    index_path = _publish_index(build_path, index_root, manifest["version"])
+    logger.info(f"Saved FAISS index version {manifest['version']} ({store.count} chunks) to {index_path}")
+    return load_vectorstore(index_path, embeddings), manifest, index_path
+
+
+def _release_index_readers():
+    """
+    Closes the shards and BM25 index, whose memory maps would otherwise keep their
+    files open (and, on Windows, block rebuilding them in place). The new ones are
+    opened by _serve_index. Called with _lock held.
+    """
+    global _shards, _bm25
+    shards, bm25 = _shards, _bm25
+    _shards, _bm25 = None, None
+    for reader in (shards, bm25):
+        if reader is not None:
+            reader.close()
+
+
+def _serve_index(vectorstore, manifest: dict, index_path: Path):
+    """
+    Opens the shards and BM25 index of a freshly loaded build and publishes all four
+    together, so row ids from one build are never resolved against another build's
+    store. Called with _lock held; the vectorstore is set last because unlocked
+    readers check it to see whether an index is loaded.
+    """
+    global _vectorstore, _manifest, _shards, _bm25
+    _shards = CorpusShards(index_path, manifest["files"], manifest["shards"])
+    _bm25 = BM25Index(index_path)
+    _manifest = manifest
+    _vectorstore = vectorstore
+
+
+def refresh_legal_index():
+    """
+    Rebuilds the index incrementally and swaps it into the in-process cache.
+    """
+    with _lock:
+        _serve_index(*build_legal_index(release_readers=_release_index_readers))
+    return _manifest["version"]
+
+
+def get_index_version():
+    """
+    Returns the version of the index currently served, or None if it has not been loaded.
+    """
+    return _manifest["version"] if _manifest else None
+
+
+def get_legal_retriever():
+    """
+    Returns a FAISS retriever over the legal documents.
+
+    The index is loaded from disk once per process and reused; it is only built
+    (incrementally) when no index exists yet or the corpus has changed since the last build.
+
+    Returns:
+        FAISS retriever object for querying legal documents
+    """
+    try:
+        if _vectorstore is None:
+            with _lock:
+                if _vectorstore is None:
+                    logger.info("Loading legal document index...")
+                    _serve_index(*build_legal_index())
+        return _vectorstore.as_retriever()
 
-        #return retriever
-        logger.info("Returning FAISS retriever")
-        return vectorstore.as_retriever()
-    
     except Exception as e:
         logger.error(f"Error in get_legal_retriever: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+def get_corpus_shards() -> CorpusShards:
+    """
+    Returns the per-category shards of the index currently served.
+    """
+    get_legal_retriever()
+    shards = _shards
+    if shards is None:  # a refresh is swapping the index; it holds the lock until the new one is open
+        with _lock:
+            shards = _shards
+    return shards
+
+
+def get_bm25_index() -> BM25Index:
+    """
+    Returns the BM25 inverted index of the index currently served.
+    """
+    get_legal_retriever()
+    bm25 = _bm25
+    if bm25 is None:
+        with _lock:
+            bm25 = _bm25
+    return bm25
+
+
+def loaded_bm25_index():
+    """
+    Returns the BM25 index if it is already open, else None; never loads or builds anything.
+    """
+    return _bm25
+
+
+if __name__ == "__main__":
+    logger.info("🔧 Syncing FAISS index with legal documents...")
+    version = refresh_legal_index()
+    logger.info(f"✅ FAISS index version {version} published under '{INDEX_ROOT}'")
@@ -1,58 +1,160 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer, set_seed
-import torch
+from transformers import TextStreamer
+from batch_scheduler import get_batch_scheduler
+from model_registry import get_model_registry
+from generation_cache import generation_cache, GENERATION_CACHE_ENABLED
+import threading
+import asyncio
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class _AsyncQueueStreamer(TextStreamer):
+    """
+    Hands decoded text from the generating thread to an asyncio queue, so the
+    consumer awaits chunks on the event loop without holding a thread per token.
+    """
+
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop, chunks: asyncio.Queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.chunks = chunks
+
+    def put_chunk(self, chunk):
+        # the client may be gone and its loop closed by the time generation catches up
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.chunks.put_nowait, chunk)
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.put_chunk(text)
+
+def _generation_cache_key(prompt: str) -> str:
+    return generation_cache.make_key(
+        get_model_registry().model_id, get_batch_scheduler().decoding_params(), prompt
+    )
+
+def generate_text(prompt: str, use_cache: bool = True) -> str:
+    """
+    Runs the IBM Granite 3.3-8B-Instruct model on a prompt and returns only the newly generated text.
+
+    The prompt goes through the batching scheduler, so concurrent callers share generate() calls.
+    Identical prompts are served from the generation cache unless use_cache is False.
+    """
+    use_cache = use_cache and GENERATION_CACHE_ENABLED
+    if use_cache:
+        key = _generation_cache_key(prompt)
+        cached = generation_cache.get(key)
+        if cached is not None:
+            logger.info("Generation cache hit")
+            return cached
+
+    logger.info("Generating output...")
+    response = get_batch_scheduler().generate(prompt)
+    logger.info(f"Raw model output: {response}")
+
+    if use_cache and response:
+        generation_cache.put(key, get_model_registry().model_id, response)
+    return response
+
+async def agenerate_text(prompt: str, use_cache: bool = True) -> str:
+    """
+    Async variant of generate_text: awaits the scheduler's Future without tying up a thread,
+    and runs cache database I/O on the default executor.
+    """
+    loop = asyncio.get_running_loop()
+    use_cache = use_cache and GENERATION_CACHE_ENABLED
+    if use_cache:
+        key = _generation_cache_key(prompt)
+        cached = await loop.run_in_executor(None, generation_cache.get, key)
+        if cached is not None:
+            logger.info("Generation cache hit")
+            return cached
+
+    response = await asyncio.wrap_future(get_batch_scheduler().submit(prompt))
+    logger.info(f"Raw model output: {response}")
+
+    if use_cache and response:
+        await loop.run_in_executor(None, generation_cache.put, key, get_model_registry().model_id, response)
+    return response
+
+async def astream_text(prompt: str, use_cache: bool = True):
+    """
+    Yields generated text chunks as soon as the model produces them.
+
+    Generation is queued on the batching scheduler, whose worker pushes decoded text
+    onto an asyncio queue; if the caller stops iterating, generation is stopped too.
+    A cached generation is yielded as a single chunk, and a stream that runs to the
+    end is stored in the generation cache (unless use_cache is False).
+    """
+    loop = asyncio.get_running_loop()
+    use_cache = use_cache and GENERATION_CACHE_ENABLED
+    if use_cache:
+        key = _generation_cache_key(prompt)
+        cached = await loop.run_in_executor(None, generation_cache.get, key)
+        if cached is not None:
+            logger.info("Generation cache hit")
+            yield cached
+            return
+
+    chunks = asyncio.Queue()
+    streamer = _AsyncQueueStreamer(get_model_registry().get_tokenizer(), loop, chunks)
+    cancelled = threading.Event()
+    generation = get_batch_scheduler().submit_stream(prompt, streamer, cancelled)
+    # the end marker follows every chunk, since all of them are queued before the Future resolves
+    generation.add_done_callback(lambda _: streamer.put_chunk(None))
+    parts = []
+    try:
+        while (chunk := await chunks.get()) is not None:
+            parts.append(chunk)
+            yield chunk
+        await asyncio.wrap_future(generation)
+    finally:
+        cancelled.set()
+        generation.cancel()  # drops it if still queued
+
+    response = "".join(parts).strip()
+    if use_cache and response:
+        await loop.run_in_executor(None, generation_cache.put, key, get_model_registry().model_id, response)
+
+def parse_response(response: str) -> dict:
+    """
+    Parses "Explanation:" / "Domain:" lines out of a model response.
+    """
+    explanation, domain = "", ""
+    for line in response.splitlines():
+        if line.lower().startswith("explanation:"):
+            explanation = line.split(":", 1)[1].strip()
+        elif line.lower().startswith("domain:"):
+            domain = line.split(":", 1)[1].strip()
+
+    return {
+        "explanation": explanation,
+        "legal_domain": domain
+    }
+
 def query_model(prompt: str) -> dict:
     """
     Queries the IBM Granite 3.3-8B-Instruct model with a prompt and returns generated text.
     """
     try:
-        model_id = "ibm-granite/granite-3.3-8b-instruct"
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device: {device}")
-
-        # Load model and tokenizer
-        logger.info("Loading Granite model and tokenizer...")
-        tokenizer = AutoTokenizer.from_pretrained(model_id)
-        model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.bfloat16)
-        model.to(device)
-
-        # Tokenize the prompt
-        inputs = tokenizer(prompt, return_tensors="pt").to(device)
-
-        # Generate response
-        logger.info("Generating output...")
-        set_seed(42)
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=400,
-            do_sample=False,
-            temperature=0.0,
-        )
-
-        # Decode output
-        response = tokenizer.decode(
-            outputs[0], skip_special_tokens=True
-        ).strip()
-        logger.info(f"Raw model output: {response}")
+        response = generate_text(prompt)
         print(f"\n🧠 MODEL RESPONSE:\n{response}\n")
 
         #parse response into dict
-        explanation, domain = "", ""
-        for line in response.splitlines():
-            if line.lower().startswith("explanation:"):
-                explanation = line.split(":", 1)[1].strip()
-            elif line.lower().startswith("domain:"):
-                domain = line.split(":", 1)[1].strip()
-
-        return {
-            "explanation": explanation,
-            "legal_domain": domain
-        }
+        return parse_response(response)
+
+    except Exception as e:
+        logger.error(f"Error querying model: {str(e)}")
+        return "Error generating output"
+
+async def aquery_model(prompt: str) -> dict:
+    """
+    Async variant of query_model that does not block the event loop.
+    """
+    try:
+        return parse_response(await agenerate_text(prompt))
 
     except Exception as e:
         logger.error(f"Error querying model: {str(e)}")
@@ -0,0 +1,150 @@
+from transformers import AutoModelForCausalLM, AutoTokenizer
+import torch
+import threading
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_ID = os.getenv("IBM_MODEL_ID", "ibm-granite/granite-3.3-8b-instruct")
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "true").lower() == "true"
+
+
+def _resident_memory_mb():
+    """
+    Returns the current resident set size of this process in megabytes, or None
+    where neither /proc nor the Unix resource module is available (Windows).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        # Not on Linux: fall back to the peak RSS (kilobytes on Linux/BSD, bytes on macOS)
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (ImportError, AttributeError, OSError):
+        return None
+    return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+
+
+class ModelRegistry:
+    """
+    Loads the Granite model and tokenizer once per process and shares them across all routes.
+    """
+
+    def __init__(self, model_id: str = MODEL_ID):
+        self.model_id = model_id
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.tokenizer = None
+        self.model = None
+        self.load_time_seconds = None
+        self.warmup_time_seconds = None
+        self.resident_memory_mb = None
+        self.gpu_memory_mb = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None and self.tokenizer is not None
+
+    def load(self):
+        """
+        Loads and warms up the model and tokenizer. Safe to call from several threads;
+        only the first caller pays for the load.
+
+        Returns:
+            tuple: (tokenizer, model)
+        """
+        if self.is_loaded:
+            return self.tokenizer, self.model
+
+        with self._lock:
+            if self.is_loaded:
+                return self.tokenizer, self.model
+
+            logger.info(f"Loading Granite model and tokenizer ({self.model_id}) on {self.device}...")
+            start = time.perf_counter()
+            tokenizer = self.tokenizer or self._load_tokenizer()
+            model = AutoModelForCausalLM.from_pretrained(self.model_id, torch_dtype=torch.bfloat16)
+            model.to(self.device)
+            model.eval()
+            self.load_time_seconds = time.perf_counter() - start
+
+            self.warmup_time_seconds = self._warmup(tokenizer, model)
+
+            self.resident_memory_mb = _resident_memory_mb()
+            if self.device == "cuda":
+                self.gpu_memory_mb = torch.cuda.memory_allocated() / (1024 * 1024)
+
+            # Publish only once fully loaded so other threads never see a half-initialized pair
+            self.tokenizer, self.model = tokenizer, model
+            rss = f"{self.resident_memory_mb:.0f} MB" if self.resident_memory_mb is not None else "unknown"
+            logger.info(
+                f"✅ Granite model ready: load {self.load_time_seconds:.1f}s, "
+                f"warmup {self.warmup_time_seconds:.1f}s, RSS {rss}"
+            )
+            return self.tokenizer, self.model
+
+    def _load_tokenizer(self):
+        tokenizer = AutoTokenizer.from_pretrained(self.model_id)
+        # Decoder-only generation needs left padding when prompts are batched
+        tokenizer.padding_side = "left"
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        return tokenizer
+
+    def get_tokenizer(self):
+        """
+        Returns the Granite tokenizer without loading the model, for counting prompt tokens.
+        """
+        if self.tokenizer is None:
+            with self._lock:
+                if self.tokenizer is None:
+                    self.tokenizer = self._load_tokenizer()
+        return self.tokenizer
+
+    def _warmup(self, tokenizer, model) -> float:
+        """
+        Runs a single short generation so the first real request does not pay for lazy initialization.
+        """
+        start = time.perf_counter()
+        inputs = tokenizer("Hello", return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            model.generate(**inputs, max_new_tokens=1, do_sample=False)
+        return time.perf_counter() - start
+
+    def get(self):
+        """
+        Returns the shared (tokenizer, model) pair, loading it on first use.
+        """
+        return self.load()
+
+    def stats(self) -> dict:
+        """
+        Returns load statistics for health and monitoring endpoints.
+        """
+        return {
+            "model_id": self.model_id,
+            "device": self.device,
+            "loaded": self.is_loaded,
+            "load_time_seconds": self.load_time_seconds,
+            "warmup_time_seconds": self.warmup_time_seconds,
+            "resident_memory_mb": self.resident_memory_mb,
+            "gpu_memory_mb": self.gpu_memory_mb,
+        }
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Returns the process-wide model registry.
+    """
+    return _registry
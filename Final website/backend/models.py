@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Date, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -12,6 +12,20 @@ class Query(Base):
     response = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
+    # history pages walk (timestamp, id) newest first
+    __table_args__ = (
+        Index("ix_queries_timestamp_id", "timestamp", "id"),
+    )
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+    key = Column(String(64), primary_key=True)
+    model_id = Column(String(255), nullable=False)
+    response = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)
+
 class Upload(Base):
     __tablename__ = "uploads"
     id = Column(Integer, primary_key=True, index=True)
@@ -25,4 +39,16 @@ class Log(Base):
     id = Column(Integer, primary_key=True, index=True)
     event_type = Column(String(50))
     details = Column(Text)
-    timestamp = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    # (timestamp, id) serves unfiltered pages and retention; event_type first serves filtered pages
+    __table_args__ = (
+        Index("ix_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_logs_event_type_timestamp_id", "event_type", "timestamp", "id"),
+    )
+
+class LogDailyRollup(Base):
+    __tablename__ = "log_daily_rollups"
+    day = Column(Date, primary_key=True)
+    event_type = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
\ No newline at end of file
@@ -0,0 +1,36 @@
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.prompt_registry import PromptRegistry
+
+#every template and the placeholders it must use, no more and no fewer
+PROMPT_FIELDS = {
+    "rag_qa_prompt": {"context", "question"},
+    "explainer_prompt": {"clause", "context"},
+    "nda_prompt": {"party_1", "party_2", "jurisdiction", "purpose", "context"},
+    "comparator_prompt": {"clause_type", "country_1", "country_2", "context_1", "context_2"},
+}
+
+#used, with a warning, when the file is missing
+DEFAULT_TEMPLATES = {
+    "rag_qa_prompt": """
+        You are a legal expert. Using the provided context, answer the question accurately and concisely.
+        Context: {context}
+        Question: {question}
+        Answer:
+        """,
+}
+
+_registry = PromptRegistry(PROMPT_FIELDS, DEFAULT_TEMPLATES)
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """
+    Returns the process-wide prompt registry.
+    """
+    return _registry
+
+
+def render_prompt(name: str, /, **values) -> str:
+    """
+    Renders a prompt template by name (file name without .txt) from the shared registry.
+    """
+    return _registry.render(name, **values)
@@ -1,78 +1,320 @@
-from langchain.prompts import PromptTemplate
-from legal_corpus_loader import get_legal_retriever
-from pathlib import Path
+from legal_corpus_loader import (
+    get_legal_retriever,
+    get_embeddings,
+    get_index_version,
+    get_corpus_shards,
+    get_bm25_index,
+)
+from semantic_cache import semantic_cache, SEMANTIC_CACHE_ENABLED
+from reranker import get_reranker, RAG_RERANK_ENABLED, RAG_RERANK_CANDIDATES, RAG_RERANK_TOP_N
+from context_packer import pack_context, RAG_CONTEXT_TOKEN_BUDGET, RAG_PROMPT_TOKEN_BUDGET
+from prompt_registry import get_prompt_registry
+from model_registry import get_model_registry
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import asyncio
+import os
 import logging
-from llm_service import query_model
+from llm_service import generate_text, agenerate_text
 
 #configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_rag_pipeline(question: str) -> str:
+NO_DOCUMENTS_ANSWER = "No relevant documents found to answer the question"
+NO_ANSWER = "No answer could be generated from the provided context"
+
+#"dense" searches FAISS only; "hybrid" fuses FAISS and BM25 rankings with reciprocal rank fusion
+RETRIEVAL_MODES = ("dense", "hybrid")
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "dense")
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RAG_TOP_K = 4  # chunks in the prompt without reranking
+
+#retrieval (query embedding + FAISS search) is CPU-bound, so async callers run it on its own bounded pool
+_retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_RETRIEVAL_WORKERS", "4")),
+    thread_name_prefix="rag-retrieval"
+)
+
+def _retrieval_mode(mode=None) -> str:
+    mode = (mode or RAG_RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {', '.join(RETRIEVAL_MODES)}")
+    return mode
+
+def _rerank_enabled(rerank=None) -> bool:
+    return RAG_RERANK_ENABLED if rerank is None else rerank
+
+def _cache_namespace(scope, mode=None, rerank=None) -> str:
+    """
+    Semantic cache namespace of a retrieval scope, mode and rerank setting, so answers
+    are only reused when their context was retrieved the same way.
+    """
+    namespace = ""
+    if scope:
+        namespace = f"{','.join(sorted(scope.get('categories') or []))}|{scope.get('jurisdiction') or ''}"
+        if scope.get("include_general"):
+            namespace += "|general"
+    if _retrieval_mode(mode) != "dense":
+        namespace += f"#{_retrieval_mode(mode)}"
+    if _rerank_enabled(rerank):
+        namespace += "+rerank"
+    return namespace
+
+def _reciprocal_rank_fusion(rankings: list, k: int) -> list:
+    """
+    Fuses ranked lists of store rows: each row scores sum(1 / (RRF_K + rank)) over the
+    lists it appears in. Only ranks are used, so BM25 and L2 scores need no calibration.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return sorted(scores, key=lambda row: -scores[row])[:k]
+
+def _hybrid_search(question: str, query_vector=None, k: int = 4, scope=None) -> list:
+    """
+    Top-k chunks from fusing the dense (FAISS) and lexical (BM25) rankings of
+    RAG_HYBRID_CANDIDATES candidates each, within the same scope.
+    """
+    vectorstore = get_legal_retriever().vectorstore
+    if query_vector is None:
+        query_vector = get_embeddings().embed_query(question)
+    candidates = max(k, RAG_HYBRID_CANDIDATES)
+
+    if scope:
+        shards = get_corpus_shards()
+        dense = [row for _, row in shards.search_rows(query_vector, candidates, **scope)]
+        allowed = shards.row_filter(**scope)
+    else:
+        _, rows = vectorstore.index.search(np.asarray([query_vector], dtype=np.float32), candidates)
+        dense = [row for row in rows[0].tolist() if row != -1]
+        allowed = None
+    lexical = [row for _, row in get_bm25_index().search(question, candidates, allowed)]
+
+    return [vectorstore.docstore.search(str(row)) for row in _reciprocal_rank_fusion([dense, lexical], k)]
+
+def _search(question: str, query_vector=None, k: int = 4, scope=None, mode=None) -> list:
+    """
+    Top-k chunks for a question: from the category shards (optionally filtered by
+    jurisdiction) when a scope is given, otherwise from the full index.
+
+    Args:
+        scope(dict): optional {"categories": [...], "jurisdiction": "...", "include_general": bool};
+            include_general also admits documents without a jurisdiction
+        mode(str): "dense" or "hybrid"; defaults to RAG_RETRIEVAL_MODE
+    """
+    if _retrieval_mode(mode) == "hybrid":
+        return _hybrid_search(question, query_vector, k, scope)
+    if scope:
+        if query_vector is None:
+            query_vector = get_embeddings().embed_query(question)
+        return get_corpus_shards().search(query_vector, k=k, **scope)
+
+    vectorstore = get_legal_retriever().vectorstore
+    if query_vector is not None:
+        return vectorstore.similarity_search_by_vector(query_vector, k=k)
+    return vectorstore.similarity_search(question, k=k)
+
+def _retrieve(question: str, query_vector=None, k: int = None, scope=None, mode=None, rerank=None,
+              candidates: int = None) -> list:
+    """
+    Chunks for a prompt: the top-k search results or, with reranking, the k best of a
+    wider candidate set (RAG_RERANK_CANDIDATES) by cross-encoder score.
+
+    Args:
+        k(int): chunks to return; defaults to RAG_RERANK_TOP_N with reranking, RAG_TOP_K without
+        rerank(bool): defaults to RAG_RERANK_ENABLED
+        candidates(int): search results to rerank; defaults to RAG_RERANK_CANDIDATES
+    """
+    if not _rerank_enabled(rerank):
+        return _search(question, query_vector, k or RAG_TOP_K, scope, mode)
+    k = k or RAG_RERANK_TOP_N
+    docs = _search(question, query_vector, max(k, candidates or RAG_RERANK_CANDIDATES), scope, mode)
+    return get_reranker().rerank(question, docs, k)
+
+def build_rag_prompt(question: str, query_vector=None, scope=None, mode=None, rerank=None, k: int = None,
+                     candidates: int = None):
+    """
+    Retrieves context for a legal question and formats the RAG prompt.
+
+    Args:
+        question(str): The user's legal question
+        query_vector(list): the question's embedding, if already computed
+        scope(dict): optional retrieval scope, see _search
+        mode(str): optional retrieval mode, see _search
+        rerank(bool), k(int), candidates(int): optional rerank settings, see _retrieve
+
+    Returns:
+        str: the formatted prompt, or None if no relevant documents were found
+    """
+    #fetch relevant documents
+    logger.info("Retrieving relevant documents...")
+    docs = _retrieve(question, query_vector, k, scope, mode, rerank, candidates)
+    if not docs:
+        logger.warning("No relevant documents found")
+        return None
+
+    #the whole prompt must fit RAG_PROMPT_TOKEN_BUDGET, so the template and question come off the context's share
+    registry = get_prompt_registry()
+    tokenizer = get_model_registry().get_tokenizer()
+    overhead = registry.get("rag_qa_prompt").count_tokens(tokenizer, context="", question=question)
+    token_budget = max(0, min(RAG_CONTEXT_TOKEN_BUDGET, RAG_PROMPT_TOKEN_BUDGET - overhead))
+
+    #merge overlapping chunks, drop near-duplicates and fit the context to the token budget
+    context = pack_context(docs, token_budget, tokenizer)
+
+    #format the prompt
+    return registry.render("rag_qa_prompt", context=context, question=question)
+
+def retrieve_contexts(questions: list, k: int = 4, scopes=None, mode=None, rerank=None,
+                      token_budget: int = RAG_CONTEXT_TOKEN_BUDGET) -> list:
+    """
+    Retrieval-only context mode: returns the joined top-k chunks for each question
+    without generating an answer.
+
+    All questions are embedded in a single batch, so several contexts cost one
+    embedding pass plus one FAISS search per question.
+
+    Args:
+        questions(list): legal questions to gather context for
+        k(int): number of chunks per question
+        scopes(list): optional retrieval scope per question, see _search
+        mode(str): optional retrieval mode, see _search
+        rerank(bool): rerank a wider candidate set down to k, see _retrieve
+        token_budget(int): maximum tokens per context
+
+    Returns:
+        list: one context string per question (empty if nothing relevant was found)
+    """
+    query_vectors = get_embeddings().embed_documents(questions)
+    scopes = scopes or [None] * len(questions)
+
+    contexts = []
+    for question, query_vector, scope in zip(questions, query_vectors, scopes):
+        docs = _retrieve(question, query_vector, k, scope, mode, rerank)
+        if not docs:
+            logger.warning(f"No relevant documents found for: {question}")
+        contexts.append(pack_context(docs, token_budget) if docs else "")
+    return contexts
+
+async def aretrieve_contexts(questions: list, k: int = 4, scopes=None, mode=None, rerank=None,
+                             token_budget: int = RAG_CONTEXT_TOKEN_BUDGET) -> list:
+    """
+    Async variant of retrieve_contexts, run on the bounded retrieval pool.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _retrieval_executor, retrieve_contexts, questions, k, scopes, mode, rerank, token_budget
+    )
+
+def _prepare_rag(question: str, use_cache: bool = True, scope=None, mode=None, rerank=None):
+    """
+    Embeds the question once, checks the semantic cache (unless use_cache is False) and,
+    on a miss, builds the RAG prompt from the same embedding.
+
+    Returns:
+        tuple: (cached answer or None, question vector, formatted prompt or None)
+    """
+    if not SEMANTIC_CACHE_ENABLED:
+        return None, None, build_rag_prompt(question, scope=scope, mode=mode, rerank=rerank)
+
+    get_legal_retriever()
+    query_vector = get_embeddings().embed_query(question)
+    namespace = _cache_namespace(scope, mode, rerank)
+    cached_answer = semantic_cache.lookup(query_vector, get_index_version(), namespace) if use_cache else None
+    if cached_answer is not None:
+        logger.info(f"Semantic cache hit for question: {question}")
+        return cached_answer, query_vector, None
+
+    return None, query_vector, build_rag_prompt(question, query_vector, scope, mode, rerank)
+
+def cache_answer(question: str, query_vector, answer: str, scope=None, mode=None, rerank=None):
+    """
+    Stores an answer in the semantic cache under the question vector from prepare_rag.
+    """
+    if query_vector is not None and answer not in (NO_ANSWER, NO_DOCUMENTS_ANSWER):
+        semantic_cache.store(question, query_vector, answer, get_index_version(), _cache_namespace(scope, mode, rerank))
+
+async def aprepare_rag(question: str, use_cache: bool = True, scope=None, mode=None, rerank=None):
+    """
+    Async variant of _prepare_rag, run on the bounded retrieval pool, for callers that
+    generate the answer themselves (e.g. streaming) and store it with cache_answer.
+
+    Returns:
+        tuple: (cached answer or None, question vector, formatted prompt or None)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_retrieval_executor, _prepare_rag, question, use_cache, scope, mode, rerank)
+
+def _finalize_answer(answer: str) -> str:
+    if not answer:
+        logger.warning("No answer generated")
+        return NO_ANSWER
+    return answer.strip()
+
+def run_rag_pipeline(question: str, use_cache: bool = True, scope=None, mode=None, rerank=None) -> str:
     """
     Runs a Retrieval-Augmented Generation pipeline to answer a legal question.
 
     Args:
         question(str): The user's legal question
+        use_cache(bool): whether cached answers and generations may be reused
+        scope(dict): optional {"categories": [...], "jurisdiction": "..."} to search only those shards
+        mode(str): "dense" (FAISS only) or "hybrid" (FAISS fused with BM25); defaults to RAG_RETRIEVAL_MODE
+        rerank(bool): rerank RAG_RERANK_CANDIDATES chunks down to RAG_RERANK_TOP_N; defaults to RAG_RERANK_ENABLED
 
     Returns:
         str: the generated answer
     """
 
     try:
-        #load prompt template
-        prompt_path = Path("prompts/rag_qa_prompt.txt")
-        if prompt_path.exists():
-            with prompt_path.open("r") as file:
-                prompt_template = file.read()
-        else:
-            #default prompt if file not found
-            prompt_template = """
-            You are a legal expert. Using the provided context, answer the question accurately and concisely.
-            Context: {context}
-            Question: {question}
-            Answer:
-            """
-            logger.warning("Prompt template not found, using default prompt template")
-
-        #initialize prompt
-        prompt = PromptTemplate(
-            input_variables=[
-                "context",
-                "question"
-            ],
-            template=prompt_template
-        )
-
-        #get retriever
-        logger.info("Loading legal retriever...")
-        retriever = get_legal_retriever()
-
-        #fetch relevant documents
-        logger.info("Retrieving relevant documents...")
-        docs = retriever.get_relevant_documents(question)
-        if not docs:
-            logger.warning("No relevant documents found")
-            return "No relevant documents found to answer the question"
-        
-        #combine document content as context
-        context = "\n".join([doc.page_content for doc in docs])
-
-        #format the prompt
-        formatted_prompt = prompt.format(context=context, question=question)
+        cached_answer, query_vector, formatted_prompt = _prepare_rag(question, use_cache, scope, mode, rerank)
+        if cached_answer is not None:
+            return cached_answer
+        if formatted_prompt is None:
+            return NO_DOCUMENTS_ANSWER
 
         #query llm service
         logger.info(f"Processing question: {question}")
-        answer = query_model(formatted_prompt)
+        answer = _finalize_answer(generate_text(formatted_prompt, use_cache=use_cache))
+        cache_answer(question, query_vector, answer, scope, mode, rerank)
 
         #return the answer
-        if not answer:
-            logger.warning("No answer generated")
-            return "No answer could be generated from the provided context"
-        
-        return answer.strip()
+        return answer
     
     except Exception as e:
         logger.error(f"Error in RAG pipeline: {str(e)}")
         raise
-    
\ No newline at end of file
+
+async def arun_rag_pipeline(question: str, use_cache: bool = True, scope=None, mode=None, rerank=None) -> str:
+    """
+    Async variant of run_rag_pipeline: retrieval and generation run off the event loop.
+
+    Args:
+        question(str): The user's legal question
+        use_cache(bool): whether cached answers and generations may be reused
+        scope(dict): optional retrieval scope, see run_rag_pipeline
+        mode(str): optional retrieval mode, see run_rag_pipeline
+        rerank(bool): optional rerank setting, see run_rag_pipeline
+
+    Returns:
+        str: the generated answer
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        cached_answer, query_vector, formatted_prompt = await aprepare_rag(question, use_cache, scope, mode, rerank)
+        if cached_answer is not None:
+            return cached_answer
+        if formatted_prompt is None:
+            return NO_DOCUMENTS_ANSWER
+
+        logger.info(f"Processing question: {question}")
+        answer = _finalize_answer(await agenerate_text(formatted_prompt, use_cache=use_cache))
+        cache_answer(question, query_vector, answer, scope, mode, rerank)
+        return answer
+
+    except Exception as e:
+        logger.error(f"Error in RAG pipeline: {str(e)}")
+        raise
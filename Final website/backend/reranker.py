@@ -0,0 +1,200 @@
+"""
+Cross-encoder reranking of retrieved chunks.
+
+Run as a script to benchmark the effect of reranking on prompt size and latency:
+
+    python reranker.py --candidates 20 --top-n 3 [--generate]
+"""
+from collections import OrderedDict
+import threading
+import hashlib
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RAG_RERANK_ENABLED = os.getenv("RAG_RERANK_ENABLED", "false").lower() == "true"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RAG_RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+RAG_RERANK_TOP_N = int(os.getenv("RAG_RERANK_TOP_N", "3"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "20000"))
+RERANK_MAX_LENGTH = 512
+
+
+class Reranker:
+    """
+    Scores (question, chunk) pairs with a small CPU cross-encoder and keeps the best ones.
+
+    Scores are cached per (model, question, chunk text), so the same question asked
+    again (a retry, a streaming request after a non-streaming one, a comparator
+    re-run) only pays for chunks it has not scored before.
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, max_cache_entries: int = RERANK_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.max_cache_entries = max_cache_entries
+        self.model = None
+        self._scores = OrderedDict()  # pair key -> score, least recently used first
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        # metrics
+        self.requests = 0
+        self.pairs_scored = 0
+        self.cache_hits = 0
+        self.total_rerank_seconds = 0.0
+
+    def load(self):
+        if self.model is None:
+            with self._load_lock:
+                if self.model is None:
+                    # Imported lazily so the model (and sentence-transformers) is only loaded when reranking is used
+                    from sentence_transformers import CrossEncoder
+
+                    logger.info(f"Loading reranker ({self.model_name}) on cpu...")
+                    self.model = CrossEncoder(self.model_name, max_length=RERANK_MAX_LENGTH, device="cpu")
+        return self.model
+
+    def _key(self, question: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{question}\0{text}".encode("utf-8")).hexdigest()
+
+    def score(self, question: str, texts: list) -> list:
+        """
+        Returns one relevance score per text (higher is more relevant).
+        """
+        keys = [self._key(question, text) for text in texts]
+        scores = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._scores:
+                    self._scores.move_to_end(key)
+                    scores[i] = self._scores[key]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.cache_hits += len(texts) - len(missing)
+        if not missing:
+            return scores
+
+        predicted = self.load().predict(
+            [(question, texts[i]) for i in missing], batch_size=RERANK_BATCH_SIZE, show_progress_bar=False
+        )
+        self.pairs_scored += len(missing)
+        with self._lock:
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self._scores[keys[i]] = scores[i]
+            while len(self._scores) > self.max_cache_entries:
+                self._scores.popitem(last=False)
+        return scores
+
+    def rerank(self, question: str, docs: list, top_n: int = RAG_RERANK_TOP_N) -> list:
+        """
+        Returns the top_n documents by cross-encoder score, best first.
+        """
+        if not docs:
+            return []
+        started = time.perf_counter()
+        scores = self.score(question, [doc.page_content for doc in docs])
+        ranked = sorted(range(len(docs)), key=lambda i: -scores[i])[:top_n]
+        self.requests += 1
+        self.total_rerank_seconds += time.perf_counter() - started
+        return [docs[i] for i in ranked]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RAG_RERANK_ENABLED,
+            "model": self.model_name,
+            "loaded": self.model is not None,
+            "candidates": RAG_RERANK_CANDIDATES,
+            "top_n": RAG_RERANK_TOP_N,
+            "requests": self.requests,
+            "pairs_scored": self.pairs_scored,
+            "cache_hits": self.cache_hits,
+            "cache_entries": len(self._scores),
+            "average_rerank_ms": 1000 * self.total_rerank_seconds / self.requests if self.requests else 0.0,
+        }
+
+
+_reranker = Reranker()
+
+
+def get_reranker() -> Reranker:
+    """
+    Returns the process-wide reranker.
+    """
+    return _reranker
+
+
+BENCHMARK_QUESTIONS = [
+    "What is a non-compete clause and when is it enforceable?",
+    "How long do confidentiality obligations last after an NDA ends?",
+    "What remedies are available for breach of a confidentiality agreement?",
+    "What does an indemnification clause cover?",
+    "Which law governs a contract between parties in different countries?",
+    "Can an employer restrict an employee from soliciting clients after termination?",
+    "What is the difference between a mutual and a unilateral NDA?",
+    "When can a party terminate a services agreement for convenience?",
+]
+
+
+def _benchmark(questions: list, candidates: int, top_n: int, baseline_k: int, generate: bool):
+    # Imported here so importing the reranker from the pipeline does not import the pipeline back
+    from rag_pipeline import build_rag_prompt
+    from model_registry import get_model_registry
+    from llm_service import generate_text
+
+    tokenizer = get_model_registry().get_tokenizer()
+    rows = []
+    for question in questions:
+        row = {"question": question}
+        for label, kwargs in (("baseline", {"k": baseline_k, "rerank": False}),
+                              ("rerank", {"k": top_n, "rerank": True, "candidates": candidates})):
+            started = time.perf_counter()
+            prompt = build_rag_prompt(question, **kwargs)
+            row[f"{label}_retrieve_ms"] = 1000 * (time.perf_counter() - started)
+            row[f"{label}_tokens"] = len(tokenizer(prompt or "")["input_ids"])
+            if generate and prompt:
+                started = time.perf_counter()
+                generate_text(prompt, use_cache=False)
+                row[f"{label}_generate_s"] = time.perf_counter() - started
+        rows.append(row)
+    return rows
+
+
+def _print_benchmark(rows: list, generate: bool):
+    columns = ["baseline_tokens", "rerank_tokens", "baseline_retrieve_ms", "rerank_retrieve_ms"]
+    if generate:
+        columns += ["baseline_generate_s", "rerank_generate_s"]
+    print(f"{'question':<48} " + " ".join(f"{column:>20}" for column in columns))
+    for row in rows:
+        print(f"{row['question'][:47]:<48} " + " ".join(f"{row.get(column, 0):>20.1f}" for column in columns))
+    means = {column: sum(row.get(column, 0) for row in rows) / len(rows) for column in columns}
+    print(f"{'mean':<48} " + " ".join(f"{means[column]:>20.1f}" for column in columns))
+    if means["baseline_tokens"]:
+        print(f"Prompt tokens: {100 * (1 - means['rerank_tokens'] / means['baseline_tokens']):.0f}% fewer with reranking")
+    if generate and means["baseline_generate_s"]:
+        baseline = means["baseline_retrieve_ms"] / 1000 + means["baseline_generate_s"]
+        reranked = means["rerank_retrieve_ms"] / 1000 + means["rerank_generate_s"]
+        print(f"End-to-end: {baseline:.2f}s -> {reranked:.2f}s per question")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prompt-size and latency benchmark for the rerank stage")
+    parser.add_argument("--questions", help="file with one question per line (default: built-in sample)")
+    parser.add_argument("--candidates", type=int, default=RAG_RERANK_CANDIDATES)
+    parser.add_argument("--top-n", type=int, default=RAG_RERANK_TOP_N)
+    parser.add_argument("--baseline-k", type=int, default=4)
+    parser.add_argument("--generate", action="store_true", help="also time Granite generation for both prompts")
+    args = parser.parse_args()
+
+    questions = BENCHMARK_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as file:
+            questions = [line.strip() for line in file if line.strip()]
+    logger.info(f"📊 Benchmarking reranking on {len(questions)} questions...")
+    _print_benchmark(_benchmark(questions, args.candidates, args.top_n, args.baseline_k, args.generate), args.generate)
@@ -0,0 +1,210 @@
+"""
+Retention for the append-only audit tables.
+
+Log rows older than LOG_RETENTION_DAYS are folded into per-day, per-event counts
+(`log_daily_rollups`) and deleted; Query rows are pruned after QUERY_RETENTION_DAYS
+(0 keeps them forever). Run as a script for a one-off pass:
+
+    python retention.py
+"""
+from database import SessionLocal
+from models import Query, Log, LogDailyRollup
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from collections import Counter
+from datetime import datetime, timedelta
+import threading
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "true").lower() == "true"
+RETENTION_INTERVAL_SECONDS = float(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "90"))
+QUERY_RETENTION_DAYS = int(os.getenv("QUERY_RETENTION_DAYS", "0"))
+UNKNOWN_EVENT_TYPE = "unknown"
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _cutoff(days: int) -> datetime:
+    """
+    Midnight (UTC) `days` days ago, so a day is always rolled up whole.
+    """
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=days)
+
+
+def _add_counts(db, counts: Counter):
+    """
+    Adds (day, event_type) counts to the rollup table, creating missing rows.
+    """
+    insert = _UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        for (day, event_type), count in counts.items():
+            rollup = db.get(LogDailyRollup, (day, event_type))
+            if rollup is None:
+                db.add(LogDailyRollup(day=day, event_type=event_type, count=count))
+            else:
+                rollup.count += count
+        return
+    statement = insert(LogDailyRollup).values([
+        {"day": day, "event_type": event_type, "count": count}
+        for (day, event_type), count in counts.items()
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["day", "event_type"],
+        set_={"count": LogDailyRollup.count + statement.excluded.count},
+    ))
+
+
+class RetentionJob:
+    """
+    Periodically rolls up and prunes old audit rows in batches of RETENTION_BATCH_SIZE.
+
+    Each batch deletes its rows with RETURNING and adds exactly the returned rows to
+    the rollup in the same transaction, so workers running the job concurrently
+    never count a row twice.
+    """
+
+    def __init__(self, interval_seconds: float = RETENTION_INTERVAL_SECONDS,
+                 batch_size: int = RETENTION_BATCH_SIZE, session_factory=SessionLocal):
+        self.interval_seconds = interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.session_factory = session_factory
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._run_lock = threading.Lock()
+
+        # metrics
+        self.runs = 0
+        self.logs_rolled_up = 0
+        self.queries_pruned = 0
+        self.last_run_at = None
+        self.last_run_seconds = None
+        self.last_error = None
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="retention", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except SQLAlchemyError as e:
+                self.last_error = str(e)
+                logger.error(f"Retention run failed: {str(e)}")
+            time.sleep(self.interval_seconds)
+
+    def _rollup_logs_batch(self, cutoff: datetime) -> tuple:
+        """
+        Returns:
+            tuple: (rows selected, rows this run deleted; fewer if a concurrent run took some)
+        """
+        db = self.session_factory()
+        try:
+            ids = db.scalars(
+                select(Log.id).where(Log.timestamp < cutoff).order_by(Log.timestamp).limit(self.batch_size)
+            ).all()
+            if not ids:
+                return 0, 0
+            deleted = db.execute(delete(Log).where(Log.id.in_(ids)).returning(Log.timestamp, Log.event_type)).all()
+            counts = Counter((timestamp.date(), event_type or UNKNOWN_EVENT_TYPE) for timestamp, event_type in deleted)
+            if counts:
+                _add_counts(db, counts)
+            db.commit()
+            return len(ids), len(deleted)
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _prune_queries_batch(self, cutoff: datetime) -> int:
+        db = self.session_factory()
+        try:
+            ids = db.scalars(
+                select(Query.id).where(Query.timestamp < cutoff).order_by(Query.timestamp).limit(self.batch_size)
+            ).all()
+            if ids:
+                db.execute(delete(Query).where(Query.id.in_(ids)))
+                db.commit()
+            return len(ids)
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def run_once(self) -> dict:
+        """
+        Rolls up and prunes everything past the retention windows.
+
+        Returns:
+            dict: rows rolled up / pruned by this run
+        """
+        with self._run_lock:
+            started = time.perf_counter()
+            report = {"logs_rolled_up": 0, "queries_pruned": 0}
+
+            cutoff = _cutoff(LOG_RETENTION_DAYS)
+            while True:
+                selected, deleted = self._rollup_logs_batch(cutoff)
+                report["logs_rolled_up"] += deleted
+                if selected < self.batch_size:
+                    break
+
+            if QUERY_RETENTION_DAYS > 0:
+                cutoff = _cutoff(QUERY_RETENTION_DAYS)
+                while True:
+                    rows = self._prune_queries_batch(cutoff)
+                    report["queries_pruned"] += rows
+                    if rows < self.batch_size:
+                        break
+
+            self.runs += 1
+            self.logs_rolled_up += report["logs_rolled_up"]
+            self.queries_pruned += report["queries_pruned"]
+            self.last_run_at = datetime.utcnow().isoformat()
+            self.last_run_seconds = round(time.perf_counter() - started, 3)
+            self.last_error = None
+            if report["logs_rolled_up"] or report["queries_pruned"]:
+                logger.info(f"🧹 Retention: {report['logs_rolled_up']} log rows rolled up, "
+                            f"{report['queries_pruned']} query rows pruned in {self.last_run_seconds}s")
+            return report
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RETENTION_ENABLED,
+            "log_retention_days": LOG_RETENTION_DAYS,
+            "query_retention_days": QUERY_RETENTION_DAYS,
+            "runs": self.runs,
+            "logs_rolled_up": self.logs_rolled_up,
+            "queries_pruned": self.queries_pruned,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": self.last_run_seconds,
+            "last_error": self.last_error,
+        }
+
+
+_job = RetentionJob()
+
+
+def get_retention_job() -> RetentionJob:
+    """
+    Returns the process-wide retention job.
+    """
+    return _job
+
+
+if __name__ == "__main__":
+    print(get_retention_job().run_once())
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from database import get_db
 from models import Query, Log
-from llm_service import query_model
-from rag_pipeline import run_rag_pipeline
-from pathlib import Path
+from audit_writer import get_audit_writer
+from llm_service import agenerate_text
+from rag_pipeline import aretrieve_contexts
+from context_packer import RAG_CONTEXT_TOKEN_BUDGET
+from corpus_shards import category_for_clause
+from prompt_registry import render_prompt
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +16,7 @@ class ClauseCompareRequest(BaseModel):
     clause_type: str
     country_1: str
     country_2: str
+    use_cache: bool = True
 
 class ClauseCompareResponse(BaseModel):
     success: bool
@@ -24,45 +26,35 @@ class ClauseCompareResponse(BaseModel):
     rag_enhanced: bool
 
 @router.post("/compare", response_model=ClauseCompareResponse)
-async def compare_clause(request: ClauseCompareRequest, db: Session = Depends(get_db)):
+async def compare_clause(request: ClauseCompareRequest):
     try:
         # Get RAG-enhanced context for each country
         rag_question_1 = f"How are {request.clause_type} clauses interpreted and enforced in {request.country_1}? Include legal precedents and regulations."
         rag_question_2 = f"How are {request.clause_type} clauses interpreted and enforced in {request.country_2}? Include legal precedents and regulations."
         
-        rag_context_1 = run_rag_pipeline(rag_question_1)
-        rag_context_2 = run_rag_pipeline(rag_question_2)
-        
-        # Load comparator prompt template
-        prompt_path = Path("prompts/comparator_prompt.txt")
-        if not prompt_path.exists():
-            raise HTTPException(status_code=500, detail="Prompt template not found")
-        
-        with prompt_path.open("r") as file:
-            prompt_template = file.read()
-
-        # Enhanced prompt with RAG context
-        enhanced_prompt = f"""
-        {prompt_template}
-        
-        Additional Legal Context for {request.country_1}:
-        {rag_context_1}
-        
-        Additional Legal Context for {request.country_2}:
-        {rag_context_2}
+        # Context only: both countries are retrieved in one batched pass, with no nested LLM answers,
+        # each from the clause type's shard filtered to that country; together they fit one context budget
+        category = category_for_clause(request.clause_type)
+        scopes = [
+            {"categories": [category], "jurisdiction": request.country_1},
+            {"categories": [category], "jurisdiction": request.country_2},
+        ]
+        rag_context_1, rag_context_2 = await aretrieve_contexts(
+            [rag_question_1, rag_question_2], scopes=scopes, token_budget=RAG_CONTEXT_TOKEN_BUDGET // 2
+        )
         
-        Use this additional context to provide a more comprehensive comparison.
-        """
-
-        # Format prompt with request data
-        formatted_prompt = enhanced_prompt.format(
+        # Fill the comparator template with the request data and both countries' context
+        formatted_prompt = render_prompt(
+            "comparator_prompt",
             clause_type=request.clause_type,
             country_1=request.country_1,
-            country_2=request.country_2
+            country_2=request.country_2,
+            context_1=rag_context_1,
+            context_2=rag_context_2
         )
 
         # Query LLM service
-        result = query_model(formatted_prompt)
+        result = await agenerate_text(formatted_prompt, use_cache=request.use_cache)
 
         # Parse the result (simplified parsing)
         lines = result.split('\n')
@@ -95,21 +87,19 @@ async def compare_clause(request: ClauseCompareRequest, db: Session = Depends(ge
             country_2_analysis = f"Analysis for {request.country_2} based on legal documents and precedents."
             key_differences = "Detailed comparison available in the full analysis."
 
-        # Save query to database
-        query_record = Query(
+        # Queue the query and log rows; the audit writer persists them off the request path
+        audit_writer = get_audit_writer()
+        audit_writer.enqueue(
+            Query,
             question=f"RAG-Enhanced Cross-border Comparison: {request.clause_type}",
             context=f"{request.country_1} vs {request.country_2}",
             response=result
         )
-        db.add(query_record)
-        
-        # Log the event
-        log_record = Log(
+        audit_writer.enqueue(
+            Log,
             event_type="clause_comparison_rag",
             details=f"RAG-enhanced comparison: {request.clause_type} between {request.country_1} and {request.country_2}"
         )
-        db.add(log_record)
-        db.commit()
 
         return ClauseCompareResponse(
             success=True,
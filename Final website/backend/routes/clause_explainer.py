@@ -1,11 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from database import get_db
 from models import Query, Log
-from llm_service import query_model
-from rag_pipeline import run_rag_pipeline
-from pathlib import Path
+from audit_writer import get_audit_writer
+from llm_service import agenerate_text
+from rag_pipeline import arun_rag_pipeline
+from prompt_registry import render_prompt
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +12,7 @@ router = APIRouter()
 
 class ClauseExplainRequest(BaseModel):
     clause: str
+    use_cache: bool = True
 
 class ClauseExplainResponse(BaseModel):
     success: bool
@@ -21,35 +21,17 @@ class ClauseExplainResponse(BaseModel):
     rag_enhanced: bool
 
 @router.post("/explain", response_model=ClauseExplainResponse)
-async def explain_clause(request: ClauseExplainRequest, db: Session = Depends(get_db)):
+async def explain_clause(request: ClauseExplainRequest):
     try:
         # First, get RAG-enhanced context about similar clauses
         rag_question = f"Explain legal clauses similar to: {request.clause[:200]}... What are the common interpretations and legal implications?"
-        rag_context = run_rag_pipeline(rag_question)
+        rag_context = await arun_rag_pipeline(rag_question, use_cache=request.use_cache)
         
-        # Load explainer prompt template
-        prompt_path = Path("prompts/explainer_prompt.txt")
-        if not prompt_path.exists():
-            raise HTTPException(status_code=500, detail="Prompt template not found")
-        
-        with prompt_path.open("r") as file:
-            prompt_template = file.read()
-
-        # Enhanced prompt with RAG context
-        enhanced_prompt = f"""
-        {prompt_template}
-        
-        Additional Legal Context from Legal Documents:
-        {rag_context}
-        
-        Use this context to provide a more comprehensive explanation.
-        """
-
-        # Format prompt with clause
-        formatted_prompt = enhanced_prompt.format(clause=request.clause)
+        # Fill the explainer template with the clause and the RAG context (inserted as-is, braces included)
+        formatted_prompt = render_prompt("explainer_prompt", clause=request.clause, context=rag_context)
 
         # Query LLM service
-        result = query_model(formatted_prompt)
+        result = await agenerate_text(formatted_prompt, use_cache=request.use_cache)
 
         # Parse string response
         lines = result.split("\n")
@@ -68,21 +50,19 @@ async def explain_clause(request: ClauseExplainRequest, db: Session = Depends(ge
         if not domain:
             domain = "General Legal"
 
-        # Save query to database
-        query_record = Query(
+        # Queue the query and log rows; the audit writer persists them off the request path
+        audit_writer = get_audit_writer()
+        audit_writer.enqueue(
+            Query,
             question="RAG-Enhanced Clause Explanation",
             context=request.clause,
             response=result
         )
-        db.add(query_record)
-        
-        # Log the event
-        log_record = Log(
+        audit_writer.enqueue(
+            Log,
             event_type="clause_explanation_rag",
             details=f"Explained clause with RAG enhancement: {len(request.clause)} characters"
         )
-        db.add(log_record)
-        db.commit()
 
         return ClauseExplainResponse(
             success=True,
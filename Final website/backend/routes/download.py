@@ -2,32 +2,105 @@
 from fastapi import APIRouter, Response, HTTPException
 from fpdf import FPDF
 from pydantic import BaseModel
+from collections import OrderedDict
+import threading
+import hashlib
 import datetime
+import time
+import os
 
 router = APIRouter()
 
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", "256"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
 class PDFData(BaseModel):
     question: str
     answer: str
 
+class PDFRenderCache:
+    """
+    LRU of rendered reports keyed by a hash of their content, bounded by entries and bytes.
+    """
+
+    def __init__(self, max_entries: int = PDF_CACHE_MAX_ENTRIES, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> pdf bytes, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.total_render_seconds = 0.0
+
+    def get(self, key: str):
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pdf_bytes
+
+    def put(self, key: str, pdf_bytes: bytes):
+        if len(pdf_bytes) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = pdf_bytes
+            self._bytes += len(pdf_bytes)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self) -> dict:
+        renders = self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "average_render_ms": 1000 * self.total_render_seconds / renders if renders else 0.0,
+        }
+
+pdf_cache = PDFRenderCache()
+
+def report_key(question: str, answer: str, day: str) -> str:
+    # the report shows its date, so the same answer downloaded on another day is rendered again
+    return hashlib.sha256(f"{day}\0{question}\0{answer}".encode("utf-8")).hexdigest()
+
+def render_report(question: str, answer: str, day: str) -> bytes:
+    """
+    Renders the report straight into memory; nothing touches the disk.
+    """
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, f"Lexora AI Report\n\nDate: {day}\n\nQuestion:\n{question}\n\nAnswer:\n{answer}")
+    return bytes(pdf.output())
+
 @router.post("/download")
 def download_pdf(data: PDFData):
     try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        pdf.multi_cell(0, 10, f"Lexora AI Report\n\nDate: {datetime.datetime.now()}\n\nQuestion:\n{data.question}\n\nAnswer:\n{data.answer}")
-        
-        pdf_output = f"Lexora_Report_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-        pdf.output(pdf_output)
-
-        with open(pdf_output, "rb") as f:
-            pdf_bytes = f.read()
+        day = datetime.date.today().isoformat()
+        key = report_key(data.question, data.answer, day)
+        pdf_bytes = pdf_cache.get(key)
+        if pdf_bytes is None:
+            started = time.perf_counter()
+            pdf_bytes = render_report(data.question, data.answer, day)
+            pdf_cache.total_render_seconds += time.perf_counter() - started
+            pdf_cache.put(key, pdf_bytes)
 
+        # named after the content, so concurrent downloads never share a name
+        filename = f"Lexora_Report_{key[:16]}.pdf"
         return Response(
             content=pdf_bytes,
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={pdf_output}"}
+            headers={"Content-Disposition": f'attachment; filename="{filename}"', "ETag": f'"{key}"'}
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
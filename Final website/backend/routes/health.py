@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from health_monitor import get_health_monitor
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+@router.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return get_health_monitor().liveness()
+
+@router.get("/ready")
+async def readiness():
+    """Readiness probe: cached component status, 503 until every component is ready"""
+    status = get_health_monitor().readiness()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
+
+@router.get("")
+async def health():
+    """Alias of /ready for clients polling the bare health URL"""
+    return await readiness()
+
+@router.get("/deep")
+async def deep_check():
+    """
+    On-demand self-test: retrieval plus a real Granite generation. Rate-limited;
+    calls inside the minimum interval get the last result with a 429.
+    """
+    result, retry_after = await run_in_threadpool(get_health_monitor().deep_check)
+    if retry_after:
+        return JSONResponse(
+            {"status": "rate_limited", "last_result": result},
+            status_code=429,
+            headers={"Retry-After": str(int(retry_after))},
+        )
+    return JSONResponse(result, status_code=200 if result["status"] == "healthy" else 503)
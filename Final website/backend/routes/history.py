@@ -0,0 +1,151 @@
+from fastapi import APIRouter, Depends, HTTPException, Query as QueryParam
+from pydantic import BaseModel
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Query, Log, LogDailyRollup
+from retention import UNKNOWN_EVENT_TYPE
+from datetime import datetime, date
+from typing import List, Optional
+import base64
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+class QueryHistoryItem(BaseModel):
+    id: int
+    timestamp: datetime
+    question: str
+    context: Optional[str]
+    response: Optional[str]
+
+class QueryHistoryPage(BaseModel):
+    items: List[QueryHistoryItem]
+    next_cursor: Optional[str]
+
+class LogItem(BaseModel):
+    id: int
+    timestamp: datetime
+    event_type: Optional[str]
+    details: Optional[str]
+
+class LogPage(BaseModel):
+    items: List[LogItem]
+    next_cursor: Optional[str]
+
+class DailyCount(BaseModel):
+    day: date
+    event_type: str
+    count: int
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_page(statement, model, cursor: Optional[str], since: Optional[datetime],
+                until: Optional[datetime], limit: int):
+    """
+    Newest-first page over (timestamp, id). The cursor is the last row of the
+    previous page, so every page is an index range scan, however deep it is.
+    Rows without a timestamp cannot be placed in that order and are left out.
+    """
+    statement = statement.where(model.timestamp.isnot(None))
+    if since is not None:
+        statement = statement.where(model.timestamp >= since)
+    if until is not None:
+        statement = statement.where(model.timestamp < until)
+    if cursor:
+        statement = statement.where(tuple_(model.timestamp, model.id) < tuple_(*decode_cursor(cursor)))
+    # one extra row tells whether another page exists
+    return statement.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1)
+
+def split_page(rows: list, limit: int) -> tuple:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].timestamp, rows[-1].id)
+
+@router.get("/queries", response_model=QueryHistoryPage)
+async def query_history(
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = QueryParam(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Saved questions and answers, newest first; pass `next_cursor` back to get the next page"""
+    statement = select(Query.id, Query.timestamp, Query.question, Query.context, Query.response)
+    rows = (await db.execute(keyset_page(statement, Query, cursor, since, until, limit))).all()
+    rows, next_cursor = split_page(rows, limit)
+    return QueryHistoryPage(
+        items=[QueryHistoryItem(**row._mapping) for row in rows],
+        next_cursor=next_cursor
+    )
+
+@router.get("/logs", response_model=LogPage)
+async def event_log(
+    event_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = QueryParam(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Raw event log within the retention window, newest first, optionally for one event type"""
+    statement = select(Log.id, Log.timestamp, Log.event_type, Log.details)
+    if event_type:
+        statement = statement.where(Log.event_type == event_type)
+    rows = (await db.execute(keyset_page(statement, Log, cursor, since, until, limit))).all()
+    rows, next_cursor = split_page(rows, limit)
+    return LogPage(
+        items=[LogItem(**row._mapping) for row in rows],
+        next_cursor=next_cursor
+    )
+
+@router.get("/logs/daily", response_model=List[DailyCount])
+async def daily_event_counts(
+    event_type: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Events per day and type: rolled-up counts for days past the retention window,
+    counted from raw rows for the rest. `until` is exclusive.
+    """
+    rollups = select(LogDailyRollup.day, LogDailyRollup.event_type, LogDailyRollup.count)
+    day = func.date(Log.timestamp)
+    raw = (select(day, func.coalesce(Log.event_type, UNKNOWN_EVENT_TYPE), func.count())
+           .where(Log.timestamp.isnot(None)).group_by(day, Log.event_type))
+    if event_type:
+        rollups = rollups.where(LogDailyRollup.event_type == event_type)
+        raw = raw.where(Log.event_type == event_type)
+    if since is not None:
+        rollups = rollups.where(LogDailyRollup.day >= since)
+        raw = raw.where(Log.timestamp >= datetime.combine(since, datetime.min.time()))
+    if until is not None:
+        rollups = rollups.where(LogDailyRollup.day < until)
+        raw = raw.where(Log.timestamp < datetime.combine(until, datetime.min.time()))
+
+    # a day part-way through a rollup has rows in both tables; each event is in exactly one of them
+    counts = {}
+    for statement in (rollups, raw):
+        for row_day, row_event_type, count in (await db.execute(statement)).all():
+            if isinstance(row_day, str):
+                row_day = date.fromisoformat(row_day)
+            key = (row_day, row_event_type)
+            counts[key] = counts.get(key, 0) + count
+    return [
+        DailyCount(day=row_day, event_type=row_event_type, count=count)
+        for (row_day, row_event_type), count in sorted(counts.items())
+    ]
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from database import get_db
 from models import Query, Log
-from rag_pipeline import run_rag_pipeline
+from audit_writer import get_audit_writer
+from llm_service import astream_text
+from rag_pipeline import arun_rag_pipeline, aprepare_rag, cache_answer, NO_DOCUMENTS_ANSWER
+from streaming import format_sse
+from health_monitor import get_health_monitor
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +15,7 @@ router = APIRouter()
 
 class LegalQARequest(BaseModel):
     question: str
+    use_cache: bool = True
 
 class LegalQAResponse(BaseModel):
     success: bool
@@ -18,31 +23,31 @@ class LegalQAResponse(BaseModel):
     sources_used: bool
     confidence: str
 
+def record_answer(question: str, answer: str):
+    # Queue the query and log rows; the audit writer persists them off the request path
+    audit_writer = get_audit_writer()
+    audit_writer.enqueue(
+        Query,
+        question=question,
+        context="RAG-enhanced legal Q&A",
+        response=answer
+    )
+    audit_writer.enqueue(
+        Log,
+        event_type="legal_qa",
+        details=f"Answered legal question: {question[:100]}..."
+    )
+
 @router.post("/ask", response_model=LegalQAResponse)
-async def ask_legal_question(request: LegalQARequest, db: Session = Depends(get_db)):
+async def ask_legal_question(request: LegalQARequest):
     try:
         if not request.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
         # Run RAG pipeline to get enhanced answer
         logger.info(f"Processing legal question: {request.question}")
-        answer = run_rag_pipeline(request.question)
-        
-        # Save query to database
-        query_record = Query(
-            question=request.question,
-            context="RAG-enhanced legal Q&A",
-            response=answer
-        )
-        db.add(query_record)
-        
-        # Log the event
-        log_record = Log(
-            event_type="legal_qa",
-            details=f"Answered legal question: {request.question[:100]}..."
-        )
-        db.add(log_record)
-        db.commit()
+        answer = await arun_rag_pipeline(request.question, use_cache=request.use_cache)
+        record_answer(request.question, answer)
         
         return LegalQAResponse(
             success=True,
@@ -55,19 +60,63 @@ async def ask_legal_question(request: LegalQARequest, db: Session = Depends(get_
         logger.error(f"Error in legal Q&A: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/ask/stream")
+async def ask_legal_question_stream(request: LegalQARequest):
+    """
+    Streams the answer as server-sent events: `token` events while generating,
+    then a `done` event once the Query row has been queued for saving. A cached
+    answer (unless use_cache is false) arrives as a single `token` event.
+    """
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    async def events():
+        started = time.perf_counter()
+        first_token_ms = None
+        chunks = []
+        try:
+            logger.info(f"Streaming legal question: {request.question}")
+            cached_answer, query_vector, formatted_prompt = await aprepare_rag(request.question, request.use_cache)
+            if cached_answer is not None:
+                chunks.append(cached_answer)
+                yield format_sse("token", {"text": cached_answer})
+            elif formatted_prompt is None:
+                chunks.append(NO_DOCUMENTS_ANSWER)
+                yield format_sse("token", {"text": NO_DOCUMENTS_ANSWER})
+            else:
+                async for chunk in astream_text(formatted_prompt, use_cache=request.use_cache):
+                    if first_token_ms is None:
+                        first_token_ms = (time.perf_counter() - started) * 1000
+                        logger.info(f"Legal Q&A stream time-to-first-token: {first_token_ms:.0f} ms")
+                    chunks.append(chunk)
+                    yield format_sse("token", {"text": chunk})
+
+            answer = "".join(chunks).strip()
+            if cached_answer is None and formatted_prompt is not None and answer:
+                cache_answer(request.question, query_vector, answer)
+            record_answer(request.question, answer)
+
+            yield format_sse("done", {
+                "success": True,
+                "sources_used": cached_answer is not None or formatted_prompt is not None,
+                "confidence": "High",
+                "time_to_first_token_ms": first_token_ms,
+            })
+
+        except Exception as e:
+            logger.error(f"Error in streaming legal Q&A: {str(e)}")
+            yield format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/health")
 async def health_check():
-    """Health check for the legal Q&A service"""
-    try:
-        # Test if RAG pipeline is working
-        test_answer = run_rag_pipeline("What is a contract?")
-        return {
-            "status": "healthy",
-            "rag_pipeline": "operational",
-            "test_response_length": len(test_answer)
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e)
-        }
+    """Health check for the legal Q&A service, from the cached component status"""
+    components = get_health_monitor().readiness()["components"]
+    required = [components.get(name, {}) for name in ("index", "model", "llm_backend")]
+    operational = bool(components) and all(component.get("ok") for component in required)
+    return {
+        "status": "healthy" if operational else "unhealthy",
+        "rag_pipeline": "operational" if operational else "unavailable",
+        "index_version": components.get("index", {}).get("version")
+    }
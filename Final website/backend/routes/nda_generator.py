@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from database import get_db
 from models import Query, Log
-from llm_service import query_model
-from rag_pipeline import run_rag_pipeline
-from pathlib import Path
-from docx import Document
+from audit_writer import get_audit_writer
+from llm_service import agenerate_text, astream_text
+from rag_pipeline import arun_rag_pipeline
+from streaming import format_sse
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.document_store import get_document_store, build_nda_docx, DOCX_MEDIA_TYPE
+from prompt_registry import render_prompt
 import time
 import logging
 
@@ -19,6 +21,7 @@ class NDAGenerateRequest(BaseModel):
     party_2: str
     jurisdiction: str
     purpose: str
+    use_cache: bool = True
 
 class NDAResponse(BaseModel):
     success: bool
@@ -26,72 +29,52 @@ class NDAResponse(BaseModel):
     download_url: str
     rag_enhanced: bool
 
+async def build_nda_prompt(request: NDAGenerateRequest) -> str:
+    # First, get RAG-enhanced context about NDAs in the specific jurisdiction
+    rag_question = f"What are the key requirements for Non-Disclosure Agreements in {request.jurisdiction}? Include standard clauses and legal considerations."
+    # Only the NDA shard is searched, restricted to documents for this jurisdiction
+    scope = {"categories": ["ndas"], "jurisdiction": request.jurisdiction}
+    rag_context = await arun_rag_pipeline(rag_question, use_cache=request.use_cache, scope=scope)
+
+    # Fill the NDA template with the request data and the RAG context
+    return render_prompt(
+        "nda_prompt",
+        party_1=request.party_1,
+        party_2=request.party_2,
+        jurisdiction=request.jurisdiction,
+        purpose=request.purpose,
+        context=rag_context
+    )
+
+async def save_nda_document(nda_draft: str) -> str:
+    # Stored under a hash of the draft, so regenerating the same draft reuses the existing file
+    return await run_in_threadpool(get_document_store().save, "nda", nda_draft, build_nda_docx)
+
+def record_nda(request: NDAGenerateRequest, nda_draft: str):
+    # Queue the query and log rows; the audit writer persists them off the request path
+    audit_writer = get_audit_writer()
+    audit_writer.enqueue(
+        Query,
+        question=f"NDA Generation for {request.party_1} and {request.party_2}",
+        context=f"Jurisdiction: {request.jurisdiction}, Purpose: {request.purpose}",
+        response=nda_draft
+    )
+    audit_writer.enqueue(
+        Log,
+        event_type="nda_generation_rag",
+        details=f"Generated RAG-enhanced NDA for {request.party_1} and {request.party_2}"
+    )
+
 @router.post("/generate", response_model=NDAResponse)
-async def generate_nda(request: NDAGenerateRequest, db: Session = Depends(get_db)):
+async def generate_nda(request: NDAGenerateRequest):
     try:
-        # First, get RAG-enhanced context about NDAs in the specific jurisdiction
-        rag_question = f"What are the key requirements for Non-Disclosure Agreements in {request.jurisdiction}? Include standard clauses and legal considerations."
-        rag_context = run_rag_pipeline(rag_question)
-        
-        # Load NDA prompt template
-        prompt_path = Path("prompts/nda_prompt.txt")
-        if not prompt_path.exists():
-            raise HTTPException(status_code=500, detail="Prompt template not found")
-        
-        with prompt_path.open("r") as file:
-            prompt_template = file.read()
-
-        # Enhanced prompt with RAG context
-        enhanced_prompt = f"""
-        {prompt_template}
-        
-        Additional Legal Context from Legal Documents:
-        {rag_context}
-        
-        Please ensure the NDA complies with the legal requirements mentioned above.
-        """
-
-        # Format prompt with request data
-        formatted_prompt = enhanced_prompt.format(
-            party_1=request.party_1,
-            party_2=request.party_2,
-            jurisdiction=request.jurisdiction,
-            purpose=request.purpose
-        )
+        formatted_prompt = await build_nda_prompt(request)
 
         # Query LLM service
-        nda_draft = query_model(formatted_prompt)
-
-        # Ensure generated_docs directory exists
-        docs_dir = Path("generated_docs")
-        docs_dir.mkdir(exist_ok=True)
-
-        # Generate unique filename with timestamp
-        timestamp = int(time.time())
-        filename = f"nda_{timestamp}.docx"
-        file_path = docs_dir / filename
-
-        # Create Word document
-        doc = Document()
-        doc.add_heading("Non-Disclosure Agreement", 0)
-        doc.add_paragraph(nda_draft)
-        doc.save(file_path)
-
-        # Save query to database
-        query_record = Query(
-            question=f"NDA Generation for {request.party_1} and {request.party_2}",
-            context=f"Jurisdiction: {request.jurisdiction}, Purpose: {request.purpose}",
-            response=nda_draft
-        )
-        db.add(query_record)
-        
-        # Log the event
-        log_record = Log(
-            event_type="nda_generation_rag",
-            details=f"Generated RAG-enhanced NDA for {request.party_1} and {request.party_2}"
-        )
-        db.add(log_record)
-        db.commit()
+        nda_draft = await agenerate_text(formatted_prompt, use_cache=request.use_cache)
+
+        filename = await save_nda_document(nda_draft)
+        record_nda(request, nda_draft)
 
         return NDAResponse(
             success=True,
@@ -104,14 +87,53 @@ async def generate_nda(request: NDAGenerateRequest, db: Session = Depends(get_db
         logger.error(f"Error generating NDA: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating NDA: {str(e)}")
 
+@router.post("/generate/stream")
+async def generate_nda_stream(request: NDAGenerateRequest):
+    """
+    Streams the NDA draft as server-sent events: `token` events while generating,
+    then a `done` event with the download URL once the DOCX is saved and the Query row queued.
+    """
+    async def events():
+        started = time.perf_counter()
+        first_token_ms = None
+        chunks = []
+        try:
+            yield format_sse("status", {"stage": "retrieving"})
+            formatted_prompt = await build_nda_prompt(request)
+
+            async for chunk in astream_text(formatted_prompt, use_cache=request.use_cache):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                    logger.info(f"NDA stream time-to-first-token: {first_token_ms:.0f} ms")
+                chunks.append(chunk)
+                yield format_sse("token", {"text": chunk})
+
+            nda_draft = "".join(chunks).strip()
+            filename = await save_nda_document(nda_draft)
+            record_nda(request, nda_draft)
+
+            yield format_sse("done", {
+                "success": True,
+                "download_url": f"/api/nda/download/{filename}",
+                "rag_enhanced": True,
+                "time_to_first_token_ms": first_token_ms,
+            })
+
+        except Exception as e:
+            logger.error(f"Error streaming NDA: {str(e)}")
+            yield format_sse("error", {"detail": f"Error generating NDA: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/download/{filename}")
 async def download_nda(filename: str):
-    file_path = Path("generated_docs") / filename
-    if not file_path.exists() or not file_path.is_file():
+    # Only names issued by the store are accepted, so paths outside it cannot be requested
+    content = await run_in_threadpool(get_document_store().read, filename)
+    if content is None:
         raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+    return Response(
+        content=content,
+        media_type=DOCX_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import numpy as np
+import threading
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+SEMANTIC_CACHE_MAX_BYTES = int(os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+class _CacheEntry:
+    __slots__ = ("slot", "question", "answer", "namespace", "created_at", "size")
+
+    def __init__(self, slot: int, question: str, answer: str, namespace: str, size: int):
+        self.slot = slot
+        self.question = question
+        self.answer = answer
+        self.namespace = namespace
+        self.created_at = time.monotonic()
+        self.size = size
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by question meaning rather than exact text.
+
+    Question embeddings are L2-normalized and kept in a fixed-size float32 matrix,
+    so a lookup is a single matrix-vector product masked to the namespace's slots.
+    Entries are evicted LRU-first when the entry or byte budget is exceeded, expire
+    after a TTL, and are all dropped when the corpus index version changes. A
+    max_entries of 0 disables the cache.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bytes: int = SEMANTIC_CACHE_MAX_BYTES,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(0, max_entries)
+        self.max_bytes = max_bytes
+        self.index_version = None
+        self._vectors = None
+        self._occupied = np.zeros(self.max_entries, dtype=bool)
+        self._entries = OrderedDict()  # slot -> entry, least recently used first
+        self._namespace_slots = {}  # namespace -> (boolean mask over slots, number of entries)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, index_version):
+        if index_version != self.index_version:
+            if self._entries:
+                logger.info(f"Corpus index changed ({self.index_version} -> {index_version}), clearing semantic cache")
+                self.invalidations += 1
+            self._clear()
+            self.index_version = index_version
+
+    def _clear(self):
+        self._entries.clear()
+        self._occupied[:] = False
+        self._namespace_slots.clear()
+        self._bytes = 0
+
+    def _remove(self, slot: int):
+        entry = self._entries.pop(slot)
+        self._occupied[slot] = False
+        mask, count = self._namespace_slots[entry.namespace]
+        mask[slot] = False
+        if count > 1:
+            self._namespace_slots[entry.namespace] = (mask, count - 1)
+        else:
+            del self._namespace_slots[entry.namespace]
+        self._bytes -= entry.size
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = [slot for slot, entry in self._entries.items() if entry.created_at < cutoff]
+        for slot in expired:
+            self._remove(slot)
+
+    def lookup(self, question_vector, index_version, namespace: str = ""):
+        """
+        Returns the cached answer of the most similar prior question asked in the same
+        namespace (retrieval scope), or None on a miss.
+        """
+        vector = self._normalize(question_vector)
+        with self._lock:
+            self._check_version(index_version)
+            self._expire()
+            if namespace not in self._namespace_slots:
+                self.misses += 1
+                return None
+
+            mask, _ = self._namespace_slots[namespace]
+            similarities = np.where(mask, self._vectors @ vector, -np.inf)
+            slot = int(np.argmax(similarities))
+            if similarities[slot] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot].answer
+
+    def store(self, question: str, question_vector, answer: str, index_version, namespace: str = ""):
+        """
+        Caches an answer under its question embedding, evicting least recently used entries as needed.
+        """
+        vector = self._normalize(question_vector)
+        size = vector.nbytes + len(question.encode("utf-8")) + len(answer.encode("utf-8"))
+        if not self.max_entries or size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version(index_version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            while self._entries and (len(self._entries) >= self.max_entries or self._bytes + size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+            slot = int(np.argmin(self._occupied))
+            self._vectors[slot] = vector
+            self._occupied[slot] = True
+            self._entries[slot] = _CacheEntry(slot, question, answer, namespace, size)
+            mask, count = self._namespace_slots.get(namespace) or (np.zeros(self.max_entries, dtype=bool), 0)
+            mask[slot] = True
+            self._namespace_slots[namespace] = (mask, count + 1)
+            self._bytes += size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": SEMANTIC_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "index_version": self.index_version,
+            }
+
+
+semantic_cache = SemanticCache()
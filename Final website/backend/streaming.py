@@ -0,0 +1,8 @@
+import json
+
+
+def format_sse(event: str, data) -> str:
+    """
+    Formats one server-sent event. Data is JSON-encoded so multi-line text stays on a single `data:` line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
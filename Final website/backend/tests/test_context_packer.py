@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+import re
+import pytest
+
+#context_packer imports the model registry, which needs torch and transformers
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from context_packer import MIN_TRUNCATED_TOKENS, merge_passages, pack_context
+
+
+class WordTokenizer:
+    """
+    One token per word or newline, standing in for the Granite tokenizer.
+    """
+
+    def __call__(self, text: str, add_special_tokens: bool = False) -> dict:
+        return {"input_ids": re.findall(r"\n|\S+", text)}
+
+    def decode(self, tokens, skip_special_tokens: bool = True) -> str:
+        return " ".join(tokens)
+
+
+def doc(text: str, source: str = "nda.txt", page=None):
+    return SimpleNamespace(page_content=text, metadata={"source": source, "page": page})
+
+
+def numbered(start: int, stop: int) -> str:
+    return " ".join(f"w{i}" for i in range(start, stop))
+
+
+def test_overlapping_chunks_are_stitched_once():
+    first, second = numbered(0, 60), numbered(40, 100)  # the splitter's overlap: w40..w59
+
+    passages = merge_passages([doc(second), doc(first)])
+
+    assert [passage.text for passage in passages] == [numbered(0, 100)]
+
+
+def test_short_shared_edges_are_not_merged():
+    first, second = "alpha beta gamma delta", "delta epsilon zeta eta"
+
+    assert len(merge_passages([doc(first), doc(second)])) == 2
+
+
+def test_overlap_is_only_merged_within_a_source_and_page():
+    first, second = numbered(0, 60), numbered(40, 100)
+
+    passages = merge_passages([doc(first, page=1), doc(second, page=2)])
+
+    assert [passage.text for passage in passages] == [first, second]
+
+
+def test_near_duplicates_are_dropped_across_sources():
+    clause = "The receiving party shall keep all confidential information strictly secret and use it only for the purpose."
+    variant = clause + " Any breach must be notified to the disclosing party without delay."
+
+    passages = merge_passages([doc(clause, "germany.txt"), doc(variant, "india.txt"), doc(numbered(0, 20), "usa.txt")])
+
+    assert [passage.source[0] for passage in passages] == ["germany.txt", "usa.txt"]
+
+
+def test_contained_chunk_is_dropped():
+    passages = merge_passages([doc(numbered(0, 80)), doc(numbered(10, 30))])
+
+    assert [passage.text for passage in passages] == [numbered(0, 80)]
+
+
+def test_budget_cuts_the_crossing_passage_at_a_token_boundary():
+    first, second = numbered(0, 50), numbered(100, 200)
+    budget = 50 + 1 + MIN_TRUNCATED_TOKENS  # first passage, the separator, then a cut second one
+
+    context = pack_context([doc(first, "a.txt"), doc(second, "b.txt")], token_budget=budget, tokenizer=WordTokenizer())
+
+    assert context == first + "\n" + numbered(100, 100 + MIN_TRUNCATED_TOKENS)
+
+
+def test_short_remainder_is_dropped_but_the_best_passage_is_always_kept():
+    tokenizer = WordTokenizer()
+    docs = [doc(numbered(0, 50), "a.txt"), doc(numbered(100, 200), "b.txt")]
+
+    assert pack_context(docs, token_budget=50 + 1 + MIN_TRUNCATED_TOKENS - 1, tokenizer=tokenizer) == numbered(0, 50)
+    assert pack_context(docs, token_budget=10, tokenizer=tokenizer) == numbered(0, 10)
@@ -0,0 +1,102 @@
+from pathlib import Path
+import hashlib
+import shutil
+import numpy as np
+import pytest
+
+#building an index needs the backend's LangChain dependencies
+Embeddings = pytest.importorskip("langchain_core.embeddings").Embeddings
+legal_corpus_loader = pytest.importorskip("legal_corpus_loader")
+from corpus_shards import CorpusShards, detect_jurisdiction, GENERAL
+
+#the corpus shipped with the repository: flat files named after their jurisdiction
+REPO_DOCS = Path(__file__).resolve().parents[3] / "data" / "legal_docs"
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words vectors, so the index builds without downloading a model.
+    """
+    dim = 64
+
+    def _embed(self, text: str) -> list:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture(scope="module")
+def shards(tmp_path_factory):
+    index_root = tmp_path_factory.mktemp("index") / "faiss_index"
+    embeddings = HashingEmbeddings()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(legal_corpus_loader, "_embeddings", embeddings)
+        _, manifest, index_path = legal_corpus_loader.build_legal_index(REPO_DOCS, index_root)
+    corpus = CorpusShards(index_path, manifest["files"], manifest["shards"])
+    yield corpus, manifest, embeddings
+    corpus.close()
+
+
+def test_flat_files_take_their_jurisdiction_from_the_file_name():
+    assert detect_jurisdiction("germany.txt", "") == "germany"
+    assert detect_jurisdiction("usa.txt", "") == "united_states"
+    assert detect_jurisdiction("contracts/india/msa.txt", "") == "india"
+    assert detect_jurisdiction("notes.txt", "") == GENERAL
+
+
+def test_real_corpus_is_tagged_by_file_name(shards):
+    _, manifest, _ = shards
+    tags = {Path(path).name: entry["jurisdiction"] for path, entry in manifest["files"].items()}
+    assert tags == {"germany.txt": "germany", "india.txt": "india", "usa.txt": "united_states"}
+
+
+@pytest.mark.parametrize("jurisdiction, expected", [("Germany", "germany"), ("USA", "united_states"), ("India", "india")])
+def test_scoped_query_only_returns_the_jurisdiction(shards, jurisdiction, expected):
+    corpus, _, embeddings = shards
+    query = embeddings.embed_query("confidential information governing law termination")
+    docs = corpus.search(query, k=4, categories=["ndas"], jurisdiction=jurisdiction)
+    assert docs
+    assert {doc.metadata["jurisdiction"] for doc in docs} == {expected}
+
+
+def test_scoped_query_matches_exact_filtered_search(shards):
+    corpus, _, embeddings = shards
+    query = np.asarray(embeddings.embed_query("confidential information disclosure"), dtype=np.float32)
+    hits = corpus.search_rows(query, k=3, jurisdiction="India")
+
+    rows = np.nonzero(np.asarray(corpus.row_codes) == corpus.jurisdictions.index("india"))[0]
+    distances = ((np.asarray(corpus.store.vectors[rows]) - query) ** 2).sum(axis=1)
+    assert [row for _, row in hits] == rows[np.argsort(distances)[:3]].tolist()
+
+
+def test_unknown_jurisdiction_falls_back_to_unfiltered(shards):
+    corpus, _, embeddings = shards
+    query = embeddings.embed_query("confidential information")
+    docs = corpus.search(query, k=corpus.store.count, jurisdiction="Japan")
+    assert {doc.metadata["jurisdiction"] for doc in docs} == {"germany", "india", "united_states"}
+
+
+def test_rebuild_publishes_a_new_version_and_keeps_the_served_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(legal_corpus_loader, "_embeddings", HashingEmbeddings())
+    docs, index_root = tmp_path / "docs", tmp_path / "faiss_index"
+    shutil.copytree(REPO_DOCS, docs)
+    _, first, first_dir = legal_corpus_loader.build_legal_index(docs, index_root)
+    served = CorpusShards(first_dir, first["files"], first["shards"])
+
+    (docs / "france.txt").write_text("This agreement is governed by the laws of France. " * 50, encoding="utf-8")
+    _, second, second_dir = legal_corpus_loader.build_legal_index(docs, index_root)
+
+    assert second_dir != first_dir
+    assert legal_corpus_loader.current_index_dir(index_root) == second_dir
+    assert not (index_root / legal_corpus_loader.BUILD_DIR).exists()
+    #the version already being served is left untouched
+    assert served.store.count == sum(entry["count"] for entry in first["files"].values())
+    assert (first_dir / legal_corpus_loader.MANIFEST_FILE).exists()
+    served.close()
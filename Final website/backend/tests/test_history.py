@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+import base64
+import os
+import pytest
+
+#database.py builds its engines at import; these tests use their own engines on a temporary file
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import get_async_db
+from models import Base, Log, LogDailyRollup
+from retention import LOG_RETENTION_DAYS, RetentionJob, UNKNOWN_EVENT_TYPE
+from routes.history import router as history_router
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "history.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_db():
+        async with async_session() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(history_router, prefix="/api/history")
+    app.dependency_overrides[get_async_db] = override_db
+    with TestClient(app) as client:
+        yield client, sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def add_logs(session_factory, rows: list):
+    with session_factory() as session:
+        session.execute(insert(Log), rows)
+        session.commit()
+
+
+def all_pages(client, path: str, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params)
+        assert response.status_code == 200
+        body = response.json()
+        ids.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_rows_sharing_a_timestamp_split_across_pages(db):
+    client, session_factory = db
+    same = datetime(2026, 5, 1, 12, 0, 0)
+    add_logs(session_factory, [{"event_type": "ask", "details": str(i), "timestamp": same} for i in range(5)]
+             + [{"event_type": "ask", "details": "newer", "timestamp": same + timedelta(seconds=1)}])
+
+    #every page boundary but the last falls between rows with the same timestamp
+    assert all_pages(client, "/api/history/logs", limit=2) == [6, 5, 4, 3, 2, 1]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"yesterday|1").decode(),
+    base64.urlsafe_b64encode(b"2026-05-01T12:00:00|one").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_malformed_cursor_is_a_bad_request(db, cursor):
+    client, _ = db
+    response = client.get("/api/history/logs", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_rows_without_a_timestamp_are_left_out(db):
+    client, session_factory = db
+    add_logs(session_factory, [{"event_type": "ask", "details": "dated", "timestamp": datetime(2026, 5, 1)}])
+    with session_factory() as session:
+        #an explicit NULL; the column default would fill in a timestamp for a missing value
+        session.execute(insert(Log).values(event_type="ask", details="undated", timestamp=None))
+        session.commit()
+        assert session.scalar(select(func.count()).select_from(Log).where(Log.timestamp.is_(None))) == 1
+
+    assert [item["details"] for item in client.get("/api/history/logs").json()["items"]] == ["dated"]
+    assert client.get("/api/history/logs/daily").json() == [{"day": "2026-05-01", "event_type": "ask", "count": 1}]
+
+
+def test_rollup_then_delete_keeps_daily_totals(db):
+    client, session_factory = db
+    old_day = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0) - timedelta(days=LOG_RETENTION_DAYS + 5)
+    recent = datetime.utcnow() - timedelta(days=1)
+    add_logs(session_factory, [
+        {"event_type": "ask", "details": "old", "timestamp": old_day},
+        {"event_type": "ask", "details": "old", "timestamp": old_day + timedelta(hours=1)},
+        {"event_type": None, "details": "old", "timestamp": old_day + timedelta(hours=2)},
+        {"event_type": "ask", "details": "recent", "timestamp": recent},
+    ])
+    before = client.get("/api/history/logs/daily").json()
+
+    report = RetentionJob(session_factory=session_factory, batch_size=2).run_once()
+
+    assert report["logs_rolled_up"] == 3
+    assert client.get("/api/history/logs/daily").json() == before
+    assert {(row["event_type"], row["count"]) for row in before if row["day"] == old_day.date().isoformat()} == \
+        {("ask", 2), (UNKNOWN_EVENT_TYPE, 1)}
+    assert [item["details"] for item in client.get("/api/history/logs").json()["items"]] == ["recent"]
+    with session_factory() as session:
+        assert session.scalar(select(func.sum(LogDailyRollup.count))) == 3
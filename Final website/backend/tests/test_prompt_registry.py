@@ -0,0 +1,92 @@
+import os
+import pytest
+
+from conftest import BACKEND_DIR
+from prompt_registry import DEFAULT_TEMPLATES, PROMPT_FIELDS
+from lexora_common.prompt_registry import CompiledPrompt, PromptRegistry
+
+
+def test_values_are_inserted_verbatim():
+    prompt = CompiledPrompt("qa", "Context: {context}\nQuestion: {question}")
+
+    rendered = prompt.render(context="clause {question} and {{braces}} and {0}", question="what is {x}?")
+
+    assert rendered == "Context: clause {question} and {{braces}} and {0}\nQuestion: what is {x}?"
+
+
+def test_doubled_braces_are_literal():
+    prompt = CompiledPrompt("json", 'Reply as {{"answer": ...}} to {question}')
+
+    assert prompt.fields == {"question"}
+    assert prompt.render(question="q") == 'Reply as {"answer": ...} to q'
+
+
+@pytest.mark.parametrize("text", ["{0}", "{}", "{a.b}", "{a[0]}", "{a!r}", "{a:>10}", "unclosed {a", "stray } brace"])
+def test_unsupported_placeholders_are_rejected(text):
+    with pytest.raises(ValueError):
+        CompiledPrompt("bad", text)
+
+
+def test_placeholders_must_match_exactly():
+    prompt = CompiledPrompt("qa", "{context} {extra}")
+    with pytest.raises(ValueError, match=r"unknown placeholders \['extra'\], missing placeholders \['question'\]"):
+        prompt.validate({"context", "question"})
+    with pytest.raises(ValueError):
+        prompt.render(context="only one")
+
+
+def test_shipped_templates_are_valid():
+    registry = PromptRegistry(PROMPT_FIELDS, DEFAULT_TEMPLATES, prompts_dir=BACKEND_DIR / "prompts")
+    registry.load_all()
+    assert set(registry.stats()["templates"]) == set(PROMPT_FIELDS)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    (tmp_path / "greeting.txt").write_text("Hello {name}", encoding="utf-8")
+    registry = PromptRegistry({"greeting": {"name"}}, prompts_dir=tmp_path, reload_check_seconds=0)
+    registry.load_all()
+    return registry
+
+
+def edit(path, text: str):
+    #the next mtime, even on filesystems with coarse timestamps
+    mtime_ns = path.stat().st_mtime_ns + 1_000_000_000
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_edited_template_is_reloaded(registry, tmp_path):
+    assert registry.render("greeting", name="Ada") == "Hello Ada"
+
+    edit(tmp_path / "greeting.txt", "Good morning {name}")
+
+    assert registry.render("greeting", name="Ada") == "Good morning Ada"
+    assert registry.stats()["reloads"] == 1
+
+
+def test_invalid_edit_keeps_the_previous_template(registry, tmp_path):
+    edit(tmp_path / "greeting.txt", "Hello {nickname}")
+
+    assert registry.render("greeting", name="Ada") == "Hello Ada"
+    assert registry.render("greeting", name="Ada") == "Hello Ada"
+    assert registry.stats()["failed_reloads"] == 1  # not retried until the file changes again
+
+    edit(tmp_path / "greeting.txt", "Hi {name}")
+    assert registry.render("greeting", name="Ada") == "Hi Ada"
+
+
+def test_unchanged_template_is_not_recompiled(registry):
+    template = registry.get("greeting")
+    registry.render("greeting", name="Ada")
+    assert registry.get("greeting") is template
+    assert registry.stats()["reloads"] == 0
+
+
+def test_missing_template_uses_its_default(tmp_path):
+    registry = PromptRegistry({"greeting": {"name"}}, defaults={"greeting": "Hey {name}"}, prompts_dir=tmp_path)
+    registry.load_all()
+    assert registry.render("greeting", name="Ada") == "Hey Ada"
+
+    with pytest.raises(FileNotFoundError):
+        PromptRegistry({"greeting": {"name"}}, prompts_dir=tmp_path).load_all()
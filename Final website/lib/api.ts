@@ -49,6 +49,32 @@ export interface CompareResponse {
   rag_enhanced?: boolean
 }
 
+export interface StreamHandlers<TDone> {
+  onToken: (text: string) => void
+  onDone?: (result: TDone) => void
+  onStatus?: (status: { stage: string }) => void
+}
+
+export interface NDAStreamDone {
+  success: boolean
+  download_url: string
+  rag_enhanced?: boolean
+  time_to_first_token_ms?: number | null
+}
+
+export interface LegalQAStreamDone {
+  success: boolean
+  sources_used: boolean
+  confidence: string
+  time_to_first_token_ms?: number | null
+}
+
+export interface ReadinessStatus {
+  status: "ready" | "not_ready"
+  checked_seconds_ago: number | null
+  components: Record<string, { ok: boolean; [key: string]: unknown }>
+}
+
 class ApiClient {
   private isOnline = true
   private lastHealthCheck = 0
@@ -61,7 +87,8 @@ class ApiClient {
     }
 
     try {
-      const response = await fetch(`${API_BASE_URL}/health`, {
+      // Readiness only reads cached component status on the server, so polling it is cheap
+      const response = await fetch(`${API_BASE_URL}/health/ready`, {
         method: "GET",
         signal: AbortSignal.timeout(5000), // 5 second timeout
       })
@@ -151,6 +178,86 @@ class ApiClient {
     })
   }
 
+  // Reads a server-sent event stream from a POST endpoint and hands each parsed event to onEvent
+  private async streamEvents(
+    endpoint: string,
+    body: unknown,
+    onEvent: (event: string, payload: any) => void,
+  ): Promise<void> {
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+      },
+      body: JSON.stringify(body),
+    })
+
+    if (!response.ok || !response.body) {
+      const errorText = await response.text()
+      throw new Error(`HTTP error! status: ${response.status}, message: ${errorText}`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ""
+
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let boundary = buffer.indexOf("\n\n")
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        boundary = buffer.indexOf("\n\n")
+
+        let event = "message"
+        let data = ""
+        for (const line of rawEvent.split("\n")) {
+          if (line.startsWith("event:")) event = line.slice(6).trim()
+          else if (line.startsWith("data:")) data += line.slice(5).trim()
+        }
+        if (!data) continue
+
+        const payload = JSON.parse(data)
+        if (event === "error") throw new Error(payload.detail)
+        onEvent(event, payload)
+      }
+    }
+  }
+
+  // Streams the NDA draft token by token; resolves with the full draft
+  async streamNDA(data: NDAGenerateRequest, handlers: StreamHandlers<NDAStreamDone>): Promise<string> {
+    let draft = ""
+    await this.streamEvents("/nda/generate/stream", data, (event, payload) => {
+      if (event === "token") {
+        draft += payload.text
+        handlers.onToken(payload.text)
+      } else if (event === "done") {
+        handlers.onDone?.(payload)
+      } else if (event === "status") {
+        handlers.onStatus?.(payload)
+      }
+    })
+    return draft
+  }
+
+  // Streams a legal Q&A answer token by token; resolves with the full answer
+  async askLegalQuestionStream(question: string, handlers: StreamHandlers<LegalQAStreamDone>): Promise<string> {
+    let answer = ""
+    await this.streamEvents("/legal-qa/ask/stream", { question }, (event, payload) => {
+      if (event === "token") {
+        answer += payload.text
+        handlers.onToken(payload.text)
+      } else if (event === "done") {
+        handlers.onDone?.(payload)
+      }
+    })
+    return answer
+  }
+
   async downloadPDF(data: PDFDownloadRequest): Promise<Blob> {
     const isBackendAvailable = await this.checkBackendHealth()
 
@@ -183,8 +290,12 @@ class ApiClient {
     return response.blob()
   }
 
-  async healthCheck() {
-    return this.request("/health")
+  // Cached readiness report (model, index, database, LLM backend); 503 while not ready
+  async healthCheck(): Promise<ReadinessStatus> {
+    const response = await fetch(`${API_BASE_URL}/health/ready`, {
+      signal: AbortSignal.timeout(5000),
+    })
+    return response.json()
   }
 
   // Mock responses for offline mode
@@ -5,6 +5,8 @@ from routes.clause_explainer import router as explainer_router
 from routes.clause_comparator import router as comparator_router
 from models import Base
 from database import engine
+from llm_service import get_watsonx_client
+from prompt_registry import get_prompt_registry
 import logging
 import datetime
 import uvicorn
@@ -37,6 +39,16 @@ app.include_router(nda_router, prefix="/api/nda", tags=["NDA Generator"])
 app.include_router(explainer_router, prefix="/api/explainer", tags=["Clause Explainer"])
 app.include_router(comparator_router, prefix="/api/comparator", tags=["Clause Comparator"])
 
+# Compile and validate every prompt template before serving requests
+@app.on_event("startup")
+def load_prompt_templates():
+    get_prompt_registry().load_all()
+
+# Release pooled async connections to Watsonx
+@app.on_event("shutdown")
+async def close_watsonx_client():
+    await get_watsonx_client().aclose()
+
 # Root route
 @app.get("/", tags=["System"])
 async def root():
@@ -0,0 +1,11 @@
+"""
+Compares FAISS index types on the published legal corpus embedding store; the report
+itself is shared with the website backend (lexora_common/index_report.py):
+
+    python -m backend.langchain.index_report --types flat,ivf,hnsw,ivfpq --nprobe 1,8,32 --ef-search 16,64,256
+"""
+from lexora_common.index_report import main
+from backend.langchain.legal_corpus_loader import current_index_dir
+
+if __name__ == "__main__":
+    main(lambda: current_index_dir()[1])
@@ -2,53 +2,255 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import TextLoader, PyMuPDFLoader, Docx2txtLoader
+from lexora_common.embedding_store import (
+    BatchEncoder,
+    EmbeddingStore,
+    EmbeddingStoreWriter,
+    build_faiss_index,
+    load_vectorstore,
+    save_faiss_index,
+)
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
 from pathlib import Path
+from datetime import datetime
+import hashlib
+import shutil
+import json
+import time
+import os
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_legal_retriever():
+DOCS_PATH = Path(os.getenv("LEGAL_DOCS_PATH", "D:/lexora-ai/data/legal_docs"))
+INDEX_ROOT = Path(os.getenv("FAISS_INDEX_PATH", "faiss_index"))
+SUPPORTED_SUFFIXES = {".pdf", ".docx", ".txt"}
+CORPUS_PARSE_WORKERS = int(os.getenv("CORPUS_PARSE_WORKERS", str(os.cpu_count() or 1)))
+INGEST_CHECKPOINT_ROWS = int(os.getenv("INGEST_CHECKPOINT_ROWS", "5000"))
+REPORT_FILE = "ingest_report.json"
+FILES_REPORT_FILE = "ingest_files.jsonl"
+BUILD_DIR = "building"
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 3
+
+
+def get_embeddings():
+    logger.info("Initializing embeddings...")
+    return HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={'device': 'cpu'}
+    )
+
+
+def current_index_dir(index_root: Path = INDEX_ROOT):
+    """
+    Returns (version, directory) of the index currently published under index_root.
+    Falls back to a legacy flat `save_local` layout when no CURRENT pointer exists.
+    """
+    pointer = index_root / CURRENT_FILE
+    if pointer.exists():
+        version = pointer.read_text(encoding="utf-8").strip()
+        return version, index_root / version
+    if (index_root / "index.faiss").exists():
+        return "legacy", index_root
+    return None, None
+
+
+def open_index(index_dir: Path, embeddings):
+    """
+    Opens a published index as a FAISS vectorstore. Indexes written by older
+    builds with `save_local` are still readable.
+    """
+    if EmbeddingStore.exists(index_dir):
+        return load_vectorstore(index_dir, embeddings)
+    return FAISS.load_local(str(index_dir), embeddings, allow_dangerous_deserialization=True)
+
+
+def _list_corpus_files(docs_path: Path) -> list:
+    return [
+        str(file_path) for file_path in sorted(docs_path.rglob("*"))
+        if file_path.is_file() and file_path.suffix in SUPPORTED_SUFFIXES
+    ]
+
+
+def _corpus_fingerprint(files: list) -> str:
+    """
+    Identifies a corpus snapshot by path, size and mtime; a checkpoint is only resumed for the same snapshot.
+    """
+    digest = hashlib.sha256()
+    for file_path in files:
+        stat = os.stat(file_path)
+        digest.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _split_documents(documents):
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len
+    )
+    return text_splitter.split_documents(documents)
+
+def _parse_file(file_path: str):
+    """
+    Parses and splits one file. Runs inside a worker process, so it never raises:
+    failures are returned for the report instead of aborting the whole ingest.
+
+    Returns:
+        tuple: (file_path, chunks, parse seconds, error message or None)
+    """
+    start = time.perf_counter()
     try:
-        docs_path = Path("D:/lexora-ai/data/legal_docs")
-        if not docs_path.exists():
-            logger.error("Legal documents directory not found")
-            raise FileNotFoundError("Legal documents directory not found")
-        
-        logger.info("Loading legal documents...")
-        documents = []
-        for file_path in docs_path.rglob("*"):
-            if file_path.suffix == ".pdf":
-                loader = PyMuPDFLoader(str(file_path))
-            elif file_path.suffix == ".docx":
-                loader = Docx2txtLoader(str(file_path))
-            elif file_path.suffix == ".txt":
-                loader = TextLoader(str(file_path), encoding="utf-8")
+        suffix = Path(file_path).suffix
+        if suffix == ".pdf":
+            loader = PyMuPDFLoader(file_path)
+        elif suffix == ".docx":
+            loader = Docx2txtLoader(file_path)
+        else:
+            loader = TextLoader(file_path, encoding="utf-8")
+        chunks = _split_documents(loader.load())
+        return file_path, chunks, time.perf_counter() - start, None
+    except Exception as e:
+        return file_path, [], time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+def parse_corpus(files, workers: int = CORPUS_PARSE_WORKERS):
+    """
+    Parses files across a process pool and yields _parse_file results in the
+    order of `files`, whatever order the workers finish in. At most two files
+    per worker are in flight, so results never pile up in memory.
+    """
+    if workers <= 1:
+        for file_path in files:
+            yield _parse_file(file_path)
+        return
+
+    files = iter(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_parse_file, file_path) for file_path in islice(files, workers * 2))
+        while pending:
+            result = pending.popleft().result()
+            next_file = next(files, None)
+            if next_file is not None:
+                pending.append(pool.submit(_parse_file, next_file))
+            yield result
 
+def build_index(index_dir: Path, embeddings, docs_path: Path = DOCS_PATH,
+                workers: int = CORPUS_PARSE_WORKERS) -> dict:
+    """
+    Streams the corpus through parse -> split -> embed -> append into an embedding
+    store in index_dir, then saves a FAISS index built from that matrix next to it.
+
+    Only the files in flight, one embedding batch and the report counters are held
+    in memory, so peak memory does not grow with the corpus. Progress is checkpointed
+    every INGEST_CHECKPOINT_ROWS rows; rerunning after an interruption resumes from
+    the last checkpoint as long as the corpus has not changed in between. Files are
+    visited in sorted path order, so row order is the same for any worker count.
+
+    Returns:
+        dict: ingest report (per-file parse times and failures are in ingest_files.jsonl)
+    """
+    if not docs_path.exists():
+        logger.error("Legal documents directory not found")
+        raise FileNotFoundError("Legal documents directory not found")
+
+    files = _list_corpus_files(docs_path)
+    fingerprint = _corpus_fingerprint(files)
+    state = EmbeddingStoreWriter.checkpoint_state(index_dir)
+    if state is not None and state["fingerprint"] == fingerprint:
+        writer = EmbeddingStoreWriter.resume(index_dir)
+        report = state["report"]
+        os.truncate(index_dir / FILES_REPORT_FILE, state["report_bytes"])
+    else:
+        shutil.rmtree(index_dir, ignore_errors=True)
+        writer = EmbeddingStoreWriter(index_dir)
+        report = {"files": len(files), "parsed": 0, "failed": 0, "chunks": 0, "parse_seconds": 0.0, "slowest": []}
+    report["workers"] = workers
+    files_done = report["parsed"] + report["failed"]
+
+    logger.info(f"Loading {len(files) - files_done} legal documents with {workers} parse worker(s)...")
+    started = time.perf_counter()
+    encoder = BatchEncoder(writer, embeddings)
+    checkpointed_rows = writer.count
+    with (index_dir / FILES_REPORT_FILE).open("ab") as files_report:
+        for file_path, chunks, seconds, error in parse_corpus(files[files_done:], workers):
+            first_row = encoder.rows
+            encoder.add([
+                {"id": str(first_row + i), "text": chunk.page_content, "metadata": chunk.metadata}
+                for i, chunk in enumerate(chunks)
+            ])
+
+            entry = {"path": file_path, "seconds": round(seconds, 3), "chunks": len(chunks), "error": error}
+            files_report.write((json.dumps(entry) + "\n").encode("utf-8"))
+            if error:
+                logger.warning(f"⚠️ Failed to parse {file_path}: {error}")
+                report["failed"] += 1
             else:
-                continue
-            documents.extend(loader.load())
-
-        if not documents:
-            logger.error("No documents loaded")
-            raise ValueError("No legal documents found in the directory")
-
-        logger.info("Splitting documents into chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len
-        )
-        chunks = text_splitter.split_documents(documents)
-
-        logger.info("Initializing embeddings...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
-
-        logger.info("Creating FAISS vectorstore...")
-        vectorstore = FAISS.from_documents(chunks, embeddings)
+                report["parsed"] += 1
+            report["chunks"] += len(chunks)
+            report["parse_seconds"] = round(report["parse_seconds"] + seconds, 3)
+            report["slowest"] = sorted(report["slowest"] + [[entry["seconds"], file_path]], reverse=True)[:5]
+
+            if encoder.rows - checkpointed_rows >= INGEST_CHECKPOINT_ROWS:
+                encoder.flush()
+                files_report.flush()
+                os.fsync(files_report.fileno())
+                writer.checkpoint({"fingerprint": fingerprint, "report": report, "report_bytes": files_report.tell()})
+                checkpointed_rows = writer.count
+    encoder.flush()
+    store = writer.close()
+
+    report["wall_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Parsed {report['parsed']} files ({report['failed']} failed) into {report['chunks']} chunks "
+                f"in {report['wall_seconds']}s wall / {report['parse_seconds']}s parse time")
+    logger.info("Slowest files: " + ", ".join(f"{path} ({seconds}s)" for seconds, path in report["slowest"]))
+    if store.count == 0:
+        logger.error("No documents loaded")
+        raise ValueError("No legal documents found in the directory")
+
+    save_faiss_index(build_faiss_index(store), index_dir)
+    store.close()
+    with (index_dir / REPORT_FILE).open("w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    return report
+
+
+def publish_index(embeddings, index_root: Path = INDEX_ROOT, docs_path: Path = DOCS_PATH,
+                  workers: int = CORPUS_PARSE_WORKERS) -> str:
+    """
+    Builds the index in a staging directory, moves it to a new versioned directory
+    and atomically repoints CURRENT at it, so readers only ever see a complete index.
+    An interrupted build is picked up again by the next call.
+    """
+    index_root.mkdir(parents=True, exist_ok=True)
+    build_dir = index_root / BUILD_DIR
+    report = build_index(build_dir, embeddings, docs_path, workers)
+
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    os.replace(build_dir, index_root / version)
+    logger.info(f"Embedded {report['chunks']} chunks into index version {version}")
+
+    tmp_pointer = index_root / f"{CURRENT_FILE}.tmp"
+    tmp_pointer.write_text(version, encoding="utf-8")
+    os.replace(tmp_pointer, index_root / CURRENT_FILE)
+
+    # Old versions stay around briefly for processes that are still loading them
+    versions = sorted(p for p in index_root.iterdir() if p.is_dir() and p.name != BUILD_DIR)
+    for stale in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(stale, ignore_errors=True)
+    return version
+
+def get_legal_retriever():
+    try:
+        version, index_dir = current_index_dir()
+        if version is None:
+            raise FileNotFoundError(f"No FAISS index found under '{INDEX_ROOT}'")
+
+        logger.info(f"Loading FAISS index version {version}...")
+        vectorstore = open_index(index_dir, get_embeddings())
 
         logger.info("Returning FAISS retriever")
         return vectorstore.as_retriever()
@@ -59,6 +261,5 @@ def get_legal_retriever():
 
 if __name__ == "__main__":
     logger.info("🔧 Building FAISS vectorstore from legal documents...")
-    retriever = get_legal_retriever()
-    retriever.vectorstore.save_local("faiss_index")
-    logger.info("✅ FAISS index saved to 'faiss_index'")
+    version = publish_index(get_embeddings())
+    logger.info(f"✅ FAISS index version {version} published to '{INDEX_ROOT}'")
@@ -1,13 +1,124 @@
+import os
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from backend.llm_service import query_model
+from backend.llm_service import query_model, aquery_model
+from backend.langchain.legal_corpus_loader import INDEX_ROOT, current_index_dir, get_embeddings, open_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class RetrieverService:
+    """
+    Keeps the embedding model and FAISS index resident for the life of the process.
+
+    A background thread watches the index directory and, when legal_corpus_loader
+    publishes a new version, loads it off to the side and swaps the reference in one
+    assignment. Requests already running keep the index they started with.
+    """
+
+    def __init__(self, index_root: Path = INDEX_ROOT, poll_interval: float = None):
+        self.index_root = Path(index_root)
+        self.poll_interval = poll_interval or float(os.getenv("FAISS_RELOAD_INTERVAL", "5"))
+        self.version = None
+        self._embeddings = None
+        self._vectorstore = None
+        self._load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            logger.info("🧠 Loading embedding model...")
+            self._embeddings = get_embeddings()
+        return self._embeddings
+
+    def reload(self) -> bool:
+        """
+        Loads the published index if its version differs from the one being served.
+
+        Returns:
+            bool: True if a new index was swapped in
+        """
+        with self._load_lock:
+            version, index_dir = current_index_dir(self.index_root)
+            if version is None:
+                raise FileNotFoundError(f"No FAISS index found under '{self.index_root}'")
+            if version == self.version and self._vectorstore is not None:
+                return False
+
+            logger.info(f"📂 Loading FAISS index version {version}...")
+            # Vectors and index are memory-mapped, so worker processes share their pages
+            vectorstore = open_index(index_dir, self._get_embeddings())
+            # Single reference assignment: readers see either the old or the new index, never a mix
+            self._vectorstore = vectorstore
+            self.version = version
+            logger.info(f"✅ Serving FAISS index version {version}")
+            return True
+
+    def start(self):
+        """
+        Loads the index and starts the directory watcher. Safe to call more than once.
+        """
+        with self._start_lock:
+            if self._vectorstore is None:
+                self.reload()
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="faiss-index-watcher", daemon=True)
+                self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep serving the current index; a half-published or broken one is retried next poll
+                logger.error(f"❌ Index reload failed, keeping version {self.version}: {e}")
+
+    def get_relevant_documents(self, question: str):
+        if self._vectorstore is None:
+            self.start()
+        vectorstore = self._vectorstore
+        return vectorstore.as_retriever().get_relevant_documents(question)
+
+
+retriever_service = RetrieverService()
+
+# Query embedding + FAISS search is CPU-bound; async callers run it on this bounded pool
+_retrieval_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_RETRIEVAL_WORKERS", "4")),
+    thread_name_prefix="rag-retrieval"
+)
+
+def _build_prompt(question: str, docs) -> str:
+    # Format context
+    context = "\n".join([doc.page_content for doc in docs])
+
+    # Build prompt for text completion
+    return (
+        "You are a legal expert. Use the following legal context to answer the user's question clearly and concisely.\n\n"
+        f"Context:\n{context}\n\n"
+        f"Question: {question}\nAnswer:"
+    )
+
+
+def _extract_answer(response) -> str:
+    # Ensure correct response structure
+    if not isinstance(response, dict) or "explanation" not in response:
+        logger.warning("⚠️ LLM did not return expected format")
+        return "Unexpected response from the model."
+
+    return response["explanation"].strip()
+
+
 def run_rag_pipeline(question: str) -> str:
     """
     Runs a Retrieval-Augmented Generation pipeline to answer a legal question.
@@ -19,42 +130,45 @@ def run_rag_pipeline(question: str) -> str:
         str: the generated answer
     """
     try:
-        # Load FAISS index
-        logger.info("📂 Loading FAISS retriever from saved index...")
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
-        vectorstore = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-        retriever = vectorstore.as_retriever()
-
-        # Retrieve documents
+        # Retrieve documents from the resident index
         logger.info("🔍 Retrieving relevant documents...")
-        docs = retriever.get_relevant_documents(question)
+        docs = retriever_service.get_relevant_documents(question)
         if not docs:
             logger.warning("⚠️ No relevant documents found")
             return "No relevant documents found to answer the question."
 
-        # Format context
-        context = "\n".join([doc.page_content for doc in docs])
-
-        # Build prompt for text completion
-        prompt = (
-            "You are a legal expert. Use the following legal context to answer the user's question clearly and concisely.\n\n"
-            f"Context:\n{context}\n\n"
-            f"Question: {question}\nAnswer:"
-        )
-
         # Query LLM
         logger.info("🤖 Querying LLM with full prompt...")
-        response = query_model(prompt)
+        response = query_model(_build_prompt(question, docs))
+        return _extract_answer(response)
+
+    except Exception as e:
+        logger.error(f"❌ Error in RAG pipeline: {str(e)}")
+        return f"Error in RAG pipeline: {str(e)}"
+
+
+async def arun_rag_pipeline(question: str) -> str:
+    """
+    Async variant of run_rag_pipeline: retrieval runs on a bounded executor and
+    generation uses native async HTTP, so the event loop is never blocked.
+
+    Args:
+        question (str): The user's legal question
 
-        # Ensure correct response structure
-        if not isinstance(response, dict) or "explanation" not in response:
-            logger.warning("⚠️ LLM did not return expected format")
-            return "Unexpected response from the model."
+    Returns:
+        str: the generated answer
+    """
+    try:
+        logger.info("🔍 Retrieving relevant documents...")
+        loop = asyncio.get_running_loop()
+        docs = await loop.run_in_executor(_retrieval_executor, retriever_service.get_relevant_documents, question)
+        if not docs:
+            logger.warning("⚠️ No relevant documents found")
+            return "No relevant documents found to answer the question."
 
-        return response["explanation"].strip()
+        logger.info("🤖 Querying LLM with full prompt...")
+        response = await aquery_model(_build_prompt(question, docs))
+        return _extract_answer(response)
 
     except Exception as e:
         logger.error(f"❌ Error in RAG pipeline: {str(e)}")
@@ -1,6 +1,12 @@
 import os
+import time
 import logging
+import threading
+import json
+import asyncio
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -9,82 +15,278 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
-def get_iam_token() -> str:
+class WatsonxClient:
     """
-    Fetch IAM token from IBM Cloud using API key from .env.
+    Reusable IBM Watsonx client.
+
+    Caches the IAM access token until shortly before it expires (refreshing it once,
+    under a single lock shared by sync and async callers, when several requests need
+    a new one) and keeps a pool of keep-alive connections to IAM and the generation endpoint.
     """
-    api_key = os.getenv("IBM_API_KEY")
-    if not api_key:
-        raise ValueError("IBM_API_KEY not found in environment variables")
-
-    response = requests.post(
-        "https://iam.cloud.ibm.com/identity/token",
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-        data={
-            "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
-            "apikey": api_key
-        }
-    )
 
-    if response.status_code != 200:
-        raise Exception(f"Failed to get token: {response.status_code}, {response.text}")
+    def __init__(
+        self,
+        api_key: str = None,
+        project_id: str = None,
+        model_id: str = None,
+        base_url: str = None,
+        iam_url: str = None,
+        pool_size: int = None,
+        timeout: float = None,
+        refresh_margin: float = 60,
+    ):
+        self.api_key = api_key or os.getenv("IBM_API_KEY")
+        self.project_id = project_id or os.getenv("IBM_PROJECT_ID")
+        self.model_id = model_id or os.getenv("IBM_MODEL_ID", "ibm/granite-3-3-8b-instruct")
+        self.base_url = (base_url or os.getenv("IBM_GRANITE_URL", "https://us-south.ml.cloud.ibm.com")).rstrip("/")
+        self.iam_url = (iam_url or os.getenv("IBM_IAM_URL", "https://iam.cloud.ibm.com")).rstrip("/")
+        self.api_version = "2023-05-29"
+        self.timeout = timeout or float(os.getenv("WATSONX_TIMEOUT", "120"))
+        self.refresh_margin = refresh_margin
 
-    return response.json()["access_token"]
+        pool_size = pool_size or int(os.getenv("WATSONX_POOL_SIZE", "10"))
+        self.pool_size = pool_size
+        # pool_block: beyond pool_size concurrent calls wait for a connection instead of opening throwaway ones
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
+        # (token, expiry) is replaced as one tuple, so a reader never sees a token with another's expiry
+        self._token_state = (None, 0.0)
+        self._token_lock = threading.Lock()
+        self._async_http = None
 
-def query_model(prompt: str) -> dict:
-    """
-    Query the IBM Watsonx Granite model using plain text prompt format.
-    """
-    try:
-        project_id = os.getenv("IBM_PROJECT_ID")
-        model_id = os.getenv("IBM_MODEL_ID", "ibm/granite-3-3-8b-instruct")
-        base_url = os.getenv("IBM_GRANITE_URL", "https://us-south.ml.cloud.ibm.com")
-        api_version = "2023-05-29"
+    def _fresh_token(self):
+        token, expires_at = self._token_state
+        return token if token is not None and time.time() < expires_at - self.refresh_margin else None
 
-        if not project_id:
-            raise ValueError("IBM_PROJECT_ID missing from .env")
+    def get_token(self) -> str:
+        """
+        Returns a cached IAM token, fetching a new one only when it is missing or about to expire.
+        """
+        token = self._fresh_token()
+        if token is not None:
+            return token
+
+        with self._token_lock:
+            # Another request may have refreshed the token while we waited for the lock
+            token = self._fresh_token()
+            if token is not None:
+                return token
+
+            if not self.api_key:
+                raise ValueError("IBM_API_KEY not found in environment variables")
+
+            response = self.session.post(
+                f"{self.iam_url}/identity/token",
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                data={
+                    "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
+                    "apikey": self.api_key
+                },
+                timeout=self.timeout,
+            )
 
-        token = get_iam_token()
-        logger.info("✅ Token acquired")
+            if response.status_code != 200:
+                raise Exception(f"Failed to get token: {response.status_code}, {response.text}")
 
-        url = f"{base_url}/ml/v1/text/generation?version={api_version}"
+            body = response.json()
+            self._token_state = (body["access_token"], time.time() + float(body.get("expires_in", 3600)))
+            logger.info("✅ Token acquired")
+            return body["access_token"]
 
+    def invalidate_token(self, token: str = None):
+        """
+        Drops the cached token. Given the token a request was rejected with, it is only
+        dropped if still cached, so concurrent 401s cause a single refresh.
+        """
+        with self._token_lock:
+            if token is None or self._token_state[0] == token:
+                self._token_state = (None, 0.0)
+
+    def _generation_request(self, prompt: str, parameters: dict = None, stream: bool = False):
+        """
+        Returns the (url, payload) pair for a text generation call.
+        """
+        if not self.project_id:
+            raise ValueError("IBM_PROJECT_ID missing from .env")
+
+        endpoint = "generation_stream" if stream else "generation"
+        url = f"{self.base_url}/ml/v1/text/{endpoint}?version={self.api_version}"
         payload = {
-            "project_id": project_id,
-            "model_id": model_id,
+            "project_id": self.project_id,
+            "model_id": self.model_id,
             "input": prompt,  # 🔄 Correct format for /ml/v1/text/generation
-            "parameters": {
+            "parameters": parameters or {
                 "temperature": 0.3,
                 "max_tokens": 1000,
                 "top_p": 1
             }
         }
+        return url, payload
 
-        headers = {
+    @staticmethod
+    def _auth_headers(token: str) -> dict:
+        return {
             "Accept": "application/json",
             "Content-Type": "application/json",
             "Authorization": f"Bearer {token}"
         }
 
+    def generate(self, prompt: str, parameters: dict = None) -> requests.Response:
+        """
+        Sends a text generation request, retrying once with a fresh token if the cached one was rejected.
+        """
+        url, payload = self._generation_request(prompt, parameters)
+
+        for attempt in range(2):
+            token = self.get_token()
+            response = self.session.post(url, headers=self._auth_headers(token), json=payload, timeout=self.timeout)
+            if response.status_code != 401 or attempt:
+                return response
+            logger.warning("🔑 Token rejected, refreshing...")
+            self.invalidate_token(token)
+
+    def _get_async_http(self) -> httpx.AsyncClient:
+        if self._async_http is None:
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+            self._async_http = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self._async_http
+
+    async def aget_token(self) -> str:
+        """
+        Async variant of get_token; shares the same token cache. A refresh runs get_token
+        on a worker thread, so sync and async callers share one lock and one IAM request.
+        """
+        token = self._fresh_token()
+        if token is not None:
+            return token
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_token)
+
+    async def agenerate(self, prompt: str, parameters: dict = None) -> httpx.Response:
+        """
+        Async variant of generate using native async HTTP; never blocks the event loop.
+        """
+        url, payload = self._generation_request(prompt, parameters)
+
+        for attempt in range(2):
+            token = await self.aget_token()
+            response = await self._get_async_http().post(url, headers=self._auth_headers(token), json=payload)
+            if response.status_code != 401 or attempt:
+                return response
+            logger.warning("🔑 Token rejected, refreshing...")
+            self.invalidate_token(token)
+
+    async def agenerate_stream(self, prompt: str, parameters: dict = None):
+        """
+        Streams generated text from the Watsonx generation_stream endpoint, yielding
+        each chunk as its server-sent event arrives.
+        """
+        url, payload = self._generation_request(prompt, parameters, stream=True)
+
+        for attempt in range(2):
+            token = await self.aget_token()
+            headers = self._auth_headers(token)
+            headers["Accept"] = "text/event-stream"
+            async with self._get_async_http().stream("POST", url, headers=headers, json=payload) as response:
+                if response.status_code == 401 and not attempt:
+                    logger.warning("🔑 Token rejected, refreshing...")
+                    self.invalidate_token(token)
+                    continue
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise Exception(f"Watsonx Error: {response.status_code} - {body.decode(errors='replace')}")
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):].strip() or "{}")
+                    text = event.get("results", [{}])[0].get("generated_text", "")
+                    if text:
+                        yield text
+                return
+
+    async def aclose(self):
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_watsonx_client() -> WatsonxClient:
+    """
+    Returns the process-wide Watsonx client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WatsonxClient()
+    return _client
+
+
+def get_iam_token() -> str:
+    """
+    Fetch IAM token from IBM Cloud using API key from .env (cached until shortly before expiry).
+    """
+    return get_watsonx_client().get_token()
+
+
+def _parse_generation(response) -> dict:
+    """
+    Turns a Watsonx generation response (requests or httpx) into the service's result dict.
+    """
+    logger.info(f"📬 Response status: {response.status_code}")
+
+    if response.status_code != 200:
+        logger.error(f"Watsonx error: {response.status_code} - {response.text}")
+        return {"explanation": f"Watsonx Error: {response.status_code}", "legal_domain": "Unknown"}
+
+    result = response.json()
+    output = result.get("results", [{}])[0].get("generated_text", "")
+
+    if not output:
+        logger.warning("⚠️ Empty response from model.")
+
+    return {
+        "explanation": output.strip() if output else "No output from model",
+        "legal_domain": "General"
+    }
+
+
+def query_model(prompt: str) -> dict:
+    """
+    Query the IBM Watsonx Granite model using plain text prompt format.
+    """
+    try:
         logger.info("📡 Sending request to Watsonx...")
-        response = requests.post(url, headers=headers, json=payload)
-        logger.info(f"📬 Response status: {response.status_code}")
+        return _parse_generation(get_watsonx_client().generate(prompt))
+
+    except Exception as e:
+        logger.error(f"❌ LLM Service Error: {e}")
+        return {"explanation": f"Error: {str(e)}", "legal_domain": "Unknown"}
 
-        if response.status_code != 200:
-            logger.error(f"Watsonx error: {response.status_code} - {response.text}")
-            return {"explanation": f"Watsonx Error: {response.status_code}", "legal_domain": "Unknown"}
 
-        result = response.json()
-        output = result.get("results", [{}])[0].get("generated_text", "")
+async def astream_model(prompt: str):
+    """
+    Yields generated text chunks from Watsonx as they are produced.
+    """
+    logger.info("📡 Streaming request to Watsonx...")
+    async for chunk in get_watsonx_client().agenerate_stream(prompt):
+        yield chunk
 
-        if not output:
-            logger.warning("⚠️ Empty response from model.")
 
-        return {
-            "explanation": output.strip() if output else "No output from model",
-            "legal_domain": "General"
-        }
+async def aquery_model(prompt: str) -> dict:
+    """
+    Async variant of query_model using native async HTTP to Watsonx.
+    """
+    try:
+        logger.info("📡 Sending request to Watsonx...")
+        return _parse_generation(await get_watsonx_client().agenerate(prompt))
 
     except Exception as e:
         logger.error(f"❌ LLM Service Error: {e}")
@@ -0,0 +1,25 @@
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.prompt_registry import PromptRegistry
+
+#every template and the placeholders it must use, no more and no fewer
+PROMPT_FIELDS = {
+    "explainer_prompt": {"clause"},
+    "nda_prompt": {"party_1", "party_2", "jurisdiction", "purpose"},
+    "comparator_prompt": {"clause_type", "country_1", "country_2"},
+}
+
+_registry = PromptRegistry(PROMPT_FIELDS)
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """
+    Returns the process-wide prompt registry.
+    """
+    return _registry
+
+
+def render_prompt(name: str, /, **values) -> str:
+    """
+    Renders a prompt template by name (file name without .txt) from the shared registry.
+    """
+    return _registry.render(name, **values)
@@ -0,0 +1,10 @@
+"""
+Puts the repository root on sys.path so the Watsonx backend can import the lexora_common
+package it shares with the website backend. Import it before any lexora_common import.
+"""
+from pathlib import Path
+import sys
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.append(str(REPO_ROOT))
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from pathlib import Path
 import logging
 import json
 import re
 from typing import Dict, Any, Optional
-from llm_service import query_model
+from llm_service import aquery_model
+from prompt_registry import render_prompt
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -82,21 +82,16 @@ async def compare_clause(request: ClauseCompareRequest) -> Dict[str, Any]:
     try:
         logger.info(f"Request received: {request.dict()}")
         
-        # Load prompt template
-        prompt_path = Path("prompts/comparator_prompt.txt")
-        if not prompt_path.exists():
-            logger.error("Prompt template missing at: %s", prompt_path)
-            raise HTTPException(500, "Prompt template not found")
-        
-        with prompt_path.open("r", encoding="utf-8") as f:
-            prompt = f.read().format(
-                clause_type=request.clause_type,
-                country_1=request.country_1,
-                country_2=request.country_2
-            )
+        # Render the compiled prompt template
+        prompt = render_prompt(
+            "comparator_prompt",
+            clause_type=request.clause_type,
+            country_1=request.country_1,
+            country_2=request.country_2
+        )
         
         # Get LLM response
-        response = query_model(prompt)
+        response = await aquery_model(prompt)
         output = response.get("explanation", "").strip()
         logger.debug(f"LLM Output:\n{output}")
         
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from pathlib import Path
-from llm_service import query_model
+from llm_service import aquery_model
+from prompt_registry import render_prompt
 
 router = APIRouter()
 
@@ -11,19 +11,11 @@ class ClauseExplainRequest(BaseModel):
 @router.post("/explain")
 async def explain_clause(request: ClauseExplainRequest):
     try:
-        #load explainer prompt template
-        prompt_path = Path("prompts/explainer_prompt.txt")
-        if not prompt_path.exists():
-            raise HTTPException(status_code=500, detail="Prompt template not found")
-        
-        with prompt_path.open("r") as file:
-            prompt_template = file.read()
-
-        # format prompt with clause
-        formatted_prompt = prompt_template.format(clause=request.clause)
+        # format the compiled explainer template with the clause
+        formatted_prompt = render_prompt("explainer_prompt", clause=request.clause)
 
         #query llm service
-        result = query_model(formatted_prompt)
+        result = await aquery_model(formatted_prompt)
 
         #assuming llm returns a structured response with explanation and legal domain
         return {
@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from pathlib import Path
-from llm_service import query_model
-from docx import Document
+from llm_service import aquery_model, astream_model
+from prompt_registry import render_prompt
+import repo_root  # puts the shared lexora_common package on the import path
+from lexora_common.document_store import get_document_store, build_nda_docx, DOCX_MEDIA_TYPE
+import logging
+import json
 import time
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 class NDAGenerateRequest(BaseModel):
@@ -14,58 +20,85 @@ class NDAGenerateRequest(BaseModel):
     jurisdiction: str
     purpose: str
 
+def build_nda_prompt(request: NDAGenerateRequest) -> str:
+    #format the compiled nda template with request data
+    return render_prompt(
+        "nda_prompt",
+        party_1=request.party_1,
+        party_2=request.party_2,
+        jurisdiction=request.jurisdiction,
+        purpose=request.purpose
+    )
+
+async def save_nda_document(nda_draft: str) -> str:
+    #stored under a hash of the draft, so regenerating the same draft reuses the existing file
+    return await run_in_threadpool(get_document_store().save, "nda", nda_draft, build_nda_docx)
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @router.post("/generate")
 async def generate_nda(request: NDAGenerateRequest):
     try:
-        #loading nda prompt template
-        prompt_path = Path("prompts/nda_prompt.txt")
-        if not prompt_path.exists():
-            raise HTTPException(status_code=500, detail="Prompt template not found")
-        
-        with prompt_path.open("r") as file:
-            prompt_template = file.read()
-
-        #format prompt with request data
-        formatted_prompt = prompt_template.format(
-            party_1=request.party_1,
-            party_2=request.party_2,
-            jurisdiction=request.jurisdiction,
-            purpose=request.purpose
-        )
-
-        #query llm service
-        nda_draft = query_model(formatted_prompt)
-
-        #ensure generated_docs directory exists
-        docs_dir = Path("generated_docs")
-        docs_dir.mkdir(exist_ok=True)
-
-        #generate unique filename with timestamp
-        timestamp = int(time.time())
-        filename = f"nda_{timestamp}.docx"
-        file_path = docs_dir / filename
-
-        #create word document
-        doc = Document()
-        doc.add_heading("Non-Disclosure Agreement", 0)
-        doc.add_paragraph(nda_draft)
-        doc.save(file_path)
+        formatted_prompt = build_nda_prompt(request)
+
+        #query llm service; the draft is the explanation text, and an "Unknown" domain marks a failed call
+        result = await aquery_model(formatted_prompt)
+        if result.get("legal_domain") == "Unknown":
+            raise HTTPException(status_code=502, detail=f"Error generating NDA: {result.get('explanation', '')}")
+        nda_draft = result["explanation"]
+
+        filename = await save_nda_document(nda_draft)
 
         return {
             "nda_draft": nda_draft,
             "download_url": f"/api/nda/download/{filename}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating NDA: {str(e)}")
 
+@router.post("/generate/stream")
+async def generate_nda_stream(request: NDAGenerateRequest):
+    """
+    Streams the NDA draft from Watsonx as server-sent events (`token` events, then
+    `done` with the download URL once the DOCX has been written).
+    """
+    formatted_prompt = build_nda_prompt(request)
+
+    async def events():
+        started = time.perf_counter()
+        first_token_ms = None
+        chunks = []
+        try:
+            async for chunk in astream_model(formatted_prompt):
+                if first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - started) * 1000
+                    logger.info(f"NDA stream time-to-first-token: {first_token_ms:.0f} ms")
+                chunks.append(chunk)
+                yield format_sse("token", {"text": chunk})
+
+            filename = await save_nda_document("".join(chunks).strip())
+            yield format_sse("done", {
+                "download_url": f"/api/nda/download/{filename}",
+                "time_to_first_token_ms": first_token_ms,
+            })
+        except Exception as e:
+            logger.error(f"❌ Error streaming NDA: {e}")
+            yield format_sse("error", {"detail": f"Error generating NDA: {str(e)}"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/download/{filename}")
 async def download_nda(filename: str):
-    file_path = Path("generated_docs") / filename
-    if not file_path.exists() or not file_path.is_file():
+    #only names issued by the store are accepted, so paths outside it cannot be requested
+    content = await run_in_threadpool(get_document_store().read, filename)
+    if content is None:
         raise HTTPException(status_code=404, detail="File not found")
-    
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+    return Response(
+        content=content,
+        media_type=DOCX_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
\ No newline at end of file
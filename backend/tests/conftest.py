@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# the backend's modules import each other as top-level modules, as when run from its directory
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
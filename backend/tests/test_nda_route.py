@@ -0,0 +1,67 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+import llm_service
+import prompt_registry
+from conftest import BACKEND_DIR
+from llm_service import WatsonxClient
+from lexora_common import document_store
+from lexora_common.document_store import DocumentStore
+from routes.nda_generator import router as nda_router
+from watsonx_stub import start_stub_server
+
+NDA_REQUEST = {"party_1": "Acme", "party_2": "Globex", "jurisdiction": "Germany", "purpose": "a merger"}
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base_url(stub):
+    return stub.base_url
+
+
+@pytest.fixture
+def api(stub, base_url, tmp_path, monkeypatch):
+    client = WatsonxClient(api_key="test", project_id="test", base_url=base_url, iam_url=stub.base_url)
+    monkeypatch.setattr(llm_service, "_client", client)
+    monkeypatch.setattr(document_store, "_store", DocumentStore(tmp_path))
+    monkeypatch.setattr(prompt_registry._registry, "prompts_dir", BACKEND_DIR / "prompts")
+
+    app = FastAPI()
+    app.include_router(nda_router, prefix="/api/nda")
+    with TestClient(app) as test_client:
+        yield test_client
+    client.session.close()
+
+
+def test_generate_saves_and_returns_the_draft_text(api):
+    response = api.post("/api/nda/generate", json=NDA_REQUEST)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert isinstance(body["nda_draft"], str)
+    assert body["nda_draft"].startswith("Stub response to:")
+
+    download = api.get(body["download_url"])
+    assert download.status_code == 200
+    assert download.headers["content-type"] == document_store.DOCX_MEDIA_TYPE
+
+
+@pytest.mark.parametrize("base_url", ["http://127.0.0.1:1/unreachable"])
+def test_generate_fails_when_watsonx_fails(api):
+    response = api.post("/api/nda/generate", json=NDA_REQUEST)
+
+    assert response.status_code == 502
+    assert response.json()["detail"].startswith("Error generating NDA:")
+
+
+def test_store_rejects_non_string_text(tmp_path):
+    with pytest.raises(TypeError):
+        DocumentStore(tmp_path).save("nda", {"explanation": "draft"}, document_store.build_nda_docx)
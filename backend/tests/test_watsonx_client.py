@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pytest
+
+from llm_service import WatsonxClient
+from watsonx_stub import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    # slow token requests widen the window in which concurrent callers could each fetch one
+    server = start_stub_server(latency=0.05, token_latency=0.2)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(stub):
+    client = WatsonxClient(api_key="test", project_id="test", base_url=stub.base_url, iam_url=stub.base_url)
+    yield client
+    client.session.close()
+
+
+def test_concurrent_sync_and_async_calls_fetch_one_token(stub, client):
+    async def async_calls():
+        responses = await asyncio.gather(*(client.agenerate(f"async {i}") for i in range(8)))
+        await client.aclose()
+        return responses
+
+    with ThreadPoolExecutor(max_workers=9) as pool:
+        async_run = pool.submit(asyncio.run, async_calls())
+        sync_responses = list(pool.map(client.generate, [f"sync {i}" for i in range(8)]))
+        async_responses = async_run.result()
+
+    assert [response.status_code for response in sync_responses + async_responses] == [200] * 16
+    assert stub.stats["token_requests"] == 1
+    assert stub.stats["generation_requests"] == 16
+
+
+def test_rejected_token_is_refreshed_once(stub, client):
+    assert client.generate("first").status_code == 200
+    stub.valid_tokens.clear()  # the server revokes every token it issued
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        responses = list(pool.map(client.generate, ["again"] * 4))
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert stub.stats["token_requests"] == 2
+
+
+def test_async_rejected_token_is_refreshed(stub, client):
+    async def calls():
+        first = await client.agenerate("first")
+        stub.valid_tokens.clear()
+        second = await client.agenerate("second")
+        await client.aclose()
+        return first, second
+
+    first, second = asyncio.run(calls())
+    assert (first.status_code, second.status_code) == (200, 200)
+    assert second.json()["results"][0]["generated_text"] == "Stub response to: second"
+    assert stub.stats["token_requests"] == 2
+
+
+def test_stream_yields_chunks_in_order(stub, client):
+    async def stream():
+        chunks = [chunk async for chunk in client.agenerate_stream("one two three four")]
+        await client.aclose()
+        return chunks
+
+    assert asyncio.run(stream()) == ["Stub", " response", " to:", " one", " two", " three", " four"]
+    assert stub.stats["token_requests"] == 1
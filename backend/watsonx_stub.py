@@ -0,0 +1,148 @@
+"""
+Local stand-in for the IBM IAM and Watsonx text generation endpoints.
+
+Point the client at it to exercise token caching and connection reuse without
+network access or credentials:
+
+    python watsonx_stub.py --port 8099
+    IBM_IAM_URL=http://127.0.0.1:8099 IBM_GRANITE_URL=http://127.0.0.1:8099 \
+    IBM_API_KEY=test IBM_PROJECT_ID=test uvicorn app:app
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import argparse
+import threading
+import json
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WatsonxStubServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that issues short-lived fake tokens and echoes prompts back.
+    Counters let callers check how many tokens were issued and connections opened.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, token_ttl: int = 3600, latency: float = 0.0, token_latency: float = 0.0):
+        super().__init__(address, _StubHandler)
+        self.token_ttl = token_ttl
+        self.latency = latency
+        self.token_latency = token_latency
+        self.valid_tokens = set()
+        self.stats = {"token_requests": 0, "generation_requests": 0, "connections": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_stream(self, text: str):
+        """
+        Emits one server-sent event per word, spreading the configured latency across them.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = text.split(" ")
+        for index, word in enumerate(words):
+            if self.server.latency:
+                time.sleep(self.server.latency / len(words))
+            chunk = word if index == 0 else f" {word}"
+            event = json.dumps({"results": [{"generated_text": chunk, "stop_reason": "not_finished"}]})
+            payload = f"id: {index + 1}\nevent: message\ndata: {event}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length)
+        path = urlparse(self.path).path
+
+        if path == "/identity/token":
+            if self.server.token_latency:
+                time.sleep(self.server.token_latency)
+            with self.server.lock:
+                self.server.stats["token_requests"] += 1
+                token = f"stub-token-{self.server.stats['token_requests']}"
+                self.server.valid_tokens.add(token)
+            self._send_json(200, {
+                "access_token": token,
+                "token_type": "Bearer",
+                "expires_in": self.server.token_ttl,
+                "expiration": int(time.time()) + self.server.token_ttl,
+            })
+            return
+
+        if path in ("/ml/v1/text/generation", "/ml/v1/text/generation_stream"):
+            token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+            if token not in self.server.valid_tokens:
+                self._send_json(401, {"errors": [{"code": "authentication_token_not_valid"}]})
+                return
+            with self.server.lock:
+                self.server.stats["generation_requests"] += 1
+            prompt = json.loads(raw_body or b"{}").get("input", "")
+            if path.endswith("_stream"):
+                self._send_stream(f"Stub response to: {prompt[:80]}")
+                return
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            self._send_json(200, {"results": [{
+                "generated_text": f"Stub response to: {prompt[:80]}",
+                "stop_reason": "eos_token",
+            }]})
+            return
+
+        self._send_json(404, {"errors": [{"code": "not_found"}]})
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0, **kwargs) -> WatsonxStubServer:
+    """
+    Starts the stub server on a background thread and returns it; port 0 picks a free port.
+    """
+    server = WatsonxStubServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="watsonx-stub", daemon=True).start()
+    logger.info(f"🧪 Watsonx stub listening on {server.base_url}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local Watsonx/IAM stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per generation")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds to sleep per token request")
+    args = parser.parse_args()
+
+    server = WatsonxStubServer((args.host, args.port), token_ttl=args.token_ttl, latency=args.latency,
+                               token_latency=args.token_latency)
+    logger.info(f"🧪 Watsonx stub listening on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,5 @@
+"""
+Modules shared by the website backend (Final website/backend) and the Watsonx
+backend (backend/), so each is implemented once. Both apps put the repository
+root on sys.path to import them (see repo_root.py in each app).
+"""
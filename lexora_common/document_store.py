@@ -0,0 +1,230 @@
+from docx import Document
+from pathlib import Path
+import threading
+import tempfile
+import hashlib
+import time
+import io
+import os
+import re
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: sweeps run unlocked, which is still safe, only redundant
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DOCUMENT_STORE_PATH = Path(os.getenv("DOCUMENT_STORE_PATH", "generated_docs"))
+DOCUMENT_STORE_MAX_BYTES = int(os.getenv("DOCUMENT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+DOCUMENT_STORE_MAX_AGE_DAYS = float(os.getenv("DOCUMENT_STORE_MAX_AGE_DAYS", "30"))
+DOCUMENT_STORE_SWEEP_INTERVAL_SECONDS = float(os.getenv("DOCUMENT_STORE_SWEEP_INTERVAL_SECONDS", "60"))
+#a temporary file older than this belongs to a write that died, not one in progress
+DOCUMENT_STORE_TMP_GRACE_SECONDS = float(os.getenv("DOCUMENT_STORE_TMP_GRACE_SECONDS", "3600"))
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+LOCK_FILE = ".sweep.lock"
+
+#the only names the store ever hands out, so anything else is rejected before touching the disk
+FILENAME_PATTERN = re.compile(r"^[a-z]+_[0-9a-f]{32}\.docx$")
+
+
+def build_nda_docx(nda_draft: str) -> bytes:
+    """
+    Builds the NDA Word document in memory.
+    """
+    doc = Document()
+    doc.add_heading("Non-Disclosure Agreement", 0)
+    doc.add_paragraph(nda_draft)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+class DocumentStore:
+    """
+    Generated documents on disk, named by a hash of their content.
+
+    DOCX files embed timestamps, so the name hashes the text the document is built
+    from: the same draft always maps to the same file and is only built once. Files
+    are written to a temporary name and renamed into place, so several workers can
+    share the directory and a reader never sees a partial file. A file's mtime is its
+    last use; a sweep (one worker at a time, under a file lock) removes files unused
+    for DOCUMENT_STORE_MAX_AGE_DAYS and then the least recently used ones until the
+    directory fits in DOCUMENT_STORE_MAX_BYTES. It also deletes temporary files left
+    behind by a worker that died mid-write, once they are DOCUMENT_STORE_TMP_GRACE_SECONDS old.
+    """
+
+    def __init__(self, root: Path = DOCUMENT_STORE_PATH, max_bytes: int = DOCUMENT_STORE_MAX_BYTES,
+                 max_age_days: float = DOCUMENT_STORE_MAX_AGE_DAYS,
+                 sweep_interval_seconds: float = DOCUMENT_STORE_SWEEP_INTERVAL_SECONDS,
+                 tmp_grace_seconds: float = DOCUMENT_STORE_TMP_GRACE_SECONDS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.tmp_grace_seconds = tmp_grace_seconds
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+        # metrics
+        self.saves = 0
+        self.deduplicated = 0
+        self.reads = 0
+        self.evicted = 0
+        self.stale_tmp_removed = 0
+        self.files = None
+        self.bytes = None
+
+    @staticmethod
+    def filename_for(kind: str, text: str) -> str:
+        return f"{kind}_{hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]}.docx"
+
+    @staticmethod
+    def is_valid_name(filename: str) -> bool:
+        return bool(FILENAME_PATTERN.match(filename))
+
+    def _touch(self, path: Path) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def save(self, kind: str, text: str, render) -> str:
+        """
+        Stores the document built from `text`, unless an identical one is already stored.
+
+        Args:
+            kind(str): lowercase name prefix, e.g. "nda"
+            text(str): the content the document is built from
+            render: callable building the document bytes from `text`
+
+        Returns:
+            str: the filename to download it by
+        """
+        if not isinstance(text, str):
+            raise TypeError(f"Document text must be a string, got {type(text).__name__}")
+        filename = self.filename_for(kind, text)
+        path = self.root / filename
+        if self._touch(path):
+            self.deduplicated += 1
+            return filename
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        content = render(text)
+        descriptor, tmp_name = tempfile.mkstemp(dir=self.root, prefix=f".{filename}.", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(content)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self.saves += 1
+        self.maybe_sweep()
+        return filename
+
+    def read(self, filename: str):
+        """
+        Returns the stored bytes, or None for unknown, invalid or evicted names.
+        """
+        if not self.is_valid_name(filename):
+            return None
+        path = self.root / filename
+        try:
+            content = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        self._touch(path)
+        self.reads += 1
+        return content
+
+    def maybe_sweep(self):
+        if time.time() - self._last_sweep >= self.sweep_interval_seconds:
+            self.sweep()
+
+    def sweep(self):
+        """
+        Enforces the age and size limits. Skipped if this or another worker is already sweeping.
+        """
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.time()
+            with (self.root / LOCK_FILE).open("a") as lock:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return
+                self._evict()
+        finally:
+            self._sweep_lock.release()
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        stale_tmp = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            is_tmp = entry.name.startswith(".") and entry.name.endswith(".tmp")
+            if not is_tmp and not entry.name.endswith(".docx"):
+                continue
+            try:
+                stat = entry.stat()
+                if is_tmp:
+                    if now - stat.st_mtime > self.tmp_grace_seconds:
+                        os.remove(entry.path)
+                        stale_tmp += 1
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        self.stale_tmp_removed += stale_tmp
+
+        entries.sort()  # least recently used first
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        self.evicted += removed
+        self.files = len(entries) - removed
+        self.bytes = total
+        if removed or stale_tmp:
+            logger.info(f"🧹 Document store: evicted {removed} file(s) and {stale_tmp} stale temporary file(s), "
+                        f"{self.files} left ({total / 1e6:.1f} MB)")
+
+    def stats(self) -> dict:
+        return {
+            "path": str(self.root),
+            "files": self.files,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "saves": self.saves,
+            "deduplicated": self.deduplicated,
+            "reads": self.reads,
+            "evicted": self.evicted,
+            "stale_tmp_removed": self.stale_tmp_removed,
+        }
+
+
+_store = DocumentStore()
+
+
+def get_document_store() -> DocumentStore:
+    """
+    Returns the process-wide document store.
+    """
+    return _store
@@ -0,0 +1,485 @@
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from collections.abc import Mapping
+from pathlib import Path
+import numpy as np
+import faiss
+import math
+import json
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")  # float32 or float16
+INDEX_ADD_SLAB_ROWS = 65536
+
+# Approximate-nearest-neighbour index selection (see index_report.py to compare settings)
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # 0 = ~4*sqrt(rows)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "16"))
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+MIN_TRAINING_ROWS_PER_CENTROID = 39  # faiss warns below this
+
+STORE_FILE = "store.json"
+VECTORS_FILE = "vectors.bin"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "offsets.bin"
+CHECKPOINT_FILE = "checkpoint.json"
+FAISS_FILE = "index.faiss"
+
+
+class BatchEncoder:
+    """
+    Buffers chunks across files and encodes them EMBEDDING_BATCH_SIZE at a time
+    into a writer, so many small files still make full batches.
+    """
+
+    def __init__(self, writer: "EmbeddingStoreWriter", embeddings, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.writer = writer
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self._pending = []
+
+    @property
+    def rows(self) -> int:
+        """
+        Number of rows written or pending, i.e. the row the next chunk will land on.
+        """
+        return self.writer.count + len(self._pending)
+
+    def add(self, chunks: list):
+        self._pending.extend(chunks)
+        while len(self._pending) >= self.batch_size:
+            self._encode(self._pending[:self.batch_size])
+            del self._pending[:self.batch_size]
+
+    def flush(self):
+        if self._pending:
+            self._encode(self._pending)
+            self._pending = []
+
+    def _encode(self, chunks: list):
+        vectors = np.asarray(self.embeddings.embed_documents([chunk["text"] for chunk in chunks]), dtype=np.float32)
+        self.writer.append(vectors, chunks)
+
+
+class EmbeddingStoreWriter:
+    """
+    Appends vectors and their chunks to an embedding store directory.
+
+    Vectors are written as raw row-major float32/float16 rows, chunks as one JSON
+    line each and chunk byte offsets as raw int64s, so nothing grows in memory
+    with the number of rows. checkpoint() makes everything written so far durable
+    and resume() reopens an interrupted build from the last checkpoint.
+    """
+
+    def __init__(self, path: Path, dtype: str = EMBEDDING_DTYPE):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self.count = 0
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / CHECKPOINT_FILE).unlink(missing_ok=True)
+        self._vectors = (self.path / VECTORS_FILE).open("wb")
+        self._chunks = (self.path / CHUNKS_FILE).open("wb")
+        self._offsets = (self.path / OFFSETS_FILE).open("wb")
+        self._last_offset = 0
+        self._offsets.write(np.int64(0).tobytes())
+
+    @staticmethod
+    def _read_checkpoint(path: Path):
+        checkpoint_path = Path(path) / CHECKPOINT_FILE
+        if not checkpoint_path.exists():
+            return None
+        with checkpoint_path.open("r", encoding="utf-8") as file:
+            return json.load(file)
+
+    @classmethod
+    def checkpoint_state(cls, path: Path):
+        """
+        Returns the state saved by the last checkpoint of an interrupted build in path, or None.
+        """
+        checkpoint = cls._read_checkpoint(path)
+        return checkpoint["state"] if checkpoint else None
+
+    @classmethod
+    def resume(cls, path: Path) -> "EmbeddingStoreWriter":
+        """
+        Reopens an interrupted build at its last checkpoint, discarding anything
+        written after it. Check checkpoint_state() first to decide whether to resume.
+        """
+        path = Path(path)
+        checkpoint = cls._read_checkpoint(path)
+        if checkpoint is None:
+            raise FileNotFoundError(f"No checkpoint to resume from in '{path}'")
+
+        writer = cls.__new__(cls)
+        writer.path = path
+        writer.dtype = np.dtype(checkpoint["dtype"])
+        writer.dim = checkpoint["dim"]
+        writer.count = checkpoint["count"]
+        writer._last_offset = checkpoint["chunks_bytes"]
+        sizes = {
+            VECTORS_FILE: writer.count * (writer.dim or 0) * writer.dtype.itemsize,
+            CHUNKS_FILE: checkpoint["chunks_bytes"],
+            OFFSETS_FILE: (writer.count + 1) * 8,
+        }
+        for name, size in sizes.items():
+            os.truncate(path / name, size)
+        writer._vectors = (path / VECTORS_FILE).open("ab")
+        writer._chunks = (path / CHUNKS_FILE).open("ab")
+        writer._offsets = (path / OFFSETS_FILE).open("ab")
+        logger.info(f"Resuming embedding store build in {path} at row {writer.count}")
+        return writer
+
+    def append(self, vectors: np.ndarray, chunks: list):
+        """
+        Appends one batch.
+
+        Args:
+            vectors: array of shape (len(chunks), dim)
+            chunks: list of {"id", "text", "metadata"} dicts, in the same order as vectors
+        """
+        if len(vectors) != len(chunks):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(chunks)} chunks")
+        if not chunks:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+        self._vectors.write(vectors.tobytes())
+        offsets = np.empty(len(chunks), dtype=np.int64)
+        for i, chunk in enumerate(chunks):
+            line = (json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8")
+            self._chunks.write(line)
+            self._last_offset += len(line)
+            offsets[i] = self._last_offset
+        self._offsets.write(offsets.tobytes())
+        self.count += len(chunks)
+
+    def copy_rows(self, store: "EmbeddingStore", start: int, stop: int):
+        """
+        Copies rows [start, stop) of another store verbatim, without decoding chunks or re-embedding.
+        """
+        if stop <= start:
+            return
+        if self.dim is None:
+            self.dim = store.dim
+        elif store.dim != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {store.dim}")
+
+        base = self._last_offset - int(store.offsets[start])
+        for slab in range(start, stop, INDEX_ADD_SLAB_ROWS):
+            slab_stop = min(slab + INDEX_ADD_SLAB_ROWS, stop)
+            rows = store.vectors[slab:slab_stop]
+            self._vectors.write(np.ascontiguousarray(rows, dtype=self.dtype).tobytes())
+            first, last = int(store.offsets[slab]), int(store.offsets[slab_stop])
+            self._chunks.write(os.pread(store.chunks_fd, last - first, first))
+            self._offsets.write((store.offsets[slab + 1:slab_stop + 1] + base).astype(np.int64).tobytes())
+        self._last_offset = int(store.offsets[stop]) + base
+        self.count += stop - start
+
+    def _sync(self):
+        for file in (self._vectors, self._chunks, self._offsets):
+            file.flush()
+            os.fsync(file.fileno())
+
+    def checkpoint(self, state: dict):
+        """
+        Makes every row appended so far durable and records `state` (the caller's
+        progress marker) alongside it, atomically.
+        """
+        self._sync()
+        checkpoint = {
+            "dim": self.dim,
+            "dtype": self.dtype.name,
+            "count": self.count,
+            "chunks_bytes": self._last_offset,
+            "state": state,
+        }
+        tmp_path = self.path / f"{CHECKPOINT_FILE}.tmp"
+        with tmp_path.open("w", encoding="utf-8") as file:
+            json.dump(checkpoint, file)
+        os.replace(tmp_path, self.path / CHECKPOINT_FILE)
+
+    def close(self) -> "EmbeddingStore":
+        """
+        Flushes everything to disk and writes the store header last, so a store
+        without a header is known to be incomplete.
+        """
+        self._sync()
+        for file in (self._vectors, self._chunks, self._offsets):
+            file.close()
+        with (self.path / STORE_FILE).open("w", encoding="utf-8") as file:
+            json.dump({"dim": self.dim or 0, "dtype": self.dtype.name, "count": self.count}, file)
+        (self.path / CHECKPOINT_FILE).unlink(missing_ok=True)
+        return EmbeddingStore(self.path)
+
+
+class EmbeddingStore:
+    """
+    Read-only view of an embedding store directory.
+
+    The vector matrix and chunk offsets are memory-mapped, so every worker process
+    opening the same store shares one copy of the pages through the OS page cache.
+    Chunks are read from disk only when a search actually returns them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with (self.path / STORE_FILE).open("r", encoding="utf-8") as file:
+            header = json.load(file)
+        self.dim = header["dim"]
+        self.dtype = np.dtype(header["dtype"])
+        self.count = header["count"]
+        if self.count:
+            self.vectors = np.memmap(self.path / VECTORS_FILE, dtype=self.dtype, mode="r",
+                                     shape=(self.count, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=self.dtype)
+        self.offsets = np.memmap(self.path / OFFSETS_FILE, dtype=np.int64, mode="r", shape=(self.count + 1,))
+        self.chunks_fd = os.open(self.path / CHUNKS_FILE, os.O_RDONLY)
+
+    @staticmethod
+    def exists(path: Path) -> bool:
+        return (Path(path) / STORE_FILE).exists()
+
+    def chunk(self, row: int) -> dict:
+        """
+        Reads a single chunk record; pread keeps this safe to call from many threads.
+        """
+        start, stop = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(os.pread(self.chunks_fd, stop - start, start))
+
+    def document(self, row: int) -> Document:
+        record = self.chunk(row)
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def iter_chunks(self):
+        """
+        Yields (row, chunk record) for every row, streaming the chunks file.
+        """
+        with (self.path / CHUNKS_FILE).open("rb") as file:
+            for row, line in enumerate(file):
+                yield row, json.loads(line)
+
+    def nbytes(self) -> int:
+        return sum(file.stat().st_size for file in self.path.iterdir() if file.is_file())
+
+    def close(self):
+        if self.chunks_fd is not None:
+            os.close(self.chunks_fd)
+            self.chunks_fd = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except (OSError, AttributeError):
+            pass
+
+
+class _RowIds(Mapping):
+    """
+    index_to_docstore_id for a store: FAISS row i maps to docstore id "i", without
+    materializing a dict entry per row.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.count:
+            raise KeyError(row)
+        return str(row)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+
+class StoreDocstore(Docstore):
+    """
+    LangChain docstore that resolves FAISS rows to chunks lazily from an EmbeddingStore.
+    """
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+
+    def search(self, search: str):
+        try:
+            row = int(search)
+        except ValueError:
+            return f"ID {search} not found."
+        if not 0 <= row < self.store.count:
+            return f"ID {search} not found."
+        return self.store.document(row)
+
+
+def index_factory_string(count: int, dim: int, index_type: str = FAISS_INDEX_TYPE) -> str:
+    """
+    Maps an index type to a faiss index_factory description for a corpus of `count` rows.
+
+    IVF list counts default to ~4*sqrt(count). Types that need more training rows than
+    the corpus has fall back to an exact flat index.
+    """
+    index_type = index_type.lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+    nlist = FAISS_NLIST or max(1, int(4 * math.sqrt(count)))
+    nlist = min(nlist, max(1, min(count, FAISS_TRAIN_SAMPLE) // MIN_TRAINING_ROWS_PER_CENTROID))
+    if index_type == "hnsw":
+        return f"HNSW{FAISS_HNSW_M},Flat"
+    if index_type == "ivf" and count >= MIN_TRAINING_ROWS_PER_CENTROID:
+        return f"IVF{nlist},Flat"
+    if index_type == "ivfpq" and count >= 2 ** FAISS_PQ_NBITS * MIN_TRAINING_ROWS_PER_CENTROID:
+        if dim % FAISS_PQ_M:
+            raise ValueError(f"FAISS_PQ_M={FAISS_PQ_M} must divide the embedding dimension {dim}")
+        return f"IVF{nlist},PQ{FAISS_PQ_M}x{FAISS_PQ_NBITS}"
+    if index_type != "flat":
+        logger.warning(f"Only {count} vectors: too few to train a '{index_type}' index, using flat")
+    return "Flat"
+
+
+def _row_ranges(store: EmbeddingStore, ranges) -> list:
+    return [(0, store.count)] if ranges is None else [(start, stop) for start, stop in ranges if stop > start]
+
+
+def _training_sample(store: EmbeddingStore, size: int, ranges=None) -> np.ndarray:
+    """
+    Draws a uniform sample of rows (within `ranges`, if given) for training, read in
+    row order to keep memory-map reads sequential.
+    """
+    rows = np.concatenate([np.arange(start, stop) for start, stop in _row_ranges(store, ranges)])
+    if len(rows) > size:
+        rows = np.sort(np.random.default_rng(0).choice(rows, size=size, replace=False))
+    return np.ascontiguousarray(store.vectors[rows], dtype=np.float32)
+
+
+def apply_search_params(index, nprobe: int = FAISS_NPROBE, ef_search: int = FAISS_EF_SEARCH):
+    """
+    Sets query-time knobs (IVF nprobe, HNSW efSearch); they are not persisted with the index.
+    """
+    try:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    except RuntimeError:
+        pass  # not an IVF index
+    # downcast wrappers do not own the C++ index, so the original object is what gets returned
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIDMap):
+        inner = faiss.downcast_index(inner.index)
+    hnsw = getattr(inner, "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+    return index
+
+
+def filtered_search_params(index, selector):
+    """
+    Search parameters that restrict `index` to the ids `selector` accepts. They replace
+    the index's own query-time knobs for that search, so its nprobe / efSearch are copied in.
+    """
+    try:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+    except RuntimeError:
+        pass  # not an IVF index
+    inner = faiss.downcast_index(index)
+    if isinstance(inner, faiss.IndexIDMap):
+        inner = faiss.downcast_index(inner.index)
+    hnsw = getattr(inner, "hnsw", None)
+    if hnsw is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def build_faiss_index(store: EmbeddingStore, index_type: str = FAISS_INDEX_TYPE, ranges=None):
+    """
+    Builds a FAISS L2 index of the configured type from the store matrix.
+
+    IVF types are trained on a sample of at most FAISS_TRAIN_SAMPLE rows. Vectors are
+    added a slab at a time, so float16 stores are only ever up-cast one slab at a time.
+
+    Args:
+        ranges: optional list of (start, stop) row ranges to index instead of the whole
+            store; the index then returns store row numbers as its ids
+    """
+    row_ranges = _row_ranges(store, ranges)
+    count = sum(stop - start for start, stop in row_ranges)
+    description = index_factory_string(count, store.dim, index_type)
+    index = faiss.index_factory(store.dim, description if ranges is None else f"IDMap,{description}")
+    if not index.is_trained:
+        logger.info(f"Training {description} index on up to {FAISS_TRAIN_SAMPLE} vectors...")
+        index.train(_training_sample(store, FAISS_TRAIN_SAMPLE, ranges))
+    for range_start, range_stop in row_ranges:
+        for start in range(range_start, range_stop, INDEX_ADD_SLAB_ROWS):
+            stop = min(start + INDEX_ADD_SLAB_ROWS, range_stop)
+            slab = np.ascontiguousarray(store.vectors[start:stop], dtype=np.float32)
+            if ranges is None:
+                index.add(slab)
+            else:
+                index.add_with_ids(slab, np.arange(start, stop, dtype=np.int64))
+    return apply_search_params(index)
+
+
+def index_memory_bytes(index) -> int:
+    """
+    Size of the serialized index, a close proxy for its resident size once loaded.
+    """
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def save_faiss_index(index, path: Path, name: str = FAISS_FILE):
+    """
+    Writes the index next to its store atomically, so a reader never maps a half-written file.
+    """
+    Path(path).mkdir(parents=True, exist_ok=True)
+    tmp_file = Path(path) / f"{name}.tmp"
+    faiss.write_index(index, str(tmp_file))
+    os.replace(tmp_file, Path(path) / name)
+
+
+def read_faiss_index(path: Path, name: str = FAISS_FILE):
+    """
+    Memory-maps a saved FAISS index when the installed faiss supports it, so
+    processes share its pages instead of each holding a private copy.
+    """
+    index_file = str(Path(path) / name)
+    # IO_FLAG_MMAP_IFC (newer faiss) extends mmap to flat indexes' vector codes
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+    try:
+        index = faiss.read_index(index_file, flags)
+    except (RuntimeError, AttributeError):
+        logger.info("faiss cannot memory-map this index; reading it into memory")
+        index = faiss.read_index(index_file)
+    return apply_search_params(index)
+
+
+def load_vectorstore(path: Path, embeddings) -> FAISS:
+    """
+    Opens an embedding store and its FAISS index as a LangChain FAISS vectorstore,
+    building the index from the memory-mapped matrix if it has not been saved yet.
+    """
+    store = EmbeddingStore(path)
+    if (Path(path) / FAISS_FILE).exists():
+        index = read_faiss_index(path)
+    else:
+        index = build_faiss_index(store)
+        save_faiss_index(index, path)
+    if index.ntotal != store.count:
+        raise ValueError(f"FAISS index has {index.ntotal} rows but the embedding store has {store.count}")
+    return FAISS(embeddings, index, StoreDocstore(store), _RowIds(store.count))
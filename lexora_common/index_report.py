@@ -0,0 +1,126 @@
+"""
+Compares FAISS index types on the current legal corpus embedding store.
+
+For each index type (and each nprobe / efSearch value given) it reports recall@k
+against exact flat search, p50/p99 single-query latency, build time and index size.
+Each backend runs it through its own index_report entry point, which supplies the
+default index location:
+
+    python index_report.py --types flat,ivf,hnsw,ivfpq --nprobe 1,8,32 --ef-search 16,64,256
+"""
+from lexora_common.embedding_store import (
+    EmbeddingStore,
+    INDEX_TYPES,
+    FAISS_NPROBE,
+    FAISS_EF_SEARCH,
+    apply_search_params,
+    build_faiss_index,
+    index_factory_string,
+    index_memory_bytes,
+)
+import numpy as np
+import argparse
+import time
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _sample_queries(store: EmbeddingStore, count: int) -> np.ndarray:
+    """
+    Uses stored chunk vectors, lightly perturbed, as stand-ins for real question embeddings.
+    """
+    rng = np.random.default_rng(1)
+    rows = np.sort(rng.choice(store.count, size=min(count, store.count), replace=False))
+    queries = np.asarray(store.vectors[rows], dtype=np.float32)
+    noise = rng.standard_normal(queries.shape).astype(np.float32)
+    return queries + 0.05 * np.linalg.norm(queries, axis=1, keepdims=True) * noise / np.sqrt(store.dim)
+
+
+def _measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    latencies = []
+    found = np.empty_like(truth)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found[i] = ids[0]
+    hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(queries)))
+    return {
+        "recall": hits / truth.size,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+    }
+
+
+def evaluate(store: EmbeddingStore, index_types, nprobes, ef_searches, queries: int = 200, k: int = 4) -> list:
+    """
+    Builds each index type over the store and measures it against exact search.
+
+    Returns:
+        list: one result dict per (index type, search parameter) combination
+    """
+    queries = _sample_queries(store, queries)
+    _, truth = build_faiss_index(store, "flat").search(queries, k)
+    results = []
+    for index_type in index_types:
+        start = time.perf_counter()
+        index = build_faiss_index(store, index_type)
+        build_seconds = time.perf_counter() - start
+
+        description = index_factory_string(store.count, store.dim, index_type)
+        if description.startswith("IVF"):
+            settings = [("nprobe", value, {"nprobe": value}) for value in nprobes]
+        elif description.startswith("HNSW"):
+            settings = [("efSearch", value, {"ef_search": value}) for value in ef_searches]
+        else:
+            settings = [("-", "-", {})]
+
+        for name, value, params in settings:
+            apply_search_params(index, **params)
+            results.append({
+                "type": index_type,
+                "factory": description,
+                "param": f"{name}={value}" if params else "-",
+                "build_s": build_seconds,
+                "memory_mb": index_memory_bytes(index) / (1024 * 1024),
+                **_measure(index, queries, truth, k),
+            })
+    return results
+
+
+def _print_table(results: list, k: int):
+    header = f"{'type':<6} {'factory':<18} {'param':<13} {f'recall@{k}':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['type']:<6} {row['factory']:<18} {row['param']:<13} {row['recall']:>9.3f} "
+              f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['build_s']:>8.2f} {row['memory_mb']:>8.2f}")
+
+
+def _int_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(default_index_path):
+    """
+    Command-line entry point.
+
+    Args:
+        default_index_path: callable returning the index directory to use without --index-path
+    """
+    parser = argparse.ArgumentParser(description="Recall/latency/memory report for FAISS index types")
+    parser.add_argument("--index-path", default=None, help="Defaults to the backend's current index")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--nprobe", type=_int_list, default=[FAISS_NPROBE])
+    parser.add_argument("--ef-search", type=_int_list, default=[FAISS_EF_SEARCH])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=4)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.index_path or default_index_path())
+    logger.info(f"📊 Evaluating index types on {store.count} vectors of dimension {store.dim}...")
+    results = evaluate(store, args.types.split(","), args.nprobe, args.ef_search, args.queries, args.k)
+    _print_table(results, args.k)
@@ -0,0 +1,184 @@
+"""
+Prompt templates shared by both backends: each app declares its own templates and
+their placeholders and keeps a registry of them (see prompt_registry.py in each app).
+"""
+from string import Formatter
+from pathlib import Path
+import threading
+import time
+import os
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(os.getenv("PROMPTS_DIR", "prompts"))
+PROMPT_RELOAD_CHECK_SECONDS = float(os.getenv("PROMPT_RELOAD_CHECK_SECONDS", "2"))
+
+
+class CompiledPrompt:
+    """
+    A template parsed once into literal text and placeholders. Rendering concatenates
+    the pieces, so values are inserted verbatim: braces in a clause or in retrieved
+    text are never interpreted, and nothing is formatted twice.
+    """
+
+    def __init__(self, name: str, text: str, mtime_ns: int = None):
+        self.name = name
+        self.mtime_ns = mtime_ns
+        self.segments = self._parse(name, text)
+        self.fields = {field for _, field in self.segments if field is not None}
+        self.prefix = self.segments[0][0] if self.segments else ""
+        self.prefix_ids = None
+
+    @staticmethod
+    def _parse(name: str, text: str) -> list:
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            raise ValueError(f"Prompt template '{name}' is malformed: {str(e)}") from e
+        segments = []
+        for literal, field, format_spec, conversion in parsed:
+            if field is not None and (not field.isidentifier() or format_spec or conversion):
+                raise ValueError(f"Prompt template '{name}': unsupported placeholder {{{field}}}; "
+                                 f"use plain {{name}} placeholders and {{{{ }}}} for literal braces")
+            segments.append((literal, field))
+        return segments
+
+    def validate(self, expected: set):
+        unknown, missing = self.fields - expected, expected - self.fields
+        if unknown or missing:
+            raise ValueError(f"Prompt template '{self.name}': unknown placeholders {sorted(unknown)}, "
+                             f"missing placeholders {sorted(missing)}")
+
+    def render(self, **values) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise ValueError(f"Prompt template '{self.name}' needs values for {sorted(missing)}")
+        return "".join(literal + (str(values[field]) if field is not None else "") for literal, field in self.segments)
+
+    def tokenize_prefix(self, tokenizer):
+        self.prefix_ids = tokenizer(self.prefix, add_special_tokens=False)["input_ids"]
+
+    def count_tokens(self, tokenizer, **values) -> int:
+        """
+        Token count of the rendered prompt; the static prefix is tokenized once, so only the
+        rest is tokenized per call (the count may differ by a token at the prefix boundary).
+        """
+        if self.prefix_ids is None:
+            self.tokenize_prefix(tokenizer)
+        rest = self.render(**values)[len(self.prefix):]
+        return len(self.prefix_ids) + len(tokenizer(rest, add_special_tokens=False)["input_ids"])
+
+
+class PromptRegistry:
+    """
+    Loads and validates every prompt template once, then serves the compiled templates.
+
+    Template files are re-checked at most every PROMPT_RELOAD_CHECK_SECONDS when used;
+    an edited file is recompiled and swapped in, while an edit that fails validation is
+    logged and the previous version keeps serving.
+    """
+
+    def __init__(self, fields: dict, defaults: dict = None, prompts_dir: Path = PROMPTS_DIR,
+                 reload_check_seconds: float = PROMPT_RELOAD_CHECK_SECONDS):
+        """
+        Args:
+            fields(dict): every template name and the placeholders it must use, no more and no fewer
+            defaults(dict): template text used, with a warning, when a template's file is missing
+        """
+        self.fields = fields
+        self.defaults = defaults or {}
+        self.prompts_dir = Path(prompts_dir)
+        self.reload_check_seconds = reload_check_seconds
+        self.tokenizer = None
+        self._templates = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+
+        # metrics
+        self.renders = 0
+        self.reloads = 0
+        self.failed_reloads = 0
+
+    def _path(self, name: str) -> Path:
+        return self.prompts_dir / f"{name}.txt"
+
+    def _compile(self, name: str) -> CompiledPrompt:
+        path = self._path(name)
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            if name not in self.defaults:
+                raise FileNotFoundError(f"Prompt template not found: {path}")
+            logger.warning(f"Prompt template {path} not found, using the default template")
+            mtime_ns, text = None, self.defaults[name]
+        template = CompiledPrompt(name, text, mtime_ns)
+        template.validate(self.fields[name])
+        if self.tokenizer is not None:
+            template.tokenize_prefix(self.tokenizer)
+        return template
+
+    def load_all(self, tokenizer=None):
+        """
+        Compiles every template; raises if any is missing or invalid, so a bad template
+        stops startup instead of failing requests.
+
+        Args:
+            tokenizer: if given, each template's static prefix is tokenized up front
+        """
+        self.tokenizer = tokenizer
+        templates = {name: self._compile(name) for name in self.fields}
+        with self._lock:
+            self._templates = templates
+            self._checked_at = {name: time.monotonic() for name in templates}
+        logger.info(f"✅ Loaded {len(templates)} prompt templates from {self.prompts_dir}")
+
+    def _reload_if_changed(self, name: str):
+        try:
+            mtime_ns = self._path(name).stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+        if mtime_ns == self._templates[name].mtime_ns:
+            return
+        try:
+            self._templates[name] = self._compile(name)
+            self.reloads += 1
+            logger.info(f"🔄 Reloaded prompt template '{name}'")
+        except (OSError, ValueError) as e:
+            self.failed_reloads += 1
+            logger.error(f"Keeping the previous '{name}' prompt template: {str(e)}")
+        #a failed version is not retried until the file changes again
+        self._templates[name].mtime_ns = mtime_ns
+
+    def get(self, name: str) -> CompiledPrompt:
+        if name not in self.fields:
+            raise KeyError(f"Unknown prompt template: {name}")
+        with self._lock:
+            if name not in self._templates:
+                self._templates[name] = self._compile(name)
+                self._checked_at[name] = time.monotonic()
+            elif time.monotonic() - self._checked_at[name] >= self.reload_check_seconds:
+                self._checked_at[name] = time.monotonic()
+                self._reload_if_changed(name)
+            return self._templates[name]
+
+    def render(self, name: str, /, **values) -> str:
+        prompt = self.get(name).render(**values)
+        self.renders += 1
+        return prompt
+
+    def stats(self) -> dict:
+        return {
+            "templates": {
+                name: {"fields": sorted(template.fields),
+                       "prefix_tokens": len(template.prefix_ids) if template.prefix_ids is not None else None}
+                for name, template in self._templates.items()
+            },
+            "renders": self.renders,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+        }
+